@@ -19,20 +19,23 @@ Implements intelligent orchestration with auto-scaling, health checks, and failo
 Based on HeadyConductor and HeadyResonance patents
 """
 
-import os
-import sys
-import json
 import asyncio
+import heapq
+import bisect
 import hashlib
+import inspect
+import itertools
+import math
 import time
 import psutil
-import aiohttp
-from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass, asdict
-from datetime import datetime, timezone, timedelta
+from aiohttp import web
+from typing import Dict, List, Any, Awaitable, Callable, Iterator, Optional, Sequence, Set, Tuple, Union
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timezone
 from enum import Enum
 import numpy as np
 from collections import deque
+from collections.abc import MutableMapping
 import logging
 
 # Configure logging
@@ -51,6 +54,14 @@ class NodeState(Enum):
     DRAINING = "draining"
     TERMINATED = "terminated"
 
+class OrchestratorEvent(Enum):
+    """Work items for the event-driven orchestration loop"""
+    COLLECT_METRICS = "collect_metrics"
+    EVALUATE_SCALING = "evaluate_scaling"
+    OPTIMIZE_PLACEMENT = "optimize_placement"
+    NODE_FAILED = "node_failed"
+    STOP = "stop"
+
 class ScalingAction(Enum):
     """Scaling actions"""
     SCALE_UP = "scale_up"
@@ -104,63 +115,343 @@ class WorkloadPattern:
     trend: float  # positive = increasing, negative = decreasing
     confidence: float
 
+@dataclass
+class ScalingPlan:
+    """Nodes to add and remove in one orchestration tick"""
+    action: ScalingAction
+    add: int = 0
+    remove: List[str] = field(default_factory=list)
+    node_type: str = "worker"
+
+@dataclass
+class HostSample:
+    """One host resource reading taken by HealthSampler"""
+    cpu_percent: float
+    memory_percent: float
+    disk_percent: float
+    network_throughput: float  # MB/s since the previous sample
+    timestamp: datetime
+
+class HealthSampler:
+    """Background sampler for host CPU/memory/disk/network readings.
+
+    psutil is polled with non-blocking calls (cpu_percent(interval=None) reports
+    usage since the previous call), readings are kept in a ring buffer and
+    health checks read the latest one instead of blocking for a full second.
+    """
+    
+    def __init__(self, interval: float = 1.0, history_size: int = 300, disk_path: str = "/"):
+        self.interval = interval
+        self.disk_path = disk_path
+        self.samples: deque = deque(maxlen=history_size)
+        self._task: Optional[asyncio.Task] = None
+        self._last_net: Optional[Tuple[float, int]] = None
+        # The first cpu_percent(None) call has no reference point and returns 0.0
+        psutil.cpu_percent(interval=None)
+        self._last_sampled = time.monotonic()
+        
+    def sample(self) -> HostSample:
+        """Take one reading now; every call is non-blocking"""
+        now = time.monotonic()
+        net = psutil.net_io_counters()
+        net_bytes = (net.bytes_sent + net.bytes_recv) if net else 0
+        throughput = 0.0
+        if self._last_net is not None and now > self._last_net[0]:
+            throughput = (net_bytes - self._last_net[1]) / (now - self._last_net[0]) / 1e6
+        self._last_net = (now, net_bytes)
+        
+        sample = HostSample(
+            cpu_percent=psutil.cpu_percent(interval=None),
+            memory_percent=psutil.virtual_memory().percent,
+            disk_percent=psutil.disk_usage(self.disk_path).percent,
+            network_throughput=max(0.0, throughput),
+            timestamp=datetime.now(timezone.utc)
+        )
+        self.samples.append(sample)
+        self._last_sampled = now
+        return sample
+    
+    def latest(self) -> HostSample:
+        """Most recent reading in O(1); samples inline only when no fresh reading exists"""
+        if not self.samples or (not self.running and time.monotonic() - self._last_sampled >= self.interval):
+            return self.sample()
+        return self.samples[-1]
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self):
+        """Start sampling on the running event loop"""
+        if not self.running:
+            self.sample()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Health sampling failed: {e}")
+
+_default_sampler: Optional[HealthSampler] = None
+
+def get_health_sampler() -> HealthSampler:
+    """Process-wide sampler shared by nodes created without one"""
+    global _default_sampler
+    if _default_sampler is None:
+        _default_sampler = HealthSampler()
+    return _default_sampler
+
+NODE_METRIC_COLUMNS = (
+    "cpu_percent",
+    "memory_percent",
+    "disk_percent",
+    "network_throughput",
+    "request_latency",
+    "error_rate",
+    "health_score",
+)
+
+CLUSTER_METRIC_COLUMNS = (
+    "node_count",
+    "healthy_nodes",
+    "avg_health",
+    "total_cpu",
+    "total_memory",
+    "avg_latency",
+)
+
+class MetricsRingStore:
+    """Preallocated columnar ring buffer shared by many metric series.
+    
+    Each column is a (series, 2 * capacity) array and every sample is written
+    twice, at i and i + capacity, so the most recent n samples of a series are
+    always one contiguous slice: windows are read-only zero-copy views that can
+    go straight into NumPy analysis. Series slots are recycled when released.
+    """
+    
+    def __init__(self, columns: Tuple[str, ...], capacity: int = 1000,
+                 initial_series: int = 16, dtype: Any = np.float32):
+        self.columns = tuple(columns)
+        self.capacity = capacity
+        self._column_index = {name: i for i, name in enumerate(self.columns)}
+        self._values = np.zeros((len(self.columns), initial_series, 2 * capacity), dtype=dtype)
+        self._timestamps = np.zeros((initial_series, 2 * capacity), dtype=np.float64)
+        self._heads = np.zeros(initial_series, dtype=np.int64)
+        self._totals = np.zeros(initial_series, dtype=np.int64)
+        self._slots: Dict[str, int] = {}
+        self._free = list(range(initial_series - 1, -1, -1))
+    
+    def allocate(self, key: str) -> int:
+        """Slot for `key`, creating (and growing the store) if needed"""
+        if key in self._slots:
+            return self._slots[key]
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        self._heads[slot] = 0
+        self._totals[slot] = 0
+        self._slots[key] = slot
+        return slot
+    
+    def release(self, key: str):
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._free.append(slot)
+    
+    def _grow(self):
+        # Existing views keep pointing at the old arrays, which stay valid
+        series = self._heads.shape[0]
+        self._values = np.concatenate([self._values, np.zeros_like(self._values)], axis=1)
+        self._timestamps = np.concatenate([self._timestamps, np.zeros_like(self._timestamps)])
+        self._heads = np.concatenate([self._heads, np.zeros_like(self._heads)])
+        self._totals = np.concatenate([self._totals, np.zeros_like(self._totals)])
+        self._free.extend(range(2 * series - 1, series - 1, -1))
+    
+    def append(self, slot: int, values: Tuple[float, ...], timestamp: float):
+        """Append one sample (one value per column, in column order)"""
+        head = self._heads[slot]
+        for position in (head, head + self.capacity):
+            self._values[:, slot, position] = values
+            self._timestamps[slot, position] = timestamp
+        self._heads[slot] = (head + 1) % self.capacity
+        self._totals[slot] += 1
+    
+    def __len__(self) -> int:
+        return len(self._slots)
+    
+    def length(self, slot: int) -> int:
+        """Samples currently held for a series"""
+        return int(min(self._totals[slot], self.capacity))
+    
+    def total(self, slot: int) -> int:
+        """Samples ever appended to a series (not capped by capacity)"""
+        return int(self._totals[slot])
+    
+    def _bounds(self, slot: int, n: Optional[int]) -> Tuple[int, int]:
+        held = self.length(slot)
+        n = held if n is None else max(0, min(n, held))
+        end = int(self._heads[slot]) + self.capacity
+        return end - n, end
+    
+    def window(self, slot: int, column: str, n: Optional[int] = None) -> np.ndarray:
+        """Last n samples of one column, oldest first"""
+        start, end = self._bounds(slot, n)
+        view = self._values[self._column_index[column], slot, start:end]
+        view.flags.writeable = False
+        return view
+    
+    def frame(self, slot: int, n: Optional[int] = None) -> np.ndarray:
+        """Last n samples of every column as a (columns, n) view"""
+        start, end = self._bounds(slot, n)
+        view = self._values[:, slot, start:end]
+        view.flags.writeable = False
+        return view
+    
+    def timestamps(self, slot: int, n: Optional[int] = None) -> np.ndarray:
+        """POSIX timestamps matching window()/frame()"""
+        start, end = self._bounds(slot, n)
+        view = self._timestamps[slot, start:end]
+        view.flags.writeable = False
+        return view
+    
+    def latest(self, slot: int, column: str) -> Optional[float]:
+        if not self._totals[slot]:
+            return None
+        return float(self._values[self._column_index[column], slot, self._heads[slot] + self.capacity - 1])
+    
+    def nbytes(self) -> int:
+        return self._values.nbytes + self._timestamps.nbytes
+
+_default_metrics_store: Optional[MetricsRingStore] = None
+
+def get_metrics_store() -> MetricsRingStore:
+    """Process-wide node metrics store shared by nodes created without one"""
+    global _default_metrics_store
+    if _default_metrics_store is None:
+        _default_metrics_store = MetricsRingStore(NODE_METRIC_COLUMNS)
+    return _default_metrics_store
+
 class HeadyNode:
     """Represents a managed node in the orchestration system"""
     
-    def __init__(self, node_id: str, node_type: str, config: Dict[str, Any]):
+    HEALTH_WINDOW = 100
+    
+    def __init__(self, node_id: str, node_type: str, config: Dict[str, Any],
+                 sampler: Optional[HealthSampler] = None,
+                 store: Optional[MetricsRingStore] = None):
         self.node_id = node_id
         self.node_type = node_type
         self.config = config
-        self.state = NodeState.INITIALIZING
+        self.sampler = sampler if sampler is not None else get_health_sampler()
+        self.store = store if store is not None else get_metrics_store()
+        self.slot: Optional[int] = self.store.allocate(node_id)
+        self.registry: Optional["NodeRegistry"] = None
+        self._state = NodeState.INITIALIZING
+        self._health_sum = 0.0
         self.created_at = datetime.now(timezone.utc)
         self.last_health_check = None
-        self.health_history = deque(maxlen=100)
-        self.metrics_history = deque(maxlen=1000)
+    
+    @property
+    def state(self) -> NodeState:
+        return self._state
+    
+    @state.setter
+    def state(self, state: NodeState):
+        previous = self._state
+        self._state = state
+        if state != previous and self.registry is not None:
+            self.registry.state_changed(self, previous)
+    
+    @property
+    def mean_health(self) -> Optional[float]:
+        """Mean of health_history, maintained incrementally"""
+        held = len(self.health_history)
+        return self._health_sum / held if held else None
+    
+    @property
+    def health_history(self) -> np.ndarray:
+        """Last HEALTH_WINDOW health scores (zero-copy view)"""
+        if self.slot is None:
+            return np.zeros(0, dtype=np.float32)
+        return self.store.window(self.slot, "health_score", self.HEALTH_WINDOW)
+    
+    def metrics_window(self, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Last n samples of every metric column (zero-copy views)"""
+        if self.slot is None:
+            return {column: np.zeros(0, dtype=np.float32) for column in self.store.columns}
+        return {column: self.store.window(self.slot, column, n) for column in self.store.columns}
         
     async def health_check(self) -> NodeMetrics:
         """Perform health check on node"""
         try:
-            # Collect system metrics
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
+            # Latest background reading; never blocks the event loop
+            host = self.sampler.latest()
             
-            # Simulate network and application metrics
+            # Simulate application metrics
             # In production, these would come from actual monitoring
-            network_throughput = np.random.uniform(100, 1000)  # MB/s
             request_latency = np.random.exponential(0.5)  # seconds
             error_rate = np.random.beta(1, 100)  # error percentage
             
             metrics = NodeMetrics(
                 node_id=self.node_id,
-                cpu_percent=cpu_percent,
-                memory_percent=memory.percent,
-                disk_percent=disk.percent,
-                network_throughput=network_throughput,
+                cpu_percent=host.cpu_percent,
+                memory_percent=host.memory_percent,
+                disk_percent=host.disk_percent,
+                network_throughput=host.network_throughput,
                 request_latency=request_latency,
                 error_rate=error_rate,
                 timestamp=datetime.now(timezone.utc)
             )
             
-            # Update health history
+            # Update health history, keeping the running sum of the health window
             health_score = metrics.health_score()
-            self.health_history.append(health_score)
-            self.metrics_history.append(metrics)
-            
-            # Update node state based on health
-            if health_score >= 80:
-                self.state = NodeState.HEALTHY
-            elif health_score >= 60:
-                self.state = NodeState.DEGRADED
+            window = self.health_history
+            evicted = float(window[0]) if len(window) == self.HEALTH_WINDOW else 0.0
+            self.store.append(self.slot, (
+                metrics.cpu_percent,
+                metrics.memory_percent,
+                metrics.disk_percent,
+                metrics.network_throughput,
+                metrics.request_latency,
+                metrics.error_rate,
+                health_score
+            ), metrics.timestamp.timestamp())
+            if self.store.total(self.slot) % self.HEALTH_WINDOW == 0:
+                # Resynchronise once per window so rounding never accumulates
+                self._health_sum = float(np.sum(self.health_history, dtype=np.float64))
             else:
-                self.state = NodeState.UNHEALTHY
+                self._health_sum += self.store.latest(self.slot, "health_score") - evicted
+            if self.registry is not None:
+                self.registry.health_changed(self)
+            
+            # Update node state based on health; a node already draining or gone keeps its state
+            if self.state not in LEAVING_STATES:
+                if health_score >= 80:
+                    self.state = NodeState.HEALTHY
+                elif health_score >= 60:
+                    self.state = NodeState.DEGRADED
+                else:
+                    self.state = NodeState.UNHEALTHY
             
             self.last_health_check = datetime.now(timezone.utc)
             return metrics
             
         except Exception as e:
             logger.error(f"Health check failed for node {self.node_id}: {e}")
-            self.state = NodeState.UNHEALTHY
+            if self.state not in LEAVING_STATES:
+                self.state = NodeState.UNHEALTHY
             raise
     
     async def drain(self):
@@ -174,64 +465,242 @@ class HeadyNode:
         if self.state != NodeState.DRAINING:
             await self.drain()
         self.state = NodeState.TERMINATED
+        if self.slot is not None:
+            self.store.release(self.node_id)
+            self.slot = None
+
+def _classify_pattern(n: int, trend_coeff: float, dominant_freq_idx: int,
+                      dominant_power: float, total_power: float,
+                      amplitude: float) -> WorkloadPattern:
+    """Turn spectral summary statistics of an n-sample window into a WorkloadPattern"""
+    dominant_freq = dominant_freq_idx * (1.0 / n)  # same rounding as np.fft.fftfreq
+    
+    # Calculate pattern characteristics
+    if dominant_freq > 0:
+        period = 1 / dominant_freq
+        pattern_type = "periodic"
+    else:
+        period = None
+        if trend_coeff > 0.5:
+            pattern_type = "burst"
+        elif abs(trend_coeff) < 0.1:
+            pattern_type = "steady"
+        else:
+            pattern_type = "declining"
+    
+    confidence = min(1.0, dominant_power / total_power * 10) if total_power > 0 else 0
+    
+    return WorkloadPattern(
+        pattern_type=pattern_type,
+        period_seconds=period,
+        amplitude=amplitude,
+        trend=trend_coeff,
+        confidence=confidence
+    )
+
+def _spectral_pattern(metrics: Union[List[float], np.ndarray]) -> WorkloadPattern:
+    """Polyfit-detrended FFT pattern of a whole window"""
+    if len(metrics) < 10:
+        return WorkloadPattern(
+            pattern_type="unknown",
+            period_seconds=None,
+            amplitude=0,
+            trend=0,
+            confidence=0
+        )
+    
+    # Convert to numpy array
+    data = np.asarray(metrics, dtype=np.float64)
+    
+    # Detrend data
+    x = np.arange(len(data))
+    trend_coeff = np.polyfit(x, data, 1)[0]
+    detrended = data - np.polyval([trend_coeff, 0], x)
+    
+    # FFT for frequency analysis
+    fft = np.fft.fft(detrended)
+    
+    # Find dominant frequency
+    power = np.abs(fft) ** 2
+    dominant_freq_idx = np.argmax(power[1:len(power)//2]) + 1
+    
+    return _classify_pattern(
+        len(data), trend_coeff, dominant_freq_idx,
+        power[dominant_freq_idx], np.sum(power), np.std(detrended)
+    )
+
+class SlidingSpectrum:
+    """Incrementally maintained detrended spectrum of the last `size` samples.
+    
+    Tracks DFT bins 1..size/2-1 with the sliding DFT recurrence
+    X_k <- (X_k - x_old + x_new) * e^(2*pi*i*k/size) and keeps running sums
+    for the linear trend, so each new sample costs O(k) instead of a polyfit
+    plus full FFT. Detrending is applied in the frequency domain (the ramp's
+    spectrum is precomputed) and amplitude/total power come from the sums via
+    Parseval, which makes pattern() match ResonanceAnalyzer.detect_pattern.
+    The spectrum is recomputed exactly once per window to cancel float drift.
+    """
+    
+    def __init__(self, size: int):
+        self.size = size
+        self.count = 0
+        self._bins = np.arange(1, size // 2)
+        self._twiddle = np.exp(2j * np.pi * self._bins / size)
+        self._ramp = np.fft.fft(np.arange(size, dtype=np.float64))[self._bins]
+        self._sum_x = size * (size - 1) / 2
+        self._sum_xx = (size - 1) * size * (2 * size - 1) / 6
+        self._buffer = np.zeros(size, dtype=np.float64)
+        self._head = 0
+        self._spectrum = np.zeros(len(self._bins), dtype=np.complex128)
+        self._sum_y = 0.0
+        self._sum_yy = 0.0
+        self._sum_xy = 0.0
+        self._since_resync = 0
+    
+    def values(self) -> np.ndarray:
+        """Current window, oldest first"""
+        if self.count < self.size:
+            return self._buffer[:self.count].copy()
+        return np.concatenate((self._buffer[self._head:], self._buffer[:self._head]))
+    
+    def push(self, value: float):
+        value = float(value)
+        if self.count < self.size:
+            self._buffer[self.count] = value
+            self.count += 1
+            if self.count == self.size:
+                self._resync()
+            return
+        
+        old = self._buffer[self._head]
+        self._buffer[self._head] = value
+        self._head = (self._head + 1) % self.size
+        self.count += 1
+        
+        self._spectrum = (self._spectrum + (value - old)) * self._twiddle
+        # Indices shift down by one as the window slides
+        self._sum_xy += -(self._sum_y - old) + (self.size - 1) * value
+        self._sum_y += value - old
+        self._sum_yy += value * value - old * old
+        
+        self._since_resync += 1
+        if self._since_resync >= self.size:
+            self._resync()
+    
+    def _resync(self):
+        window = self.values()
+        self._spectrum = np.fft.fft(window)[self._bins]
+        self._sum_y = float(window.sum())
+        self._sum_yy = float(window @ window)
+        self._sum_xy = float(np.arange(self.size) @ window)
+        self._since_resync = 0
+    
+    def pattern(self) -> WorkloadPattern:
+        if self.count < self.size:
+            # Still filling: fall back to the direct computation on what we have
+            return _spectral_pattern(self.values())
+        
+        n = self.size
+        trend_coeff = (n * self._sum_xy - self._sum_x * self._sum_y) / (n * self._sum_xx - self._sum_x ** 2)
+        power = np.abs(self._spectrum - trend_coeff * self._ramp) ** 2
+        dominant = int(np.argmax(power))
+        
+        # Sums of the detrended series d_i = y_i - trend * i
+        sum_d = self._sum_y - trend_coeff * self._sum_x
+        sum_dd = self._sum_yy - 2 * trend_coeff * self._sum_xy + trend_coeff ** 2 * self._sum_xx
+        amplitude = float(np.sqrt(max(0.0, sum_dd / n - (sum_d / n) ** 2)))
+        
+        return _classify_pattern(
+            n, trend_coeff, int(self._bins[dominant]),
+            float(power[dominant]), n * sum_dd, amplitude
+        )
 
 class ResonanceAnalyzer:
     """Implements HeadyResonance pattern - treats system as waveforms"""
     
     def __init__(self, sample_window: int = 100):
         self.sample_window = sample_window
+        # Per-series incremental state: key -> (spectrum, samples seen, cached pattern)
+        self._tracked: Dict[str, Tuple[SlidingSpectrum, int, Optional[WorkloadPattern]]] = {}
         
-    def detect_pattern(self, metrics: List[float]) -> WorkloadPattern:
+    def detect_pattern(self, metrics: Union[List[float], np.ndarray]) -> WorkloadPattern:
         """Detect workload patterns using spectral analysis"""
-        if len(metrics) < 10:
-            return WorkloadPattern(
-                pattern_type="unknown",
-                period_seconds=None,
-                amplitude=0,
-                trend=0,
-                confidence=0
-            )
-        
-        # Convert to numpy array
-        data = np.array(metrics)
-        
-        # Detrend data
-        x = np.arange(len(data))
-        trend_coeff = np.polyfit(x, data, 1)[0]
-        detrended = data - np.polyval([trend_coeff, 0], x)
+        return _spectral_pattern(metrics)
+    
+    def detect_patterns(self, windows: Union[np.ndarray, List[np.ndarray]]) -> List[WorkloadPattern]:
+        """detect_pattern for many series at once.
         
-        # FFT for frequency analysis
-        fft = np.fft.fft(detrended)
-        frequencies = np.fft.fftfreq(len(detrended))
+        Accepts a (series x window) matrix or a list of windows; windows are
+        grouped by length and each group is detrended and transformed in one
+        vectorized FFT along the rows. Results keep the input order.
+        """
+        groups: Dict[int, List[int]] = {}
+        if isinstance(windows, np.ndarray) and windows.ndim == 2:
+            groups[windows.shape[1]] = list(range(windows.shape[0]))
+        else:
+            for i, window in enumerate(windows):
+                groups.setdefault(len(window), []).append(i)
         
-        # Find dominant frequency
-        power = np.abs(fft) ** 2
-        dominant_freq_idx = np.argmax(power[1:len(power)//2]) + 1
-        dominant_freq = frequencies[dominant_freq_idx]
+        patterns: List[Optional[WorkloadPattern]] = [None] * len(windows)
+        for n, indices in groups.items():
+            if n < 10:
+                for i in indices:
+                    patterns[i] = _spectral_pattern(windows[i])
+                continue
+            
+            if len(groups) == 1:
+                data = np.asarray(windows, dtype=np.float64)
+            else:
+                data = np.stack([np.asarray(windows[i], dtype=np.float64) for i in indices])
+            
+            # Row-wise least-squares trend in closed form
+            x = np.arange(n, dtype=np.float64)
+            sum_x, sum_xx = x.sum(), x @ x
+            trend = (n * (data @ x) - sum_x * data.sum(axis=1)) / (n * sum_xx - sum_x ** 2)
+            detrended = data - trend[:, None] * x
+            
+            # Bins 1..n/2-1 of the real FFT equal those of the full FFT; total power via Parseval
+            power = np.abs(np.fft.rfft(detrended, axis=1)) ** 2
+            dominant = np.argmax(power[:, 1:n // 2], axis=1) + 1
+            dominant_power = power[np.arange(len(indices)), dominant]
+            total_power = n * np.einsum("ij,ij->i", detrended, detrended)
+            amplitude = detrended.std(axis=1)
+            
+            for row, i in enumerate(indices):
+                patterns[i] = _classify_pattern(
+                    n, float(trend[row]), int(dominant[row]),
+                    float(dominant_power[row]), float(total_power[row]), float(amplitude[row])
+                )
+        return patterns
+    
+    def track_pattern(self, key: str, window: np.ndarray, total: int) -> WorkloadPattern:
+        """Incremental detect_pattern for a series identified by `key`.
         
-        # Calculate pattern characteristics
-        if dominant_freq > 0:
-            period = 1 / dominant_freq
-            pattern_type = "periodic"
-        else:
-            period = None
-            if trend_coeff > 0.5:
-                pattern_type = "burst"
-            elif abs(trend_coeff) < 0.1:
-                pattern_type = "steady"
+        `window` holds the latest samples and `total` counts every sample ever
+        appended to the series; only samples not seen on the previous call are
+        pushed (O(k) each) and the result is cached until `total` changes.
+        """
+        tracked = self._tracked.get(key)
+        if tracked is not None:
+            spectrum, seen, cached = tracked
+            new = total - seen
+            if new == 0 and cached is not None:
+                return cached
+            if 0 <= new <= min(len(window), spectrum.size):
+                for value in window[len(window) - new:]:
+                    spectrum.push(value)
             else:
-                pattern_type = "declining"
+                tracked = None
         
-        amplitude = np.std(detrended)
-        confidence = min(1.0, power[dominant_freq_idx] / np.sum(power) * 10)
+        if tracked is None:
+            # First sight of the series, or too far behind to catch up incrementally
+            spectrum = SlidingSpectrum(self.sample_window)
+            for value in window[-self.sample_window:]:
+                spectrum.push(value)
         
-        return WorkloadPattern(
-            pattern_type=pattern_type,
-            period_seconds=period,
-            amplitude=amplitude,
-            trend=trend_coeff,
-            confidence=confidence
-        )
+        pattern = spectrum.pattern()
+        self._tracked[key] = (spectrum, total, pattern)
+        return pattern
     
     def calculate_phase_shift(self, pattern: WorkloadPattern) -> float:
         """Calculate optimal phase shift to avoid destructive interference"""
@@ -241,13 +710,450 @@ class ResonanceAnalyzer:
         # Use golden ratio for optimal phase shifting
         return pattern.period_seconds / PHI
 
+@dataclass
+class PhasePlacement:
+    """Where and how late a periodic workload runs"""
+    workload_id: str
+    node_id: str
+    period_seconds: float
+    offset_seconds: float
+
+@dataclass
+class PlacementReport:
+    """Peak aggregate load of a recorded window under different placements"""
+    baseline_peak: float  # as recorded
+    golden_ratio_peak: float  # every workload shifted by calculate_phase_shift
+    placed_peak: float  # PhasePlacementEngine offsets
+    reduction_percent: float
+    placements: Dict[str, PhasePlacement]
+
+class PhasePlacementEngine:
+    """Staggers periodic workloads so their peaks don't coincide.
+    
+    Load is 100 - health per sample. Periodic workloads (recorded series the
+    batched ResonanceAnalyzer detection finds periodic, or recurring
+    DeferredTasks) are placed largest amplitude first, each on the node and
+    delay within one period that minimise the cluster's peak aggregate load,
+    then the host's own peak and total load; a few passes re-place each
+    workload against all the others. Offsets are evaluated by replaying the
+    series shifted circularly over the window.
+    """
+    
+    def __init__(self, analyzer: Optional[ResonanceAnalyzer] = None,
+                 min_strength: float = 0.5, refine_passes: int = 3):
+        self.analyzer = analyzer or ResonanceAnalyzer()
+        self.min_strength = min_strength
+        self.refine_passes = refine_passes
+    
+    def _loads(self, health_series: Dict[str, np.ndarray]) -> Tuple[List[str], np.ndarray]:
+        ids = list(health_series)
+        length = min(len(series) for series in health_series.values())
+        loads = np.array([100.0 - np.asarray(health_series[i], dtype=np.float64)[-length:] for i in ids])
+        return ids, loads
+    
+    def _periodic(self, ids: List[str], loads: np.ndarray) -> Dict[int, int]:
+        """Row index -> period in samples for workloads worth shifting.
+        
+        Periods come from the analyzer; strength is the dominant bin's share of
+        the mean-removed power. (WorkloadPattern.confidence counts the DC term,
+        which for health hovering around 80 swamps any cycle.)
+        """
+        window = loads.shape[1]
+        power = np.abs(np.fft.rfft(loads - loads.mean(axis=1, keepdims=True), axis=1)) ** 2
+        ac_power = power[:, 1:].sum(axis=1)
+        periods = {}
+        for row, pattern in enumerate(self.analyzer.detect_patterns(100.0 - loads)):
+            if pattern.pattern_type != "periodic" or ac_power[row] <= 0:
+                continue
+            period = int(round(pattern.period_seconds))
+            strength = power[row, int(round(window / pattern.period_seconds))] / ac_power[row]
+            if 2 <= period <= window and strength >= self.min_strength:
+                periods[row] = period
+        return periods
+    
+    @staticmethod
+    def _shifted(load: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        """(offsets x window) matrix of `load` delayed by each offset, wrapping"""
+        t = np.arange(len(load))
+        return load[(t[None, :] - offsets[:, None]) % len(load)]
+    
+    def place(self, health_series: Dict[str, np.ndarray], sample_interval: float = 1.0,
+              hosts: Optional[List[str]] = None) -> Dict[str, PhasePlacement]:
+        """Placement for each periodic workload; without `hosts` they stay where they are"""
+        if len(health_series) < 2:
+            return {}
+        ids, loads = self._loads(health_series)
+        return self._place(ids, loads, self._periodic(ids, loads), sample_interval, hosts)
+    
+    def _place(self, ids: List[str], loads: np.ndarray, periods: Dict[int, int],
+               sample_interval: float, hosts: Optional[List[str]]) -> Dict[str, PhasePlacement]:
+        if not periods:
+            return {}
+        window = loads.shape[1]
+        fixed_rows = [row for row in range(len(ids)) if row not in periods]
+        cluster = loads[fixed_rows].sum(axis=0) if fixed_rows else np.zeros(window)
+        host_load: Dict[str, np.ndarray] = {}
+        if hosts is not None:
+            host_load = {host: np.zeros(window) for host in hosts}
+            for row in fixed_rows:
+                if ids[row] in host_load:
+                    host_load[ids[row]] += loads[row]
+        
+        order = sorted(periods, key=lambda row: -np.ptp(loads[row]))
+        assigned: Dict[int, Tuple[str, int]] = {}
+        for sweep in range(1 + self.refine_passes):
+            moved = False
+            for row in order:
+                shifted = self._shifted(loads[row], np.arange(periods[row]))
+                if row in assigned:
+                    host, offset = assigned[row]
+                    cluster -= shifted[offset]
+                    if hosts is not None:
+                        host_load[host] -= shifted[offset]
+                cluster_peaks = (cluster[None, :] + shifted).max(axis=1)
+                
+                if hosts is None:
+                    # Stable tie-break towards the smallest delay
+                    choice = (ids[row], int(np.argmin(cluster_peaks)))
+                else:
+                    best = None
+                    for host in hosts:
+                        host_peaks = (host_load[host][None, :] + shifted).max(axis=1)
+                        offset = int(np.lexsort((host_peaks, cluster_peaks))[0])
+                        # Equal peaks: the host with the least work overall
+                        key = (cluster_peaks[offset], host_peaks[offset], float(host_load[host].sum()))
+                        if best is None or key < best[0]:
+                            best = (key, (host, offset))
+                    choice = best[1]
+                
+                moved |= assigned.get(row) != choice
+                assigned[row] = choice
+                cluster += shifted[choice[1]]
+                if hosts is not None:
+                    host_load[choice[0]] += shifted[choice[1]]
+            if not moved:
+                break
+        
+        return {
+            ids[row]: PhasePlacement(
+                workload_id=ids[row],
+                node_id=host,
+                period_seconds=periods[row] * sample_interval,
+                offset_seconds=offset * sample_interval,
+            )
+            for row, (host, offset) in assigned.items()
+        }
+    
+    def simulate(self, health_series: Dict[str, np.ndarray], sample_interval: float = 1.0,
+                 hosts: Optional[List[str]] = None) -> PlacementReport:
+        """Replay recorded health series under each placement and compare peak load"""
+        if len(health_series) < 2:
+            return PlacementReport(0.0, 0.0, 0.0, 0.0, {})
+        ids, loads = self._loads(health_series)
+        return self._report(ids, loads, self._periodic(ids, loads), sample_interval, hosts)
+    
+    def place_recurring(self, tasks: List["DeferredTask"], health_series: Dict[str, np.ndarray],
+                        sample_interval: float, hosts: List[str],
+                        now: Optional[float] = None) -> PlacementReport:
+        """Hosts and phase offsets for recurring DeferredTasks over the nodes' recorded load.
+        
+        Each task's load profile is `task.load` while it runs, on the epoch
+        grid of its period (which is when it runs with phase_offset 0); the
+        recorded node loads stay fixed on their hosts. Offsets are multiples
+        of sample_interval.
+        """
+        now = time.time() if now is None else now
+        recurring = [
+            (task, int(round(task.period / sample_interval)))
+            for task in tasks if task.period
+        ]
+        recurring = [(task, period) for task, period in recurring if period >= 2]
+        if not recurring or not hosts:
+            return PlacementReport(0.0, 0.0, 0.0, 0.0, {})
+        
+        background = [np.asarray(series, dtype=np.float64) for series in health_series.values()]
+        window = max([2 * period for _, period in recurring] +
+                     [min((len(series) for series in background), default=0)])
+        ids = list(health_series)
+        rows = []
+        for series in background:
+            load = 100.0 - series[-window:]
+            # Short histories are padded with their mean so all rows line up in time
+            rows.append(np.pad(load, (window - len(load), 0), constant_values=load.mean() if len(load) else 0.0))
+        
+        times = now - (window - 1 - np.arange(window)) * sample_interval
+        periods = {}
+        for task, period in recurring:
+            periods[len(ids)] = period
+            ids.append(task.task_id)
+            rows.append(np.where(times % task.period < task.duration, task.load, 0.0))
+        return self._report(ids, np.array(rows), periods, sample_interval, hosts)
+    
+    def _report(self, ids: List[str], loads: np.ndarray, periods: Dict[int, int],
+                sample_interval: float, hosts: Optional[List[str]]) -> PlacementReport:
+        placements = self._place(ids, loads, periods, sample_interval, hosts)
+        
+        def peak(offsets: Dict[int, int]) -> float:
+            total = np.zeros(loads.shape[1])
+            for row, load in enumerate(loads):
+                total += np.roll(load, offsets.get(row, 0))
+            return float(total.max())
+        
+        baseline = peak({})
+        golden = {}
+        for i, row in enumerate(periods):
+            # Successive golden-ratio shifts from ResonanceAnalyzer.calculate_phase_shift
+            pattern = WorkloadPattern("periodic", float(periods[row]), 0.0, 0.0, 1.0)
+            golden[row] = int(round(i * self.analyzer.calculate_phase_shift(pattern))) % periods[row]
+        placed = peak({
+            ids.index(workload_id): int(round(p.offset_seconds / sample_interval))
+            for workload_id, p in placements.items()
+        })
+        return PlacementReport(
+            baseline_peak=round(baseline, 2),
+            golden_ratio_peak=round(peak(golden), 2),
+            placed_peak=round(placed, 2),
+            reduction_percent=round(100 * (1 - placed / baseline), 2) if baseline > 0 else 0.0,
+            placements=placements,
+        )
+
+@dataclass
+class ScalingDecision:
+    """Outcome of one PredictiveAutoscaler evaluation"""
+    action: ScalingAction
+    target_nodes: int
+    forecast_peak: float  # projected total load, in health points across the cluster
+    period: Optional[int]
+    reason: str
+
+class HoltWintersForecaster:
+    """Additive Holt-Winters smoothing (Holt's linear method when no season is known)"""
+    
+    def __init__(self, alpha: float = 0.5, beta: float = 0.1, gamma: float = 0.3):
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+    
+    def forecast(self, series: Union[List[float], np.ndarray], horizon: int,
+                 period: Optional[int] = None) -> np.ndarray:
+        """Project `horizon` steps past the end of `series`"""
+        y = np.asarray(series, dtype=np.float64)
+        if len(y) == 0:
+            return np.zeros(horizon)
+        if len(y) < 2:
+            return np.full(horizon, y[-1])
+        
+        seasonal_fit = period is not None and period >= 2 and len(y) >= 2 * period
+        if seasonal_fit:
+            first, second = y[:period], y[period:2 * period]
+            level = first.mean()
+            trend = (second.mean() - first.mean()) / period
+            season = list(first - level)
+        else:
+            level, trend = y[0], y[1] - y[0]
+            season = []
+        
+        a, b, g = self.alpha, self.beta, self.gamma
+        for t in range(1, len(y)):
+            s = season[t % period] if seasonal_fit else 0.0
+            previous_level = level
+            level = a * (y[t] - s) + (1 - a) * (level + trend)
+            trend = b * (level - previous_level) + (1 - b) * trend
+            if seasonal_fit:
+                season[t % period] = g * (y[t] - level) + (1 - g) * s
+        
+        steps = np.arange(1, horizon + 1)
+        projection = level + steps * trend
+        if seasonal_fit:
+            projection += np.array([season[(len(y) - 1 + h) % period] for h in steps])
+        return projection
+
+class PredictiveAutoscaler:
+    """Computes a target node count from forecasted cluster load.
+    
+    Load is measured in health points (node_count * (100 - avg_health)); the
+    target is the node count that keeps the forecast peak over the next
+    `horizon` ticks at target_health. Scaling down additionally requires the
+    current size to exceed the target even with `hysteresis` headroom, and
+    each direction has its own cooldown.
+    """
+    
+    def __init__(self, target_health: float = 75, min_nodes: int = 1, max_nodes: int = 10,
+                 horizon: int = 6, hysteresis: float = 0.2,
+                 scale_up_cooldown: float = 30.0, scale_down_cooldown: float = 300.0,
+                 seasonal_confidence: float = 0.5,
+                 forecaster: Optional[HoltWintersForecaster] = None):
+        self.target_health = target_health
+        self.min_nodes = min_nodes
+        self.max_nodes = max_nodes
+        self.horizon = horizon
+        self.hysteresis = hysteresis
+        self.scale_up_cooldown = scale_up_cooldown
+        self.scale_down_cooldown = scale_down_cooldown
+        self.seasonal_confidence = seasonal_confidence
+        self.forecaster = forecaster or HoltWintersForecaster()
+        self.last_scale_up = float("-inf")
+        self.last_scale_down = float("-inf")
+    
+    def clone(self) -> "PredictiveAutoscaler":
+        """Same settings, fresh cooldown state (for simulations)"""
+        return PredictiveAutoscaler(
+            self.target_health, self.min_nodes, self.max_nodes, self.horizon, self.hysteresis,
+            self.scale_up_cooldown, self.scale_down_cooldown, self.seasonal_confidence, self.forecaster
+        )
+    
+    def seasonal_period(self, pattern: WorkloadPattern, samples: int) -> Optional[int]:
+        """Season length in ticks when the detected pattern is trustworthy enough to model"""
+        if pattern.pattern_type != "periodic" or not pattern.period_seconds:
+            return None
+        if pattern.confidence < self.seasonal_confidence:
+            return None
+        period = int(round(pattern.period_seconds))
+        return period if 2 <= period <= samples // 2 else None
+    
+    def _nodes_for(self, load: float) -> int:
+        per_node = max(1e-9, 100 - self.target_health)
+        return int(np.clip(math.ceil(load / per_node), self.min_nodes, self.max_nodes))
+    
+    def decide(self, load: Union[List[float], np.ndarray], current_nodes: int, now: float,
+               period: Optional[int] = None) -> ScalingDecision:
+        load = np.asarray(load, dtype=np.float64)
+        forecast = self.forecaster.forecast(load, self.horizon, period)
+        peak = float(max(forecast.max(initial=0.0), load[-1] if len(load) else 0.0))
+        target = self._nodes_for(peak)
+        
+        if target > current_nodes:
+            if now - self.last_scale_up < self.scale_up_cooldown:
+                return ScalingDecision(ScalingAction.MAINTAIN, current_nodes, peak, period, "scale-up cooldown")
+            self.last_scale_up = now
+            return ScalingDecision(ScalingAction.SCALE_UP, target, peak, period, "forecast above capacity")
+        
+        if target < current_nodes:
+            # Only shrink to a size that still fits the peak with hysteresis headroom
+            target = max(target, self._nodes_for(peak * (1 + self.hysteresis)))
+            if target >= current_nodes:
+                return ScalingDecision(ScalingAction.MAINTAIN, current_nodes, peak, period, "within hysteresis band")
+            if now - max(self.last_scale_down, self.last_scale_up) < self.scale_down_cooldown:
+                return ScalingDecision(ScalingAction.MAINTAIN, current_nodes, peak, period, "scale-down cooldown")
+            self.last_scale_down = now
+            return ScalingDecision(ScalingAction.SCALE_DOWN, target, peak, period, "forecast below capacity")
+        
+        return ScalingDecision(ScalingAction.MAINTAIN, current_nodes, peak, period, "at target")
+
+RUNNING_STATES = (NodeState.HEALTHY, NodeState.DEGRADED, NodeState.UNHEALTHY)
+SERVING_STATES = (NodeState.HEALTHY, NodeState.DEGRADED)
+LEAVING_STATES = (NodeState.DRAINING, NodeState.TERMINATED)  # being removed on purpose
+
+class NodeRegistry(MutableMapping):
+    """node_id -> HeadyNode mapping with secondary indexes.
+    
+    Nodes report state transitions and health updates back to the registry,
+    which keeps a set of node ids per NodeState, a set per node type and a
+    min-heap of running mean health. Heap entries are invalidated lazily by
+    a per-node version number and the heap is rebuilt when stale entries
+    outnumber live ones, so least-healthy lookups cost O(log n) per node
+    returned.
+    """
+    
+    def __init__(self, on_state_change: Optional[Callable[[HeadyNode, NodeState], None]] = None):
+        self.on_state_change = on_state_change
+        self._nodes: Dict[str, HeadyNode] = {}
+        self._by_state: Dict[NodeState, Set[str]] = {state: set() for state in NodeState}
+        self._by_type: Dict[str, Set[str]] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._versions: Dict[str, int] = {}
+    
+    def __getitem__(self, node_id: str) -> HeadyNode:
+        return self._nodes[node_id]
+    
+    def __setitem__(self, node_id: str, node: HeadyNode):
+        if node_id in self._nodes:
+            del self[node_id]
+        self._nodes[node_id] = node
+        node.registry = self
+        self._by_state[node.state].add(node_id)
+        self._by_type.setdefault(node.node_type, set()).add(node_id)
+        self._versions[node_id] = 0
+        self.health_changed(node)
+    
+    def __delitem__(self, node_id: str):
+        node = self._nodes.pop(node_id)
+        node.registry = None
+        self._by_state[node.state].discard(node_id)
+        self._by_type[node.node_type].discard(node_id)
+        # Outstanding heap entries become stale
+        self._versions.pop(node_id, None)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._nodes)
+    
+    def __len__(self) -> int:
+        return len(self._nodes)
+    
+    def in_state(self, *states: NodeState) -> Set[str]:
+        """Ids of nodes currently in any of `states` (a copy, safe to iterate while changing)"""
+        if len(states) == 1:
+            return set(self._by_state[states[0]])
+        return set().union(*(self._by_state[state] for state in states))
+    
+    def count(self, *states: NodeState) -> int:
+        return sum(len(self._by_state[state]) for state in states)
+    
+    def of_type(self, node_type: str) -> Set[str]:
+        return set(self._by_type.get(node_type, ()))
+    
+    def state_changed(self, node: HeadyNode, previous: NodeState):
+        if self._nodes.get(node.node_id) is node:
+            self._by_state[previous].discard(node.node_id)
+            self._by_state[node.state].add(node.node_id)
+            if self.on_state_change is not None:
+                self.on_state_change(node, previous)
+    
+    def health_changed(self, node: HeadyNode):
+        mean = node.mean_health
+        if mean is None or node.node_id not in self._versions:
+            return
+        version = self._versions[node.node_id] + 1
+        self._versions[node.node_id] = version
+        heapq.heappush(self._heap, (mean, version, node.node_id))
+        if len(self._heap) > 2 * len(self._nodes) + 64:
+            self._rebuild_heap()
+    
+    def _rebuild_heap(self):
+        self._heap = [
+            entry for entry in self._heap
+            if self._versions.get(entry[2]) == entry[1]
+        ]
+        heapq.heapify(self._heap)
+    
+    def least_healthy(self, count: int, states: Tuple[NodeState, ...] = RUNNING_STATES,
+                      exclude: Optional[Any] = None) -> List[str]:
+        """Up to `count` node ids with the lowest mean health among `states`"""
+        found: List[str] = []
+        skipped: List[Tuple[float, int, str]] = []
+        while self._heap and len(found) < count:
+            entry = heapq.heappop(self._heap)
+            _, version, node_id = entry
+            if self._versions.get(node_id) != version:
+                continue  # superseded or removed
+            skipped.append(entry)
+            if self._nodes[node_id].state in states and not (exclude and node_id in exclude):
+                found.append(node_id)
+        for entry in skipped:
+            heapq.heappush(self._heap, entry)
+        return found
+
 class DynamicOrchestrator:
     """Main orchestration engine with auto-scaling and failover"""
     
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.nodes: Dict[str, HeadyNode] = {}
+        self.nodes = NodeRegistry(on_state_change=self._node_state_changed)
         self.resonance_analyzer = ResonanceAnalyzer()
+        self.health_sampler = HealthSampler(
+            interval=config.get("sample_interval", 1.0),
+            history_size=config.get("sample_history", 300)
+        )
         
         # Scaling parameters
         self.min_nodes = config.get("min_nodes", 1)
@@ -256,13 +1162,92 @@ class DynamicOrchestrator:
         self.scale_up_threshold = config.get("scale_up_threshold", 80)
         self.scale_down_threshold = config.get("scale_down_threshold", 30)
         
-        # Metrics tracking
-        self.cluster_metrics_history = deque(maxlen=1000)
+        # Metrics tracking: one columnar store for every node, one for cluster aggregates
+        self.metrics_store = MetricsRingStore(
+            NODE_METRIC_COLUMNS,
+            capacity=config.get("metrics_history", 1000)
+        )
+        self.cluster_metrics_history = MetricsRingStore(
+            CLUSTER_METRIC_COLUMNS,
+            capacity=config.get("cluster_metrics_history", 1000),
+            initial_series=1
+        )
+        self.cluster_slot = self.cluster_metrics_history.allocate("cluster")
         self.scaling_history = deque(maxlen=100)
         
-    async def provision_node(self, node_type: str = "worker") -> HeadyNode:
-        """Provision a new node"""
-        node_id = f"{node_type}-{hashlib.md5(str(time.time()).encode()).hexdigest()[:8]}"
+        # Provisioning pipeline
+        self.scale_step = config.get("scale_step", int(PHI))
+        self.provision_parallelism = config.get("provision_parallelism", 4)
+        self.provision_timeout = config.get("provision_timeout", 30.0)
+        self.deprovision_timeout = config.get("deprovision_timeout", 60.0)
+        self._provision_slots = asyncio.Semaphore(self.provision_parallelism)
+        self._node_sequence = itertools.count()
+        self._failovers: Dict[str, asyncio.Task] = {}
+        self._replacements: Dict[str, str] = {}  # failed node id -> replacement node id
+        
+        # Forecast-driven scaling; the threshold rules remain as fallback until enough history exists
+        self.predictive_scaling = config.get("predictive_scaling", True)
+        self.forecast_min_history = config.get("forecast_min_history", 20)
+        self.tick_seconds = config.get("tick_seconds", 10.0)
+        self.autoscaler = PredictiveAutoscaler(
+            target_health=self.target_health,
+            min_nodes=self.min_nodes,
+            max_nodes=self.max_nodes,
+            horizon=config.get("forecast_horizon", 6),
+            hysteresis=config.get("scale_hysteresis", 0.2),
+            scale_up_cooldown=config.get("scale_up_cooldown", 30.0),
+            scale_down_cooldown=config.get("scale_down_cooldown", 300.0),
+            forecaster=HoltWintersForecaster(
+                alpha=config.get("forecast_alpha", 0.5),
+                beta=config.get("forecast_beta", 0.1),
+                gamma=config.get("forecast_gamma", 0.3)
+            )
+        )
+        self.scaling_target: Optional[int] = None
+        self.last_scaling_decision: Optional[ScalingDecision] = None
+        
+        # Event-driven loop: independent cadences plus immediate reactions to node events
+        self.metrics_interval = config.get("metrics_interval", 10.0)
+        self.scaling_interval = config.get("scaling_interval", 10.0)
+        self.placement_interval = config.get("placement_interval", 100.0)
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._pending: Set[Tuple[OrchestratorEvent, Optional[str]]] = set()
+        self._loop_running = False
+        self._scaling_task: Optional[asyncio.Task] = None
+        self.last_cluster_metrics: Dict[str, Any] = {}
+        
+        # Running counters for the metrics exporter
+        self.scaling_counters: Dict[str, int] = {action.value: 0 for action in ScalingAction}
+        self.nodes_provisioned = 0
+        self.nodes_deprovisioned = 0
+        self.loop_errors = 0
+        # Handling time per event kind; failover and scaling count until their background task ends
+        self.loop_durations: Dict[str, DurationHistogram] = {
+            event.value: DurationHistogram() for event in OrchestratorEvent if event != OrchestratorEvent.STOP
+        }
+        self.event_counts: Dict[str, int] = {event.value: 0 for event in OrchestratorEvent}
+        self.placement_engine = PhasePlacementEngine(self.resonance_analyzer)
+        self.placement_report: Optional[PlacementReport] = None
+        self.tempo_optimizer = TempoOptimizer(tariff=config.get("energy_tariff"))
+        # Current energy price, polled every metrics sweep: a callable returning a
+        # price, an awaitable of one, or None when nothing new is known
+        self.energy_price_source: Optional[Callable[[], Union[Optional[float], Awaitable[Optional[float]]]]] = \
+            config.get("energy_price_source")
+        self.task_scheduler = DeferredTaskScheduler(self.tempo_optimizer)
+        self.metrics_exporter: Optional[MetricsExporter] = None
+        if config.get("metrics_port") is not None:
+            self.metrics_exporter = MetricsExporter(
+                self,
+                host=config.get("metrics_host", "0.0.0.0"),
+                port=config["metrics_port"]
+            )
+        
+    async def provision_node(self, node_type: str = "worker",
+                             replacing: Optional[str] = None) -> HeadyNode:
+        """Provision a new node (as the failover replacement for `replacing`, if given)"""
+        # The sequence number keeps ids unique when several nodes start in the same instant
+        seed = f"{time.time()}-{next(self._node_sequence)}"
+        node_id = f"{node_type}-{hashlib.md5(seed.encode()).hexdigest()[:8]}"
         
         node_config = {
             "type": node_type,
@@ -274,11 +1259,20 @@ class DynamicOrchestrator:
             "capabilities": self._get_node_capabilities(node_type)
         }
         
-        node = HeadyNode(node_id, node_type, node_config)
+        node = HeadyNode(node_id, node_type, node_config,
+                         sampler=self.health_sampler, store=self.metrics_store)
         self.nodes[node_id] = node
+        if replacing is not None:
+            self._replacements[replacing] = node_id
         
         # Initialize node
-        await asyncio.sleep(2)  # Simulated provisioning time
+        try:
+            await asyncio.sleep(2)  # Simulated provisioning time
+        except asyncio.CancelledError:
+            # Timed out or cancelled: do not leave a half-provisioned node registered
+            self.nodes.pop(node_id, None)
+            node.store.release(node_id)
+            raise
         node.state = NodeState.HEALTHY
         
         logger.info(f"Provisioned new node: {node_id}")
@@ -297,15 +1291,58 @@ class DynamicOrchestrator:
     
     async def deprovision_node(self, node_id: str):
         """Deprovision a node"""
-        if node_id not in self.nodes:
+        node = self.nodes.get(node_id)
+        if node is None:
             return
         
-        node = self.nodes[node_id]
         await node.terminate()
-        del self.nodes[node_id]
+        # A concurrent deprovision of the same node may have finished first
+        self.nodes.pop(node_id, None)
         
         logger.info(f"Deprovisioned node: {node_id}")
     
+    async def provision_nodes(self, count: int, node_type: str = "worker") -> List[HeadyNode]:
+        """Provision up to `count` nodes concurrently (at most provision_parallelism at once).
+        
+        Each node gets provision_timeout seconds; failures are logged and the
+        nodes that did come up are returned.
+        """
+        async def provision_one() -> HeadyNode:
+            async with self._provision_slots:
+                return await asyncio.wait_for(self.provision_node(node_type), self.provision_timeout)
+        
+        results = await asyncio.gather(*(provision_one() for _ in range(count)), return_exceptions=True)
+        nodes = [r for r in results if isinstance(r, HeadyNode)]
+        for r in results:
+            if isinstance(r, BaseException):
+                logger.error(f"Provisioning {node_type} node failed: {r!r}")
+        return nodes
+    
+    async def deprovision_nodes(self, node_ids: List[str]) -> List[str]:
+        """Drain and remove nodes concurrently; returns the ids actually removed"""
+        async def deprovision_one(node_id: str):
+            async with self._provision_slots:
+                await asyncio.wait_for(self.deprovision_node(node_id), self.deprovision_timeout)
+        
+        unique_ids = list(dict.fromkeys(node_ids))
+        results = await asyncio.gather(*(deprovision_one(i) for i in unique_ids), return_exceptions=True)
+        removed = []
+        for node_id, r in zip(unique_ids, results):
+            if isinstance(r, BaseException):
+                logger.error(f"Deprovisioning node {node_id} failed: {r!r}")
+            else:
+                removed.append(node_id)
+        return removed
+    
+    def serving_node_ids(self) -> Set[str]:
+        """Nodes that can take traffic: healthy or degraded and not part of a failover"""
+        changing = set(self._failovers) | set(self._replacements.values())
+        return self.nodes.in_state(*SERVING_STATES) - changing
+    
+    def committed_capacity(self) -> int:
+        """Serving nodes plus one for each failover in flight (it brings a replacement)"""
+        return len(self.serving_node_ids()) + len(self._failovers)
+    
     async def collect_cluster_metrics(self) -> Dict[str, Any]:
         """Collect metrics from all nodes"""
         if not self.nodes:
@@ -318,11 +1355,12 @@ class DynamicOrchestrator:
                 "total_requests": 0
             }
         
-        # Collect metrics from all healthy nodes
-        metrics_tasks = []
-        for node in self.nodes.values():
-            if node.state not in [NodeState.TERMINATED, NodeState.DRAINING]:
-                metrics_tasks.append(node.health_check())
+        # Collect metrics from all healthy nodes (nodes still provisioning have nothing to report);
+        # a node being failed over must stay UNHEALTHY, so it is not checked again
+        metrics_tasks = [
+            self.nodes[node_id].health_check()
+            for node_id in self.nodes.in_state(*RUNNING_STATES).difference(self._failovers)
+        ]
         
         node_metrics = await asyncio.gather(*metrics_tasks, return_exceptions=True)
         
@@ -356,22 +1394,56 @@ class DynamicOrchestrator:
             "node_metrics": [asdict(m) for m in valid_metrics]
         }
         
-        self.cluster_metrics_history.append(cluster_metrics)
+        self.cluster_metrics_history.append(self.cluster_slot, (
+            cluster_metrics["node_count"],
+            cluster_metrics["healthy_nodes"],
+            avg_health,
+            total_cpu,
+            total_memory,
+            avg_latency
+        ), time.time())
         return cluster_metrics
     
+    def recorded_load_trace(self) -> np.ndarray:
+        """Cluster load per tick (node_count * (100 - avg_health)) from the metrics history"""
+        frame = self.cluster_metrics_history.frame(self.cluster_slot)
+        columns = self.cluster_metrics_history.columns
+        node_count = frame[columns.index("node_count")].astype(np.float64)
+        avg_health = frame[columns.index("avg_health")].astype(np.float64)
+        return node_count * (100 - avg_health)
+    
     def determine_scaling_action(self, metrics: Dict[str, Any]) -> ScalingAction:
         """Determine if scaling is needed based on metrics"""
+        self.scaling_target = None
         if not metrics or metrics["node_count"] == 0:
             return ScalingAction.SCALE_UP
         
         avg_health = metrics["avg_health"]
         node_count = metrics["node_count"]
         
+        # Forecast-driven target once there is enough history to fit
+        history = self.cluster_metrics_history.total(self.cluster_slot)
+        if self.predictive_scaling and history >= self.forecast_min_history:
+            load = self.recorded_load_trace()[-self.resonance_analyzer.sample_window:]
+            pattern = self.resonance_analyzer.track_pattern("cluster-load", load, history)
+            decision = self.autoscaler.decide(
+                load, self.committed_capacity(), time.monotonic(),
+                self.autoscaler.seasonal_period(pattern, len(load))
+            )
+            self.last_scaling_decision = decision
+            if decision.action != ScalingAction.MAINTAIN:
+                self.scaling_target = decision.target_nodes
+            return decision.action
+        
         # Get recent health scores for pattern analysis
-        recent_health = [m["avg_health"] for m in list(self.cluster_metrics_history)[-100:]]
+        recent_health = self.cluster_metrics_history.window(
+            self.cluster_slot, "avg_health", self.resonance_analyzer.sample_window
+        )
         
-        # Detect workload pattern
-        pattern = self.resonance_analyzer.detect_pattern(recent_health)
+        # Detect workload pattern (incremental; only this tick's sample is new)
+        pattern = self.resonance_analyzer.track_pattern(
+            "cluster", recent_health, self.cluster_metrics_history.total(self.cluster_slot)
+        )
         
         # Predictive scaling based on pattern
         if pattern.pattern_type == "burst" and pattern.trend > 0:
@@ -387,171 +1459,884 @@ class DynamicOrchestrator:
         
         return ScalingAction.MAINTAIN
     
-    async def apply_scaling_action(self, action: ScalingAction):
-        """Apply the determined scaling action"""
+    def simulate_scaling(self, demand: Union[List[float], np.ndarray], policy: str = "predictive",
+                         initial_nodes: Optional[int] = None, provision_ticks: int = 1) -> Dict[str, Any]:
+        """Replay a load trace (e.g. recorded_load_trace()) and score the scaling decisions.
+        
+        Each tick a node carries demand / nodes load points, so its health is
+        100 minus that; new nodes join `provision_ticks` ticks after the
+        decision while removals are immediate. `policy` is "predictive" (the
+        autoscaler with this orchestrator's settings) or "reactive" (the
+        threshold rules with scale_step increments).
+        """
+        if policy not in ("predictive", "reactive"):
+            raise ValueError(f"Unknown scaling policy: {policy}")
+        autoscaler = self.autoscaler.clone()
+        analyzer = ResonanceAnalyzer(self.resonance_analyzer.sample_window)
+        nodes = initial_nodes if initial_nodes is not None else self.min_nodes
+        pending: deque = deque()  # (tick the nodes become ready, count)
+        loads: List[float] = []
+        node_counts: List[int] = []
+        healths: List[float] = []
+        actions = 0
+        reversals = 0
+        last_direction = 0
+        
+        for tick, value in enumerate(np.asarray(demand, dtype=np.float64)):
+            while pending and pending[0][0] <= tick:
+                nodes += pending.popleft()[1]
+            # No capacity at all counts as fully loaded
+            per_node = min(100.0, value / nodes) if nodes > 0 else 100.0
+            loads.append(per_node * max(nodes, 1))
+            node_counts.append(nodes)
+            healths.append(100 - per_node)
+            
+            committed = nodes + sum(count for _, count in pending)
+            target = committed
+            if policy == "predictive":
+                if len(loads) >= self.forecast_min_history:
+                    window = loads[-analyzer.sample_window:]
+                    pattern = analyzer.track_pattern("sim", np.asarray(window), len(loads))
+                    decision = autoscaler.decide(
+                        window, committed, tick * self.tick_seconds,
+                        autoscaler.seasonal_period(pattern, len(window))
+                    )
+                    if decision.action != ScalingAction.MAINTAIN:
+                        target = decision.target_nodes
+            elif healths[-1] < self.scale_down_threshold:
+                target = min(self.max_nodes, committed + self.scale_step)
+            elif healths[-1] > self.scale_up_threshold:
+                target = max(self.min_nodes, committed - 1)
+            
+            if target != committed:
+                direction = 1 if target > committed else -1
+                actions += 1
+                reversals += int(last_direction == -direction)
+                last_direction = direction
+                if direction > 0:
+                    pending.append((tick + provision_ticks, target - committed))
+                else:
+                    nodes -= committed - target
+        
+        health = np.asarray(healths)
+        return {
+            "policy": policy,
+            "ticks": len(health),
+            "node_ticks": int(np.sum(node_counts)),
+            "peak_nodes": int(max(node_counts, default=0)),
+            "mean_health": round(float(health.mean()), 3) if len(health) else 0.0,
+            "min_health": round(float(health.min()), 3) if len(health) else 0.0,
+            "below_target_ticks": int(np.sum(health < self.target_health)),
+            "critical_ticks": int(np.sum(health < self.scale_down_threshold)),
+            "scaling_actions": actions,
+            "direction_reversals": reversals
+        }
+    
+    def plan_scaling(self, action: ScalingAction, target: Optional[int] = None) -> ScalingPlan:
+        """Turn a scaling action (and optional target node count) into nodes to add or remove"""
+        plan = ScalingPlan(action=action)
+        if target is not None:
+            target = int(np.clip(target, self.min_nodes, self.max_nodes))
+        
+        # Capacity is what can serve traffic: failing nodes, their replacements and
+        # nodes still starting or draining don't count, a failover in flight counts once
+        serving = self.serving_node_ids()
+        committed = len(serving) + len(self._failovers)
+        
         if action == ScalingAction.SCALE_UP:
-            # Use golden ratio for scaling increments
-            scale_factor = int(PHI)
-            for _ in range(scale_factor):
-                if len(self.nodes) < self.max_nodes:
-                    await self.provision_node()
+            # Use golden ratio for scaling increments unless a target size is known
+            step = self.scale_step if target is None else target - committed
+            plan.add = max(0, min(step, self.max_nodes - len(self.nodes)))
         
         elif action == ScalingAction.SCALE_DOWN:
-            # Find least healthy node to remove
-            if len(self.nodes) > self.min_nodes:
-                unhealthy_nodes = [
-                    (node.node_id, np.mean(list(node.health_history)))
-                    for node in self.nodes.values()
-                    if node.state != NodeState.TERMINATED
-                ]
-                
-                if unhealthy_nodes:
-                    unhealthy_nodes.sort(key=lambda x: x[1])
-                    await self.deprovision_node(unhealthy_nodes[0][0])
+            # Remove the least healthy serving nodes, never below min_nodes of them
+            step = self.scale_step if target is None else committed - target
+            count = max(0, min(step, len(serving) - self.min_nodes))
+            plan.remove = self.nodes.least_healthy(
+                count, states=SERVING_STATES, exclude=self.nodes.keys() - serving
+            )
+        
+        return plan
+    
+    async def apply_scaling_plan(self, plan: ScalingPlan):
+        """Add and remove the planned nodes concurrently"""
+        added, removed = await asyncio.gather(
+            self.provision_nodes(plan.add, plan.node_type),
+            self.deprovision_nodes(plan.remove)
+        )
+        self.scaling_counters[plan.action.value] += 1
+        self.nodes_provisioned += len(added)
+        self.nodes_deprovisioned += len(removed)
         
         # Log scaling action
         self.scaling_history.append({
             "timestamp": datetime.now(timezone.utc).isoformat(),
-            "action": action.value,
+            "action": plan.action.value,
+            "added": len(added),
+            "removed": len(removed),
             "node_count": len(self.nodes)
         })
     
+    async def apply_scaling_action(self, action: ScalingAction, target: Optional[int] = None):
+        """Apply the determined scaling action"""
+        await self.apply_scaling_plan(self.plan_scaling(action, target))
+    
     async def handle_node_failure(self, failed_node_id: str):
         """Handle node failure with automatic failover"""
-        logger.warning(f"Handling failure for node: {failed_node_id}")
-        
-        if failed_node_id not in self.nodes:
+        failed_node = self.nodes.get(failed_node_id)
+        if failed_node is None or failed_node.state in LEAVING_STATES:
+            # Already removed, or being drained on purpose by scale-down: nothing to replace
             return
-        
-        failed_node = self.nodes[failed_node_id]
+        logger.warning(f"Handling failure for node: {failed_node_id}")
         node_type = failed_node.node_type
         
         # Mark node as unhealthy
         failed_node.state = NodeState.UNHEALTHY
         
         # Provision replacement node
-        replacement = await self.provision_node(node_type)
+        replacement = await asyncio.wait_for(
+            self.provision_node(node_type, replacing=failed_node_id), self.provision_timeout
+        )
+        failed_node = self.nodes.get(failed_node_id)
+        if failed_node is None or failed_node.state in LEAVING_STATES:
+            # Deprovisioned deliberately while the replacement started; don't keep the extra node
+            logger.info(f"Node {failed_node_id} was removed during failover; dropping {replacement.node_id}")
+            await asyncio.wait_for(self.deprovision_node(replacement.node_id), self.deprovision_timeout)
+            return
         
         # Transfer workload (simulated)
         logger.info(f"Migrating workload from {failed_node_id} to {replacement.node_id}")
         await asyncio.sleep(1)
         
         # Deprovision failed node
-        await self.deprovision_node(failed_node_id)
+        await asyncio.wait_for(self.deprovision_node(failed_node_id), self.deprovision_timeout)
+    
+    def start_failover(self, failed_node_id: str) -> asyncio.Task:
+        """Run handle_node_failure in the background; one failover per node at a time"""
+        task = self._failovers.get(failed_node_id)
+        if task is None or task.done():
+            task = asyncio.get_running_loop().create_task(self._run_failover(failed_node_id))
+            self._failovers[failed_node_id] = task
+        return task
+    
+    async def _run_failover(self, failed_node_id: str):
+        try:
+            async with self._provision_slots:
+                await self.handle_node_failure(failed_node_id)
+        except Exception as e:
+            logger.error(f"Failover for node {failed_node_id} failed: {e!r}")
+        finally:
+            self._failovers.pop(failed_node_id, None)
+            self._replacements.pop(failed_node_id, None)
     
     async def optimize_placement(self):
         """Optimize node placement using resonance patterns"""
-        if len(self.nodes) < 2:
+        serving = self.serving_node_ids()
+        if len(serving) < 2:
             return
         
-        # Analyze workload patterns across nodes
-        node_patterns = {}
-        for node in self.nodes.values():
-            if len(node.health_history) > 10:
-                pattern = self.resonance_analyzer.detect_pattern(list(node.health_history))
-                node_patterns[node.node_id] = pattern
-        
-        # Find nodes with periodic patterns
-        periodic_nodes = [
-            (node_id, pattern)
-            for node_id, pattern in node_patterns.items()
-            if pattern.pattern_type == "periodic" and pattern.confidence > 0.7
-        ]
+        # Recorded node load is the fixed background; recurring deferred work is what moves
+        series = {
+            node_id: self.nodes[node_id].health_history
+            for node_id in serving
+            if len(self.nodes[node_id].health_history) > 10
+        }
+        tasks = self.task_scheduler.recurring_tasks()
+        if tasks:
+            report = self.placement_engine.place_recurring(
+                tasks, series, self.metrics_interval, hosts=sorted(serving)
+            )
+            self.task_scheduler.apply_placements(report.placements)
+            for placement in report.placements.values():
+                logger.info(f"Placing recurring task {placement.workload_id} on {placement.node_id} "
+                            f"with a phase shift of {placement.offset_seconds:.2f}s")
+        elif len(series) >= 2:
+            # Nothing movable is scheduled: replay the nodes' own periodic load so the
+            # report shows the peak their workloads would save by staggering
+            report = self.placement_engine.simulate(series, self.metrics_interval)
+            for placement in report.placements.values():
+                logger.info(f"Node {placement.node_id}: delaying its periodic load by "
+                            f"{placement.offset_seconds:.2f}s would lower the cluster peak")
+        else:
+            return
+        self.placement_report = report
         
-        # Apply phase shifting to avoid destructive interference
-        if len(periodic_nodes) >= 2:
-            base_phase = 0
-            for i, (node_id, pattern) in enumerate(periodic_nodes):
-                phase_shift = self.resonance_analyzer.calculate_phase_shift(pattern)
-                # In production, this would adjust actual workload scheduling
-                logger.info(f"Applying phase shift of {phase_shift:.2f}s to node {node_id}")
+        if report.placements:
+            logger.info(
+                f"Phase placement: peak load {report.baseline_peak} -> {report.placed_peak} "
+                f"({report.reduction_percent}% lower)"
+            )
+    
+    def _enqueue(self, event: OrchestratorEvent, node_id: Optional[str] = None):
+        """Queue work for the loop; identical work already waiting is not queued twice"""
+        if not self._loop_running or (event, node_id) in self._pending:
+            return
+        self._pending.add((event, node_id))
+        self._events.put_nowait((event, node_id))
+    
+    def _node_state_changed(self, node: HeadyNode, previous: NodeState):
+        if node.state == NodeState.UNHEALTHY:
+            self._enqueue(OrchestratorEvent.NODE_FAILED, node.node_id)
+        elif node.state == NodeState.TERMINATED and previous != NodeState.DRAINING:
+            self._enqueue(OrchestratorEvent.EVALUATE_SCALING)
+    
+    def signal_failure(self, node_id: str):
+        """External failure signal (e.g. a missed heartbeat): fail the node over right away"""
+        node = self.nodes.get(node_id)
+        if node is not None and node.state not in LEAVING_STATES:
+            node.state = NodeState.UNHEALTHY
+    
+    def stop(self):
+        """Ask run_orchestration_loop to finish the current event and return"""
+        self._enqueue(OrchestratorEvent.STOP)
+    
+    async def _cadence(self, event: OrchestratorEvent, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            self._enqueue(event)
+    
+    def _crossed_threshold(self, previous: Dict[str, Any], current: Dict[str, Any]) -> bool:
+        """True when average health moved across a scaling threshold since the last sweep"""
+        if not previous or not current.get("node_count"):
+            return False
+        before, after = previous.get("avg_health", 0), current.get("avg_health", 0)
+        return any(
+            (before < threshold) != (after < threshold)
+            for threshold in (self.scale_down_threshold, self.scale_up_threshold)
+        )
+    
+    async def _handle_event(self, event: OrchestratorEvent, node_id: Optional[str]) -> Optional[asyncio.Task]:
+        """Handle one event; returns the background task still doing its work, if one was started"""
+        if event == OrchestratorEvent.COLLECT_METRICS:
+            previous = self.last_cluster_metrics
+            metrics = await self.collect_cluster_metrics()
+            self.last_cluster_metrics = metrics
+            if self._crossed_threshold(previous, metrics):
+                self._enqueue(OrchestratorEvent.EVALUATE_SCALING)
+            # A failover that errored leaves its node UNHEALTHY with no further state change; retry it
+            for failed_id in self.nodes.in_state(NodeState.UNHEALTHY).difference(self._failovers):
+                self._enqueue(OrchestratorEvent.NODE_FAILED, failed_id)
+            
+            # Deferred batch work follows energy prices, the cluster's thermal load and available nodes
+            await self._poll_energy_price()
+            if metrics.get("healthy_nodes"):
+                self.tempo_optimizer.record_thermal_load(metrics["total_cpu"] / metrics["healthy_nodes"])
+            self.task_scheduler.dispatch(sorted(self.nodes.in_state(NodeState.HEALTHY, NodeState.DEGRADED)))
+            
+            # Log cluster state
+            logger.info(f"Cluster state: {len(self.nodes)} nodes, "
+                      f"avg health: {metrics.get('avg_health', 0):.1f}")
+        
+        elif event == OrchestratorEvent.NODE_FAILED:
+            # Replace failed nodes in the background so the loop keeps running
+            if node_id in self.nodes and self.nodes[node_id].state == NodeState.UNHEALTHY:
+                return self.start_failover(node_id)
+        
+        elif event == OrchestratorEvent.EVALUATE_SCALING:
+            # Provisioning takes seconds; run it beside the loop, one plan at a time
+            if self._scaling_task is None or self._scaling_task.done():
+                self._scaling_task = asyncio.get_running_loop().create_task(self._evaluate_scaling())
+                return self._scaling_task
+        
+        elif event == OrchestratorEvent.OPTIMIZE_PLACEMENT:
+            await self.optimize_placement()
+        return None
+    
+    def _observe_duration(self, event: OrchestratorEvent, started: float):
+        self.loop_durations[event.value].observe(time.perf_counter() - started)
+    
+    async def _poll_energy_price(self):
+        if self.energy_price_source is None:
+            return
+        try:
+            price = self.energy_price_source()
+            if inspect.isawaitable(price):
+                price = await price
+        except Exception as e:
+            logger.error(f"Energy price source failed: {e}")
+            return
+        if price is not None:
+            self.tempo_optimizer.record_energy_price(float(price))
+    
+    async def _evaluate_scaling(self):
+        try:
+            scaling_action = self.determine_scaling_action(self.last_cluster_metrics)
+            await self.apply_scaling_action(scaling_action, self.scaling_target)
+        except Exception as e:
+            self.loop_errors += 1
+            logger.error(f"Scaling evaluation failed: {e}")
     
     async def run_orchestration_loop(self):
-        """Main orchestration loop"""
+        """Main orchestration loop.
+        
+        Work is event driven: metrics collection, scaling evaluation and
+        placement optimisation each run on their own cadence, node failures
+        (state changes to UNHEALTHY or signal_failure) are handled as soon as
+        they happen and metric threshold crossings trigger an immediate
+        scaling evaluation. The loop sleeps on its queue while idle.
+        """
         logger.info("Starting orchestration loop")
+        self.health_sampler.start()
+        if self.metrics_exporter is not None:
+            await self.metrics_exporter.start()
         
         # Ensure minimum nodes
         while len(self.nodes) < self.min_nodes:
-            await self.provision_node()
-        
-        while True:
-            try:
-                # Collect metrics
-                metrics = await self.collect_cluster_metrics()
-                
-                # Check for failed nodes
-                for node in list(self.nodes.values()):
-                    if node.state == NodeState.UNHEALTHY:
-                        await self.handle_node_failure(node.node_id)
-                
-                # Determine and apply scaling
-                scaling_action = self.determine_scaling_action(metrics)
-                await self.apply_scaling_action(scaling_action)
-                
-                # Optimize placement periodically
-                if len(self.cluster_metrics_history) % 10 == 0:
-                    await self.optimize_placement()
-                
-                # Log cluster state
-                logger.info(f"Cluster state: {len(self.nodes)} nodes, "
-                          f"avg health: {metrics.get('avg_health', 0):.1f}")
-                
-                # Wait before next iteration
-                await asyncio.sleep(10)
-                
-            except Exception as e:
-                logger.error(f"Orchestration loop error: {e}")
+            if not await self.provision_nodes(self.min_nodes - len(self.nodes)):
                 await asyncio.sleep(5)
+        
+        self._loop_running = True
+        loop = asyncio.get_running_loop()
+        timers = [
+            loop.create_task(self._cadence(OrchestratorEvent.COLLECT_METRICS, self.metrics_interval)),
+            loop.create_task(self._cadence(OrchestratorEvent.EVALUATE_SCALING, self.scaling_interval)),
+            loop.create_task(self._cadence(OrchestratorEvent.OPTIMIZE_PLACEMENT, self.placement_interval)),
+        ]
+        # Start with a full sweep, then scaling on fresh metrics
+        self._enqueue(OrchestratorEvent.COLLECT_METRICS)
+        self._enqueue(OrchestratorEvent.EVALUATE_SCALING)
+        for node_id in self.nodes.in_state(NodeState.UNHEALTHY):
+            self._enqueue(OrchestratorEvent.NODE_FAILED, node_id)
+        
+        try:
+            while True:
+                event, node_id = await self._events.get()
+                self._pending.discard((event, node_id))
+                self.event_counts[event.value] += 1
+                if event == OrchestratorEvent.STOP:
+                    break
+                started = time.perf_counter()
+                background = None
+                try:
+                    background = await self._handle_event(event, node_id)
+                except Exception as e:
+                    self.loop_errors += 1
+                    logger.error(f"Orchestration loop error ({event.value}): {e}")
+                if background is None:
+                    self._observe_duration(event, started)
+                else:
+                    background.add_done_callback(
+                        lambda _, event=event, started=started: self._observe_duration(event, started)
+                    )
+        finally:
+            self._loop_running = False
+            self._pending.clear()
+            for timer in timers:
+                timer.cancel()
+            await asyncio.gather(*timers, return_exceptions=True)
+            if self._scaling_task is not None:
+                await asyncio.gather(self._scaling_task, return_exceptions=True)
+            if self.metrics_exporter is not None:
+                await self.metrics_exporter.stop()
+            await self.health_sampler.stop()
+
+class DurationHistogram:
+    """Cumulative-bucket histogram of durations in seconds"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = (0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30)):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, seconds: float):
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+
+def _label_value(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+class MetricsExporter:
+    """Prometheus / OpenMetrics endpoint served from the orchestrator's event loop.
+    
+    Scrapes render from the latest sample of each series in the metrics
+    stores and from counters the orchestrator keeps as it goes, so the cost
+    is O(nodes) and no history is copied. GET /metrics answers in the
+    Prometheus text format, or OpenMetrics when the Accept header asks for it.
+    """
+    
+    PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+    OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+    
+    NODE_GAUGES = (
+        ("heady_node_health_score", "health_score", "Latest node health score (0-100)"),
+        ("heady_node_cpu_percent", "cpu_percent", "Latest node CPU utilisation"),
+        ("heady_node_memory_percent", "memory_percent", "Latest node memory utilisation"),
+        ("heady_node_disk_percent", "disk_percent", "Latest node disk utilisation"),
+        ("heady_node_request_latency_seconds", "request_latency", "Latest node request latency"),
+        ("heady_node_error_rate", "error_rate", "Latest node error rate (0-1)"),
+    )
+    
+    def __init__(self, orchestrator: "DynamicOrchestrator", host: str = "0.0.0.0", port: int = 9108):
+        self.orchestrator = orchestrator
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+    
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        if self.port == 0:
+            self.port = self._runner.addresses[0][1]
+        logger.info(f"Metrics exporter listening on {self.host}:{self.port}")
+    
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        openmetrics = "application/openmetrics-text" in request.headers.get("Accept", "")
+        body = self.render(openmetrics)
+        response = web.Response(body=body.encode("utf-8"))
+        response.headers["Content-Type"] = (
+            self.OPENMETRICS_CONTENT_TYPE if openmetrics else self.PROMETHEUS_CONTENT_TYPE
+        )
+        return response
+    
+    def render(self, openmetrics: bool = False) -> str:
+        o = self.orchestrator
+        lines: List[str] = []
+        
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+        
+        def counter(name: str, help_text: str, samples: List[Tuple[str, float]]):
+            # OpenMetrics names the family without the _total suffix its samples carry
+            family(name if not openmetrics else name[:-len("_total")], "counter", help_text)
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+        
+        nodes = list(o.nodes.values())
+        for name, column, help_text in self.NODE_GAUGES:
+            family(name, "gauge", help_text)
+            for node in nodes:
+                value = node.store.latest(node.slot, column) if node.slot is not None else None
+                if value is not None:
+                    lines.append(
+                        f'{name}{{node="{_label_value(node.node_id)}",type="{_label_value(node.node_type)}"}} {value}'
+                    )
+        
+        family("heady_node_state", "gauge", "1 for the state each node is currently in")
+        for node in nodes:
+            for state in NodeState:
+                lines.append(
+                    f'heady_node_state{{node="{_label_value(node.node_id)}",state="{state.value}"}} '
+                    f'{int(node.state == state)}'
+                )
+        
+        cluster = o.cluster_metrics_history
+        family("heady_cluster_nodes", "gauge", "Nodes registered with the orchestrator")
+        lines.append(f"heady_cluster_nodes {len(nodes)}")
+        for column, help_text in (("avg_health", "Average node health score at the last sweep"),
+                                  ("avg_latency", "Average node request latency at the last sweep")):
+            value = cluster.latest(o.cluster_slot, column)
+            if value is not None:
+                family(f"heady_cluster_{column}", "gauge", help_text)
+                lines.append(f"heady_cluster_{column} {value}")
+        family("heady_failovers_in_flight", "gauge", "Node failovers currently running")
+        lines.append(f"heady_failovers_in_flight {len(o._failovers)}")
+        
+        decision = o.last_scaling_decision
+        if decision is not None:
+            family("heady_autoscaler_target_nodes", "gauge", "Node count chosen by the last forecast")
+            lines.append(f"heady_autoscaler_target_nodes {decision.target_nodes}")
+            family("heady_autoscaler_forecast_peak_load", "gauge", "Forecast peak cluster load in health points")
+            lines.append(f"heady_autoscaler_forecast_peak_load {decision.forecast_peak}")
+        
+        counter("heady_scaling_actions_total", "Scaling decisions applied, by action",
+                [(f'{{action="{action}"}}', count) for action, count in sorted(o.scaling_counters.items())])
+        counter("heady_nodes_provisioned_total", "Nodes provisioned by scaling", [("", o.nodes_provisioned)])
+        counter("heady_nodes_deprovisioned_total", "Nodes removed by scaling", [("", o.nodes_deprovisioned)])
+        counter("heady_orchestration_loop_errors_total", "Orchestration iterations that raised",
+                [("", o.loop_errors)])
+        counter("heady_orchestrator_events_total", "Events handled by the orchestration loop, by kind",
+                [(f'{{event="{event}"}}', count) for event, count in sorted(o.event_counts.items())])
+        
+        family("heady_task_phase_offset_seconds", "gauge", "Phase offset each recurring task runs at")
+        for task in o.task_scheduler.recurring_tasks():
+            lines.append(
+                f'heady_task_phase_offset_seconds{{task="{_label_value(task.task_id)}",'
+                f'node="{_label_value(task.host or "")}"}} {task.phase_offset}'
+            )
+        report = o.placement_report
+        if report is not None:
+            family("heady_placement_peak_load", "gauge", "Peak aggregate load of the last placement replay")
+            for plan, value in (("unshifted", report.baseline_peak), ("placed", report.placed_peak)):
+                lines.append(f'heady_placement_peak_load{{plan="{plan}"}} {value}')
+        
+        tasks = o.task_scheduler.metrics()
+        family("heady_deferred_tasks_queued", "gauge", "Deferred tasks waiting for their start time")
+        lines.append(f"heady_deferred_tasks_queued {tasks['queued']}")
+        counter("heady_deferred_tasks_completed_total", "Deferred tasks completed", [("", tasks["completed"])])
+        counter("heady_deferred_task_deadline_misses_total", "Deferred tasks finished after their deadline",
+                [("", tasks["deadline_misses"])])
+        
+        family("heady_orchestration_loop_duration_seconds", "histogram",
+               "Time spent handling orchestration events, by kind (failover and scaling until done)")
+        for event, histogram in sorted(o.loop_durations.items()):
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f'heady_orchestration_loop_duration_seconds_bucket{{event="{event}",le="{bound}"}} {count}')
+            lines.append(f'heady_orchestration_loop_duration_seconds_bucket{{event="{event}",le="+Inf"}} {histogram.count}')
+            lines.append(f'heady_orchestration_loop_duration_seconds_sum{{event="{event}"}} {histogram.sum}')
+            lines.append(f'heady_orchestration_loop_duration_seconds_count{{event="{event}"}} {histogram.count}')
+        
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+ENERGY_SLOT_SECONDS = 15 * 60
 
 class TempoOptimizer:
-    """Implements HeadyTempo - predictive timing optimization"""
+    """Implements HeadyTempo - predictive timing optimization
     
-    def __init__(self):
+    Prices come from record_energy_price (DynamicOrchestrator polls its
+    `energy_price_source` once per metrics sweep). Slots without a recorded
+    price use `tariff`, 24 hourly prices in UTC, or a night-is-cheaper
+    profile when no tariff is configured.
+    """
+    
+    def __init__(self, defer_below_priority: float = 0.3, tariff: Optional[Sequence[float]] = None):
+        if tariff is not None and len(tariff) != 24:
+            raise ValueError(f"Energy tariff needs 24 hourly prices, got {len(tariff)}")
         self.energy_prices = deque(maxlen=96)  # 24 hours at 15-min intervals
         self.thermal_load = deque(maxlen=100)
+        self.defer_below_priority = defer_below_priority  # higher priorities always run now
+        self.tariff = [float(price) for price in tariff] if tariff is not None else None
+        self._last_price_slot: Optional[int] = None
+    
+    def record_energy_price(self, price: float, timestamp: Optional[float] = None):
+        """Record the energy price for the 15-minute slot containing `timestamp`"""
+        slot = int((timestamp if timestamp is not None else time.time()) // ENERGY_SLOT_SECONDS)
+        if self._last_price_slot is not None and slot <= self._last_price_slot:
+            # Correction for the current slot
+            self.energy_prices[-1] = price
+            return
+        if self._last_price_slot is not None:
+            # Carry the last known price across slots nobody reported
+            for _ in range(min(slot - self._last_price_slot - 1, self.energy_prices.maxlen)):
+                self.energy_prices.append(self.energy_prices[-1])
+        self.energy_prices.append(price)
+        self._last_price_slot = slot
+    
+    def record_thermal_load(self, load: float):
+        """Record a thermal load reading (0-100, e.g. average CPU)"""
+        self.thermal_load.append(load)
+    
+    def forecast_energy_prices(self, start: float, slots: int) -> np.ndarray:
+        """Price per 15-minute slot from the slot containing `start`.
         
-    def predict_optimal_time(self, task_duration: float, 
-                            priority: float = 0.5) -> datetime:
-        """Predict optimal time to run a task"""
-        # Simulate energy price prediction
-        current_hour = datetime.now(timezone.utc).hour
-        
-        # Energy is typically cheaper at night
-        night_hours = list(range(0, 6)) + list(range(22, 24))
-        
-        if priority < 0.3:  # Low priority - wait for cheap energy
-            if current_hour not in night_hours:
-                # Schedule for next cheap period
-                if current_hour < 22:
-                    optimal_hour = 22
+        Recorded prices are reused for their own slot and repeated at the same
+        time of day (seasonal naive, 24h period); slots with no data fall back
+        to the tariff, or to a night-is-cheaper profile without one.
+        """
+        first = int(start // ENERGY_SLOT_SECONDS)
+        prices = np.empty(slots)
+        recorded = len(self.energy_prices)
+        for i in range(slots):
+            slot = first + i
+            index = None
+            if self._last_price_slot is not None:
+                back = self._last_price_slot - slot
+                if back < 0:
+                    back %= self.energy_prices.maxlen
+                if back < recorded:
+                    index = recorded - 1 - back
+            if index is not None:
+                prices[i] = self.energy_prices[index]
+            else:
+                hour = (slot * ENERGY_SLOT_SECONDS // 3600) % 24
+                if self.tariff is not None:
+                    prices[i] = self.tariff[hour]
                 else:
-                    optimal_hour = 0
-                
-                optimal_time = datetime.now(timezone.utc).replace(
-                    hour=optimal_hour, minute=0, second=0, microsecond=0
-                )
-                
-                if optimal_hour == 0:
-                    optimal_time += timedelta(days=1)
-                
-                return optimal_time
+                    # Energy is typically cheaper at night
+                    prices[i] = 0.6 if hour < 6 or hour >= 22 else 1.0
+        
+        # Running hot right now makes the next hour effectively more expensive
+        if self.thermal_load:
+            recent = np.mean(list(self.thermal_load)[-10:])
+            prices[:4] *= 1 + max(0.0, recent - 70) / 100
+        return prices
+    
+    def best_start(self, earliest: float, latest: float, duration: float, priority: float,
+                   prices: Optional[np.ndarray] = None, origin: Optional[float] = None) -> Tuple[float, float]:
+        """(start time, weight) maximising calculate_wait_weight over slot-aligned starts.
+        
+        Only tasks below defer_below_priority wait at all; for those the
+        benefit of waiting is the relative energy saving against starting at
+        `earliest`, scaled down by priority, and if no later start has
+        positive weight the task starts at `earliest`.
+        """
+        if priority >= self.defer_below_priority:
+            return earliest, 0.0
+        origin = earliest if origin is None else origin
+        slots_needed = max(1, math.ceil(duration / ENERGY_SLOT_SECONDS))
+        first_offset = int(earliest // ENERGY_SLOT_SECONDS - origin // ENERGY_SLOT_SECONDS)
+        last_offset = max(first_offset, int(latest // ENERGY_SLOT_SECONDS - origin // ENERGY_SLOT_SECONDS))
+        if prices is None or len(prices) < last_offset + slots_needed:
+            prices = self.forecast_energy_prices(origin, last_offset + slots_needed)
+        
+        window_cost = np.convolve(prices, np.ones(slots_needed), mode="valid")
+        now_cost = window_cost[first_offset]
+        if now_cost <= 0 or latest <= earliest:
+            return earliest, 0.0
         
-        # High priority - run immediately
-        return datetime.now(timezone.utc)
+        offsets = np.arange(first_offset + 1, last_offset + 1)
+        if not len(offsets):
+            return earliest, 0.0
+        starts = (origin // ENERGY_SLOT_SECONDS + offsets) * ENERGY_SLOT_SECONDS
+        benefit = (now_cost - window_cost[offsets]) / now_cost * (1 - priority)
+        weights = self.calculate_wait_weight((starts - earliest) / 3600, benefit)
+        best = int(np.argmax(weights))
+        if weights[best] <= 0:
+            return earliest, 0.0
+        return float(starts[best]), float(weights[best])
+        
+    def predict_optimal_time(self, task_duration: float, 
+                            priority: float = 0.5) -> datetime:
+        """Predict optimal time to run a task (within the next 24 hours)"""
+        now = time.time()
+        start, _ = self.best_start(now, now + 24 * 3600, task_duration, priority)
+        return datetime.fromtimestamp(start, timezone.utc)
     
-    def calculate_wait_weight(self, wait_time: float, benefit: float) -> float:
+    def calculate_wait_weight(self, wait_time: Any, benefit: Any) -> Any:
         """Calculate wait-to-weight arbitration"""
         # Use golden ratio for weight calculation
         weight = benefit * (1 / (1 + wait_time / PHI))
         return weight
 
+@dataclass
+class DeferredTask:
+    """Batch work for DeferredTaskScheduler; times are POSIX seconds"""
+    task_id: str
+    duration: float
+    priority: float = 0.5
+    deadline: Optional[float] = None
+    submitted_at: float = 0.0
+    node_id: Optional[str] = None
+    start: Optional[float] = None
+    # Recurring work runs every `period` seconds at phase_offset past the epoch grid,
+    # preferably on `host`; PhasePlacementEngine.place_recurring chooses both
+    period: Optional[float] = None
+    phase_offset: float = 0.0
+    host: Optional[str] = None
+    load: float = 10.0  # health points the task costs its node while running
+    
+    @property
+    def end(self) -> Optional[float]:
+        return self.start + self.duration if self.start is not None else None
+
+class DeferredTaskScheduler:
+    """Packs deferrable tasks into cheap energy windows across nodes.
+    
+    Pending tasks are planned highest priority first (earliest deadline
+    breaking ties): each gets the start time TempoOptimizer.best_start
+    prefers between now and its latest feasible start, on the first node
+    with a free interval at that time, falling back to the earliest free
+    slot on any node. dispatch() starts tasks whose time has come and
+    tracks completions, deadline misses and energy cost versus running
+    everything on submission.
+    
+    Recurring tasks (period set) skip the energy search: each run starts at
+    the next point of its phase-shifted grid, on its host when that is free,
+    and is queued again when it completes.
+    """
+    
+    def __init__(self, tempo: Optional[TempoOptimizer] = None, horizon: float = 24 * 3600):
+        self.tempo = tempo or TempoOptimizer()
+        self.horizon = horizon
+        self._pending: List[Tuple[float, float, int, DeferredTask]] = []
+        self._sequence = itertools.count()
+        self._planned: List[Tuple[float, int, DeferredTask]] = []
+        self._running: List[Tuple[float, int, DeferredTask]] = []
+        self._busy: Dict[str, List[Tuple[float, float]]] = {}
+        self.stats: Dict[str, float] = {
+            "submitted": 0,
+            "started": 0,
+            "completed": 0,
+            "deadline_misses": 0,
+            "wait_seconds": 0.0,
+            "energy_cost": 0.0,
+            "baseline_energy_cost": 0.0,
+        }
+        self._first_submit: Optional[float] = None
+        self._last_dispatch: Optional[float] = None
+    
+    def submit(self, task: DeferredTask, now: Optional[float] = None) -> DeferredTask:
+        now = time.time() if now is None else now
+        task.submitted_at = task.submitted_at or now
+        deadline = task.deadline if task.deadline is not None else float("inf")
+        heapq.heappush(self._pending, (-task.priority, deadline, next(self._sequence), task))
+        self.stats["submitted"] += 1
+        if self._first_submit is None:
+            self._first_submit = task.submitted_at
+        return task
+    
+    def _free_at(self, node_id: str, start: float, end: float) -> bool:
+        intervals = self._busy.setdefault(node_id, [])
+        i = bisect.bisect_left(intervals, (start, start))
+        if i > 0 and intervals[i - 1][1] > start:
+            return False
+        return i == len(intervals) or intervals[i][0] >= end
+    
+    def _earliest_gap(self, node_id: str, after: float, duration: float) -> float:
+        candidate = after
+        for busy_start, busy_end in self._busy.get(node_id, []):
+            if busy_end <= candidate:
+                continue
+            if busy_start >= candidate + duration:
+                break
+            candidate = busy_end
+        return candidate
+    
+    def plan(self, node_ids: List[str], now: Optional[float] = None) -> List[DeferredTask]:
+        """Assign every pending task a node and start time; returns the tasks planned"""
+        now = time.time() if now is None else now
+        if not node_ids:
+            return []
+        prices = self.tempo.forecast_energy_prices(now, int(self.horizon // ENERGY_SLOT_SECONDS) + 96)
+        planned = []
+        while self._pending:
+            _, _, _, task = heapq.heappop(self._pending)
+            candidates = node_ids
+            if task.period:
+                preferred = now + (task.phase_offset - now) % task.period
+                # Waiting is measured from the run's slot, not from the last run
+                task.submitted_at = preferred
+                if task.host in node_ids:
+                    candidates = [task.host] + [n for n in node_ids if n != task.host]
+            else:
+                latest = now + self.horizon
+                if task.deadline is not None:
+                    latest = min(latest, task.deadline - task.duration)
+                preferred, _ = self.tempo.best_start(now, max(now, latest), task.duration, task.priority,
+                                                     prices=prices, origin=now)
+            
+            node_id = next((n for n in candidates if self._free_at(n, preferred, preferred + task.duration)), None)
+            start = preferred
+            if node_id is None:
+                # Preferred window is taken everywhere: earliest gap on any node instead
+                start, node_id = min((self._earliest_gap(n, now, task.duration), n) for n in node_ids)
+            
+            task.node_id, task.start = node_id, start
+            bisect.insort(self._busy.setdefault(node_id, []), (start, start + task.duration))
+            heapq.heappush(self._planned, (start, next(self._sequence), task))
+            planned.append(task)
+        return planned
+    
+    def _slot_cost(self, start: float, duration: float) -> float:
+        slots = max(1, math.ceil(duration / ENERGY_SLOT_SECONDS))
+        return float(self.tempo.forecast_energy_prices(start, slots).sum())
+    
+    def _requeue(self, task: DeferredTask):
+        task.node_id = task.start = None
+        deadline = task.deadline if task.deadline is not None else float("inf")
+        heapq.heappush(self._pending, (-task.priority, deadline, next(self._sequence), task))
+    
+    def _unplan(self, keep: Callable[[DeferredTask], bool]):
+        """Send planned tasks failing `keep` back to pending"""
+        kept = []
+        for entry in self._planned:
+            task = entry[2]
+            if keep(task):
+                kept.append(entry)
+            else:
+                self._busy.get(task.node_id, []).remove((task.start, task.end))
+                self._requeue(task)
+        if len(kept) != len(self._planned):
+            heapq.heapify(kept)
+            self._planned = kept
+    
+    def recurring_tasks(self) -> List[DeferredTask]:
+        """Every recurring task, whether waiting, planned or running"""
+        entries = [entry[-1] for entry in self._pending + self._planned + self._running]
+        return [task for task in entries if task.period]
+    
+    def apply_placements(self, placements: Dict[str, "PhasePlacement"]):
+        """Move recurring tasks to the hosts and phase offsets of a placement"""
+        moved = set()
+        for task in self.recurring_tasks():
+            placement = placements.get(task.task_id)
+            if placement is not None and (task.host, task.phase_offset) != (placement.node_id, placement.offset_seconds):
+                task.host, task.phase_offset = placement.node_id, placement.offset_seconds
+                moved.add(task.task_id)
+        # Runs already planned move to their new slot; running ones keep it until they finish
+        self._unplan(lambda task: task.task_id not in moved)
+    
+    def dispatch(self, node_ids: List[str], now: Optional[float] = None) -> List[DeferredTask]:
+        """Retire finished tasks, plan pending work and start tasks that are due"""
+        now = time.time() if now is None else now
+        self._last_dispatch = now
+        available = set(node_ids)
+        
+        while self._running and self._running[0][0] <= now:
+            end, _, task = heapq.heappop(self._running)
+            self._busy[task.node_id].remove((task.start, end))
+            self.stats["completed"] += 1
+            if task.deadline is not None and end > task.deadline:
+                self.stats["deadline_misses"] += 1
+            if task.period:
+                self._requeue(task)
+        
+        # Tasks planned on nodes that have since gone away are planned again
+        self._unplan(lambda task: task.node_id in available)
+        self.plan(node_ids, now)
+        
+        started = []
+        while self._planned and self._planned[0][0] <= now:
+            _, _, task = heapq.heappop(self._planned)
+            self.stats["started"] += 1
+            self.stats["wait_seconds"] += task.start - task.submitted_at
+            self.stats["energy_cost"] += self._slot_cost(task.start, task.duration)
+            self.stats["baseline_energy_cost"] += self._slot_cost(task.submitted_at, task.duration)
+            heapq.heappush(self._running, (task.end, next(self._sequence), task))
+            started.append(task)
+        return started
+    
+    def metrics(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        elapsed = (self._last_dispatch or 0) - (self._first_submit or 0)
+        stats["queued"] = len(self._pending) + len(self._planned)
+        stats["running"] = len(self._running)
+        stats["throughput_per_hour"] = round(stats["completed"] / (elapsed / 3600), 3) if elapsed > 0 else 0.0
+        stats["deadline_miss_rate"] = round(stats["deadline_misses"] / stats["completed"], 4) if stats["completed"] else 0.0
+        stats["mean_wait_seconds"] = round(stats["wait_seconds"] / stats["started"], 1) if stats["started"] else 0.0
+        baseline = stats["baseline_energy_cost"]
+        stats["energy_savings_percent"] = round(100 * (1 - stats["energy_cost"] / baseline), 2) if baseline else 0.0
+        return stats
+
 # Export main components
 __all__ = [
+    'DeferredTask',
+    'DeferredTaskScheduler',
+    'DurationHistogram',
     'DynamicOrchestrator',
+    'HealthSampler',
     'HeadyNode',
+    'HoltWintersForecaster',
+    'HostSample',
+    'MetricsExporter',
+    'MetricsRingStore',
     'NodeMetrics',
+    'NodeRegistry',
     'NodeState',
+    'OrchestratorEvent',
+    'PhasePlacement',
+    'PhasePlacementEngine',
+    'PlacementReport',
+    'PredictiveAutoscaler',
     'ResonanceAnalyzer',
+    'ScalingDecision',
+    'ScalingPlan',
+    'SlidingSpectrum',
     'TempoOptimizer',
     'WorkloadPattern'
 ]
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# HEADY_BRAND:BEGIN
+# HEADY SYSTEMS :: SACRED GEOMETRY
+# FILE: src/hf_stub_server.py
+# LAYER: backend/src
+# 
+#         _   _  _____    _    ____   __   __
+#        | | | || ____|  / \  |  _ \ \ \ / /
+#        | |_| ||  _|   / _ \ | | | | \ V / 
+#        |  _  || |___ / ___ \| |_| |  | |  
+#        |_| |_||_____/_/   \_\____/   |_|  
+# 
+#    Sacred Geometry :: Organic Systems :: Breathing Interfaces
+# HEADY_BRAND:END
+
+"""
+Heady HF Stub Server
+Local stand-in for the Hugging Face inference endpoints used by process_data.py.
+Mimics cold-start 503 responses with estimated_time, text generation (plain and
+streamed), feature extraction, the remote GPU worker /process and /process_batch
+endpoints and
+configurable latency/failure injection, so the Python worker can be exercised
+and benchmarked without network access.
+
+Point the worker at it with:
+    HF_INFERENCE_ENDPOINTS=stub=http://127.0.0.1:8089/models HF_TOKEN=stub
+"""
+
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from dataclasses import dataclass, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+STUB_WORDS = ["heady", "systems", "sacred", "geometry", "organic", "breathing", "interface", "resonance"]
+
+
+@dataclass
+class StubConfig:
+    """Behaviour knobs for the stub server"""
+    host: str = "127.0.0.1"
+    port: int = 8089
+    cold_start_s: float = 0.0
+    latency_ms: float = 20.0
+    token_latency_ms: float = 2.0
+    embed_item_latency_ms: float = 0.5
+    gpu_item_latency_ms: float = 0.2
+    embed_dim: int = 384
+    token_level_embeddings: bool = False
+    max_generated_tokens: int = 64
+    error_rate: float = 0.0
+    embed_model_markers: Tuple[str, ...] = ("sentence-transformers", "embed", "minilm", "bge", "e5")
+
+
+class StubState:
+    """Shared counters and per-model load state"""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.lock = threading.Lock()
+        self.model_first_seen: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {
+            "requests": 0,
+            "generate": 0,
+            "embed": 0,
+            "stream": 0,
+            "gpu": 0,
+            "gpu_batch": 0,
+            "gpu_batch_items": 0,
+            "loading_503": 0,
+            "injected_errors": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+        }
+
+    def count(self, key: str, amount: int = 1) -> None:
+        with self.lock:
+            self.counters[key] += amount
+
+    def loading_remaining(self, model: str) -> float:
+        """Seconds until the model is 'loaded'; the clock starts on first request"""
+        now = time.monotonic()
+        with self.lock:
+            first_seen = self.model_first_seen.setdefault(model, now)
+        return max(0.0, first_seen + self.config.cold_start_s - now)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "models": sorted(self.model_first_seen),
+                "config": asdict(self.config),
+            }
+
+
+def _stub_vector(text: str, dim: int) -> List[float]:
+    """Deterministic pseudo-embedding so repeated texts embed identically"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    rng = random.Random(seed)
+    return [round(rng.uniform(-1.0, 1.0), 6) for _ in range(dim)]
+
+
+def _stub_tokens(prompt: str, count: int) -> List[str]:
+    rng = random.Random(prompt)
+    return [" " + rng.choice(STUB_WORDS) for _ in range(count)]
+
+
+def _gpu_output(payload: Dict[str, Any]) -> Dict[str, Any]:
+    data = payload.get("data")
+    return {
+        "task": payload.get("task"),
+        "request_id": payload.get("request_id", ""),
+        "output": {"input_bytes": len(json.dumps(data)), "model": payload.get("model")},
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 handler so clients can keep connections alive"""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without TCP_NODELAY each response
+    # stalls on the client's delayed ACK
+    disable_nagle_algorithm = True
+    state: StubState
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Any) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.state.count("bytes_out", len(data))
+
+    def _read_json(self) -> Any:
+        length = int(self.headers.get("Content-Length", "0"))
+        raw = self.rfile.read(length) if length else b""
+        self.state.count("bytes_in", len(raw))
+        return json.loads(raw) if raw else {}
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._send_json(200, {"status": "healthy", "service": "heady-hf-stub"})
+        elif self.path == "/stats":
+            self._send_json(200, self.state.snapshot())
+        else:
+            self._send_json(404, {"error": f"Not found: {self.path}"})
+
+    def do_POST(self) -> None:
+        self.state.count("requests")
+        try:
+            payload = self._read_json()
+        except ValueError:
+            self._send_json(400, {"error": "Invalid JSON body"})
+            return
+
+        if self.path.startswith("/models/"):
+            self._handle_model(self.path[len("/models/"):], payload)
+        elif self.path == "/process":
+            self._handle_gpu(payload)
+        elif self.path == "/process_batch":
+            self._handle_gpu_batch(payload)
+        else:
+            self._send_json(404, {"error": f"Not found: {self.path}"})
+
+    def _handle_model(self, model: str, payload: Dict[str, Any]) -> None:
+        config = self.state.config
+        if config.error_rate > 0 and random.random() < config.error_rate:
+            self.state.count("injected_errors")
+            self._send_json(502, {"error": "Injected upstream failure"})
+            return
+
+        remaining = self.state.loading_remaining(model)
+        if remaining > 0:
+            options = payload.get("options") or {}
+            if options.get("wait_for_model"):
+                # Same as the hosted API: block until the model is ready
+                time.sleep(remaining)
+            else:
+                self.state.count("loading_503")
+                self._send_json(503, {
+                    "error": f"Model {model} is currently loading",
+                    "estimated_time": round(remaining, 3),
+                })
+                return
+
+        if any(marker in model.lower() for marker in config.embed_model_markers):
+            self._handle_embed(payload)
+        else:
+            self._handle_generate(payload)
+
+    def _handle_embed(self, payload: Dict[str, Any]) -> None:
+        config = self.state.config
+        inputs = payload.get("inputs", "")
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        self.state.count("embed")
+        time.sleep((config.latency_ms + config.embed_item_latency_ms * len(texts)) / 1000.0)
+
+        def embed(text: str) -> Any:
+            vector = _stub_vector(text, config.embed_dim)
+            if not config.token_level_embeddings:
+                return vector
+            # Token-level output: one row per whitespace token, averaging back to `vector`
+            tokens = max(1, len(text.split()))
+            return [vector for _ in range(tokens)]
+
+        vectors = [embed(text) for text in texts]
+        self._send_json(200, vectors[0] if isinstance(inputs, str) else vectors)
+
+    def _handle_generate(self, payload: Dict[str, Any]) -> None:
+        config = self.state.config
+        prompt = str(payload.get("inputs", ""))
+        parameters = payload.get("parameters") or {}
+        requested = int(parameters.get("max_new_tokens", 20))
+        tokens = _stub_tokens(prompt, max(1, min(requested, config.max_generated_tokens)))
+        self.state.count("generate")
+
+        if payload.get("stream"):
+            self._stream_tokens(tokens)
+            return
+
+        time.sleep((config.latency_ms + config.token_latency_ms * len(tokens)) / 1000.0)
+        text = "".join(tokens)
+        if parameters.get("return_full_text", True):
+            text = prompt + text
+        self._send_json(200, [{"generated_text": text}])
+
+    def _handle_gpu(self, payload: Dict[str, Any]) -> None:
+        """Stand-in for the REMOTE_GPU_HOST worker: echoes the task with a size summary"""
+        config = self.state.config
+        self.state.count("gpu")
+        if config.error_rate > 0 and random.random() < config.error_rate:
+            self.state.count("injected_errors")
+            self._send_json(502, {"error": "Injected GPU worker failure"})
+            return
+        time.sleep(config.latency_ms / 1000.0)
+        self._send_json(200, _gpu_output(payload))
+
+    def _handle_gpu_batch(self, payload: Dict[str, Any]) -> None:
+        """Batched /process: one result per item keyed by request_id, failures injected per item"""
+        config = self.state.config
+        items = payload.get("items")
+        if not isinstance(items, list):
+            self._send_json(400, {"error": "Expected an items list"})
+            return
+        self.state.count("gpu_batch")
+        self.state.count("gpu_batch_items", len(items))
+        time.sleep((config.latency_ms + config.gpu_item_latency_ms * len(items)) / 1000.0)
+
+        results = []
+        for item in items:
+            request_id = item.get("request_id", "")
+            if config.error_rate > 0 and random.random() < config.error_rate:
+                self.state.count("injected_errors")
+                results.append({"request_id": request_id, "ok": False, "error": "Injected GPU task failure"})
+            else:
+                results.append({"request_id": request_id, "ok": True, "result": _gpu_output(item)})
+        # Completion order, not submission order: clients must demux by request_id
+        results.reverse()
+        self._send_json(200, {"results": results})
+
+    def _stream_tokens(self, tokens: List[str]) -> None:
+        config = self.state.config
+        self.state.count("stream")
+        time.sleep(config.latency_ms / 1000.0)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(data: bytes) -> None:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+            self.state.count("bytes_out", len(data))
+
+        for index, text in enumerate(tokens):
+            time.sleep(config.token_latency_ms / 1000.0)
+            event: Dict[str, Any] = {"token": {"id": index, "text": text, "special": False}}
+            if index == len(tokens) - 1:
+                event["generated_text"] = "".join(tokens)
+            chunk(b"data: " + json.dumps(event).encode("utf-8") + b"\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_stub_server(config: Optional[StubConfig] = None) -> Tuple[ThreadingHTTPServer, StubState]:
+    """Start the stub on a daemon thread; port 0 picks a free port"""
+    config = config or StubConfig()
+    state = StubState(config)
+    handler = type("BoundStubHandler", (StubHandler,), {"state": state})
+    server = ThreadingHTTPServer((config.host, config.port), handler)
+    server.daemon_threads = True
+    config.port = server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, name="heady-hf-stub", daemon=True)
+    thread.start()
+    return server, state
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Local stand-in for the Hugging Face inference API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--cold-start", type=float, default=0.0,
+                        help="Seconds each model reports 503 'loading' after its first request")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Base latency per request")
+    parser.add_argument("--token-ms", type=float, default=2.0, help="Latency per generated token")
+    parser.add_argument("--embed-dim", type=int, default=384)
+    parser.add_argument("--token-level", action="store_true",
+                        help="Return token-level feature matrices instead of sentence vectors")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 502")
+
+    args = parser.parse_args()
+    config = StubConfig(
+        host=args.host,
+        port=args.port,
+        cold_start_s=args.cold_start,
+        latency_ms=args.latency_ms,
+        token_latency_ms=args.token_ms,
+        embed_dim=args.embed_dim,
+        token_level_embeddings=args.token_level,
+        error_rate=args.error_rate,
+    )
+    server, _ = start_stub_server(config)
+    print(json.dumps({"event": "ready", "service": "heady-hf-stub", "url": f"http://{config.host}:{config.port}/models"}))
+    sys.stdout.flush()
+
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,13 +15,35 @@
 import os
 import sys
 import json
+import asyncio
+import argparse
+import contextlib
+import hashlib
 import time
 import logging
-from typing import Any, Dict, List, Optional, Sequence, Union
+import math
+import queue
+import re
+import string
+import struct
+import threading
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
 
+import aiohttp
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 
 # Configure logging
 logging.basicConfig(
@@ -39,30 +61,277 @@ DEFAULT_HF_EMBED_MODEL = os.getenv("HF_EMBED_MODEL", "sentence-transformers/all-
 HEADY_PY_WORKER_TIMEOUT_MS = int(os.getenv("HEADY_PY_WORKER_TIMEOUT_MS", "90000"))
 REMOTE_GPU_HOST = os.getenv("REMOTE_GPU_HOST")
 REMOTE_GPU_PORT = int(os.getenv("REMOTE_GPU_PORT", "8080"))
+HEADY_GPU_TIMEOUT_S = float(os.getenv("HEADY_GPU_TIMEOUT_S", "30"))
+HEADY_GPU_BATCHING = os.getenv("HEADY_GPU_BATCHING", "false").lower() in ("1", "true", "yes")
+HEADY_GPU_BATCH_SIZE = int(os.getenv("HEADY_GPU_BATCH_SIZE", "64"))
+HEADY_GPU_BATCH_WAIT_MS = float(os.getenv("HEADY_GPU_BATCH_WAIT_MS", "5"))
+HEADY_GPU_BATCH_IN_FLIGHT = int(os.getenv("HEADY_GPU_BATCH_IN_FLIGHT", "4"))
+HEADY_PY_BACKEND = os.getenv("HEADY_PY_BACKEND", "hf").lower()
+HEADY_LOCAL_DEVICE = os.getenv("HEADY_LOCAL_DEVICE", "cpu")
+HEADY_LOCAL_WARM = os.getenv("HEADY_LOCAL_WARM", "true").lower() in ("1", "true", "yes")
+HEADY_PY_SERVE_CONCURRENCY = int(os.getenv("HEADY_PY_SERVE_CONCURRENCY", "8"))
+HEADY_PY_ASYNC_CONCURRENCY = int(os.getenv("HEADY_PY_ASYNC_CONCURRENCY", "16"))
+HEADY_EMBED_BATCHING = os.getenv("HEADY_EMBED_BATCHING", "true").lower() in ("1", "true", "yes")
+HEADY_EMBED_BATCH_SIZE = int(os.getenv("HEADY_EMBED_BATCH_SIZE", "32"))
+HEADY_EMBED_BATCH_WAIT_MS = float(os.getenv("HEADY_EMBED_BATCH_WAIT_MS", "5"))
+HEADY_EMBED_BATCH_IN_FLIGHT = int(os.getenv("HEADY_EMBED_BATCH_IN_FLIGHT", "4"))
+HEADY_EMBED_POOLING = os.getenv("HEADY_EMBED_POOLING", "mean").lower()
+HEADY_EMBED_NORMALIZE = os.getenv("HEADY_EMBED_NORMALIZE", "false").lower() in ("1", "true", "yes")
+HEADY_EMBED_CACHE = os.getenv("HEADY_EMBED_CACHE", "true").lower() in ("1", "true", "yes")
+HEADY_EMBED_CACHE_SIZE = int(os.getenv("HEADY_EMBED_CACHE_SIZE", "10000"))
+HEADY_EMBED_CACHE_DIR = os.getenv("HEADY_EMBED_CACHE_DIR")
+HEADY_QA_CACHE_TTL_S = float(os.getenv("HEADY_QA_CACHE_TTL_S", "300"))
+HEADY_QA_CACHE_SIZE = int(os.getenv("HEADY_QA_CACHE_SIZE", "512"))
+HEADY_QA_CACHE_MAX_TEMPERATURE = float(os.getenv("HEADY_QA_CACHE_MAX_TEMPERATURE", "0.3"))
+# Fallback window for models with no HEADY_QA_MODEL_WINDOWS entry and no tokenizer limit,
+# small enough for most hosted models; 0 sends such prompts with their context untrimmed
+HEADY_QA_CONTEXT_WINDOW = int(os.getenv("HEADY_QA_CONTEXT_WINDOW", "2048"))
+HEADY_QA_MODEL_WINDOWS: Dict[str, int] = json.loads(os.getenv("HEADY_QA_MODEL_WINDOWS") or "{}")
+HEADY_QA_TOKEN_MARGIN = int(os.getenv("HEADY_QA_TOKEN_MARGIN", "16"))
+HEADY_QA_TOKENIZER = os.getenv("HEADY_QA_TOKENIZER", "heuristic").lower()
+HF_INFERENCE_ENDPOINTS = os.getenv(
+    "HF_INFERENCE_ENDPOINTS",
+    "router=https://router.huggingface.co/models,legacy=https://api-inference.huggingface.co/models",
+)
+HEADY_BREAKER_FAILURES = int(os.getenv("HEADY_BREAKER_FAILURES", "3"))
+HEADY_BREAKER_RESET_S = float(os.getenv("HEADY_BREAKER_RESET_S", "30"))
+HEADY_ENDPOINT_EWMA_ALPHA = float(os.getenv("HEADY_ENDPOINT_EWMA_ALPHA", "0.3"))
+HEADY_HTTP_POOL_CONNECTIONS = int(os.getenv("HEADY_HTTP_POOL_CONNECTIONS", "4"))
+HEADY_HTTP_POOL_MAXSIZE = int(os.getenv("HEADY_HTTP_POOL_MAXSIZE", "16"))
+HEADY_HTTP_POOL_BLOCK = os.getenv("HEADY_HTTP_POOL_BLOCK", "false").lower() in ("1", "true", "yes")
+
+
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+_http_stats: Dict[str, int] = {"requests": 0, "errors": 0}
+_http_stats_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """Return the shared keep-alive session used for all outbound HTTP calls"""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                # pool_connections = number of hosts kept, pool_maxsize = sockets per host
+                adapter = HTTPAdapter(
+                    pool_connections=HEADY_HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HEADY_HTTP_POOL_MAXSIZE,
+                    pool_block=HEADY_HTTP_POOL_BLOCK,
+                    max_retries=0,
+                )
+                session = requests.Session()
+                session.headers.update({"Connection": "keep-alive"})
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
+
+
+def _http_post(url: str, **kwargs: Any) -> requests.Response:
+    with _http_stats_lock:
+        _http_stats["requests"] += 1
+    try:
+        return get_http_session().post(url, **kwargs)
+    except Exception:
+        with _http_stats_lock:
+            _http_stats["errors"] += 1
+        raise
+
+
+def http_pool_stats() -> Dict[str, Any]:
+    """Snapshot of the shared connection pool for health reporting"""
+    stats: Dict[str, Any] = {
+        "pool_connections": HEADY_HTTP_POOL_CONNECTIONS,
+        "pool_maxsize": HEADY_HTTP_POOL_MAXSIZE,
+        "pool_block": HEADY_HTTP_POOL_BLOCK,
+        "requests": _http_stats["requests"],
+        "errors": _http_stats["errors"],
+        "hosts": [],
+    }
+    if _http_session is None:
+        return stats
+
+    adapter = _http_session.get_adapter("https://")
+    pools = adapter.poolmanager.pools
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        opened = getattr(pool, "num_connections", 0)
+        served = getattr(pool, "num_requests", 0)
+        # urllib3 pre-fills the LIFO queue with None placeholders
+        idle = sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool is not None else 0
+        stats["hosts"].append({
+            "host": f"{pool.scheme}://{pool.host}:{pool.port}",
+            "connections_opened": opened,
+            "requests_served": served,
+            "connections_reused": max(0, served - opened),
+            "idle_connections": idle,
+        })
+    return stats
 
 
 def _sleep_ms(ms: int) -> None:
     time.sleep(ms / 1000.0)
 
 
-def hf_infer(
-    *,
-    model: str,
+class EndpointHealth:
+    """Circuit breaker and latency EWMA for one inference endpoint.
+
+    closed -> open after `failure_threshold` consecutive failures; once
+    `reset_timeout_s` has passed a single half-open probe is let through and
+    its outcome closes or re-opens the breaker. An endpoint that has not been
+    tried for `reset_timeout_s` ranks as fastest again so a recovered endpoint
+    gets re-measured.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        failure_threshold: int = HEADY_BREAKER_FAILURES,
+        reset_timeout_s: float = HEADY_BREAKER_RESET_S,
+        alpha: float = HEADY_ENDPOINT_EWMA_ALPHA,
+    ):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout_s = reset_timeout_s
+        self.alpha = alpha
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.latency_ewma_ms: Optional[float] = None
+        self.successes = 0
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_attempt: Optional[float] = None
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _probe_ready(self, now: float) -> bool:
+        if self.state == self.OPEN:
+            return now - self.opened_at >= self.reset_timeout_s
+        if self.state == self.HALF_OPEN:
+            # A probe that never reported back must not wedge the breaker
+            return self._probe_started is None or now - self._probe_started >= self.reset_timeout_s
+        return True
+
+    def allow_request(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self.state != self.CLOSED:
+                if not self._probe_ready(now):
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_started = now
+            self.last_attempt = now
+            return True
+
+    def record_success(self, latency_s: Optional[float]) -> None:
+        """Close the breaker; latency_s feeds the EWMA and is None for answers that are not results"""
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.state = self.CLOSED
+            self._probe_started = None
+            if latency_s is None:
+                return
+            latency_ms = latency_s * 1000.0
+            if self.latency_ewma_ms is None:
+                self.latency_ewma_ms = latency_ms
+            else:
+                self.latency_ewma_ms += self.alpha * (latency_ms - self.latency_ewma_ms)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self._probe_started = None
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state == self.CLOSED:
+                    logger.warning(f"Circuit opened for inference endpoint {self.name}")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def rank(self, order: int) -> Tuple[int, float, int]:
+        """Sort key: usable endpoints first, then lowest latency, then configured order"""
+        now = time.monotonic()
+        with self._lock:
+            usable = 0 if self.state == self.CLOSED or self._probe_ready(now) else 1
+            stale = self.last_attempt is None or now - self.last_attempt >= self.reset_timeout_s
+            if stale:
+                latency = 0.0
+            elif self.latency_ewma_ms is not None:
+                latency = self.latency_ewma_ms
+            else:
+                latency = float("inf")
+        return usable, latency, order
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "base_url": self.base_url,
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "successes": self.successes,
+                "failures": self.failures,
+                "latency_ewma_ms": round(self.latency_ewma_ms, 2) if self.latency_ewma_ms is not None else None,
+            }
+
+
+def _parse_endpoints(spec: str) -> List[EndpointHealth]:
+    endpoints = []
+    for index, entry in enumerate(part.strip() for part in spec.split(",")):
+        if not entry:
+            continue
+        name, sep, url = entry.partition("=")
+        if not sep:
+            name, url = f"endpoint{index}", entry
+        endpoints.append(EndpointHealth(name.strip(), url.strip()))
+    return endpoints
+
+
+_hf_endpoints = _parse_endpoints(HF_INFERENCE_ENDPOINTS)
+
+# Status codes that say the endpoint itself is unhealthy rather than the request
+_ENDPOINT_FAILURE_STATUSES = {500, 502, 504}
+
+
+def _hf_routes(model: str) -> List[Tuple[EndpointHealth, str]]:
+    """Endpoints for a model ordered healthiest/fastest first (configured order breaks ties)"""
+    ranked = sorted(enumerate(_hf_endpoints), key=lambda item: item[1].rank(item[0]))
+    return [(endpoint, f"{endpoint.base_url}/{model}") for _, endpoint in ranked]
+
+
+def _exhausted(last_error: Optional[Exception], attempted: bool) -> RuntimeError:
+    if not attempted:
+        return RuntimeError("Hugging Face inference failed - all endpoint circuits are open")
+    if last_error is not None:
+        return RuntimeError(f"Hugging Face inference failed - all endpoints exhausted ({last_error})")
+    return RuntimeError("Hugging Face inference failed - all endpoints exhausted")
+
+
+def _response_data(resp: requests.Response) -> Any:
+    try:
+        return resp.json()
+    except Exception:
+        return resp.text
+
+
+def _hf_request(
     inputs: Any,
-    parameters: Optional[Dict[str, Any]] = None,
-    options: Optional[Dict[str, Any]] = None,
-    timeout_s: int = 60,
-    max_retries: int = 2,
-) -> Any:
+    parameters: Optional[Dict[str, Any]],
+    options: Optional[Dict[str, Any]],
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
     if not HF_TOKEN:
         raise RuntimeError("HF_TOKEN is not set")
 
-    # Try router API first, fallback to legacy API
-    base_urls = [
-        f"https://router.huggingface.co/models/{model}",
-        f"https://api-inference.huggingface.co/models/{model}"
-    ]
-    
     payload: Dict[str, Any] = {"inputs": inputs}
     if parameters is not None:
         payload["parameters"] = parameters
@@ -74,151 +343,1622 @@ def hf_infer(
         "Content-Type": "application/json",
         "Accept": "application/json",
     }
+    return payload, headers
+
+
+def _loading_wait_ms(data: Any) -> int:
+    """Backoff for a 503 "model loading" response, honoring estimated_time"""
+    try:
+        estimated = data.get("estimated_time")
+        return int(estimated * 1000) + 250 if isinstance(estimated, (int, float)) else 1500
+    except Exception:
+        return 1500
+
+
+def _hf_error(data: Any, status: int) -> RuntimeError:
+    message = "Hugging Face inference failed"
+    if isinstance(data, dict) and isinstance(data.get("error"), str) and data["error"].strip():
+        message = data["error"].strip()
+    return RuntimeError(f"{message} (status={status})")
+
+
+def hf_infer(
+    *,
+    model: str,
+    inputs: Any,
+    parameters: Optional[Dict[str, Any]] = None,
+    options: Optional[Dict[str, Any]] = None,
+    timeout_s: int = 60,
+    max_retries: int = 2,
+) -> Any:
+    payload, headers = _hf_request(inputs, parameters, options)
+    routes = _hf_routes(model)
+    last_error: Optional[Exception] = None
+    attempted = False
+
+    for index, (endpoint, url) in enumerate(routes):
+        if not endpoint.allow_request():
+            continue
+        attempted = True
+        for attempt in range(max_retries + 1):
+            started = time.perf_counter()
+            try:
+                resp = _http_post(url, json=payload, headers=headers, timeout=timeout_s)
+            except requests.RequestException as e:
+                endpoint.record_failure()
+                last_error = e
+                break
+            if resp.status_code in _ENDPOINT_FAILURE_STATUSES:
+                endpoint.record_failure()
+                last_error = _hf_error(_response_data(resp), resp.status_code)
+                break
+            # 404/429/503 still prove the endpoint is up, but say nothing about how fast it serves
+            endpoint.record_success(time.perf_counter() - started if 200 <= resp.status_code < 300 else None)
+
+            if resp.status_code == 503 and attempt < max_retries:
+                _sleep_ms(_loading_wait_ms(_response_data(resp)))
+                continue
+
+            if resp.status_code < 200 or resp.status_code >= 300:
+                if resp.status_code == 404 and index < len(routes) - 1:
+                    # Model not served here; try the next endpoint
+                    break
+                raise _hf_error(_response_data(resp), resp.status_code)
+
+            return resp.json()
+
+    raise _exhausted(last_error, attempted)
+
+
+def _merged_options(options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    merged_options: Dict[str, Any] = {"wait_for_model": True}
+    if isinstance(options, dict):
+        merged_options.update(options)
+    return merged_options
+
+
+def _generated_text(data: Any) -> Optional[str]:
+    if isinstance(data, list) and data and isinstance(data[0], dict):
+        if isinstance(data[0].get("generated_text"), str):
+            return data[0]["generated_text"]
+    return None
+
+
+class InferenceBackend(ABC):
+    """Source of raw model output behind hf_generate / hf_embed.
+
+    Implementations return the same shapes as the hosted inference API:
+    [{"generated_text": ...}] for generation and vectors (or token matrices)
+    for feature extraction.
+    """
+
+    name = "python-base"
+
+    @abstractmethod
+    def text_generation(
+        self,
+        model: str,
+        prompt: str,
+        parameters: Optional[Dict[str, Any]],
+        options: Optional[Dict[str, Any]],
+    ) -> Any:
+        ...
+
+    @abstractmethod
+    def feature_extraction(
+        self,
+        model: str,
+        inputs: Union[str, Sequence[str]],
+        options: Optional[Dict[str, Any]],
+    ) -> Any:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name}
+
+
+class HFInferenceBackend(InferenceBackend):
+    """Hosted Hugging Face inference endpoints"""
+
+    name = "python-hf"
+
+    def text_generation(self, model, prompt, parameters, options):
+        return hf_infer(model=model, inputs=prompt, parameters=parameters, options=options)
+
+    def feature_extraction(self, model, inputs, options):
+        return hf_infer(model=model, inputs=inputs, options=options)
+
+
+class LocalBackend(InferenceBackend):
+    """In-process CPU inference with transformers / sentence-transformers.
+
+    Each model is loaded on first use and stays resident for the life of the
+    process; calls into one model are serialized.
+    """
+
+    name = "python-local"
+
+    def __init__(self, device: str = HEADY_LOCAL_DEVICE):
+        self.device = device
+        self._models: Dict[Tuple[str, str], Any] = {}
+        self._model_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.load_ms: Dict[str, float] = {}
+
+    def _model_lock(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            return self._model_locks.setdefault(key, threading.Lock())
+
+    def _load(self, task: str, model: str) -> Any:
+        key = (task, model)
+        loaded = self._models.get(key)
+        if loaded is not None:
+            return loaded
+
+        with self._model_lock(key):
+            if key in self._models:
+                return self._models[key]
+            started = time.perf_counter()
+            try:
+                if task == "text-generation":
+                    from transformers import pipeline
+                    loaded = pipeline(task, model=model, device=-1 if self.device == "cpu" else self.device)
+                else:
+                    from sentence_transformers import SentenceTransformer
+                    loaded = SentenceTransformer(model, device=self.device)
+            except ImportError as e:
+                raise RuntimeError(f"Local backend requires transformers, torch and sentence-transformers ({e})")
+            self.load_ms[f"{task}:{model}"] = round((time.perf_counter() - started) * 1000.0, 1)
+            self._models[key] = loaded
+            logger.info(f"Loaded local {task} model {model} in {self.load_ms[f'{task}:{model}']}ms")
+            return loaded
+
+    def tokenizer_for(self, model: str) -> Optional[Any]:
+        """Tokenizer of an already loaded text-generation model; never triggers a load"""
+        generator = self._models.get(("text-generation", model))
+        return getattr(generator, "tokenizer", None)
+
+    def warm(self, text_models: Sequence[str] = (), embed_models: Sequence[str] = ()) -> None:
+        for model in text_models:
+            self._load("text-generation", model)
+        for model in embed_models:
+            self._load("feature-extraction", model)
+
+    def text_generation(self, model, prompt, parameters, options):
+        generator = self._load("text-generation", model)
+        params = dict(parameters or {})
+        kwargs: Dict[str, Any] = {
+            "max_new_tokens": params.get("max_new_tokens", 256),
+            "return_full_text": params.get("return_full_text", True),
+        }
+        temperature = params.get("temperature")
+        if params.get("do_sample", True) and isinstance(temperature, (int, float)) and temperature > 0:
+            kwargs.update(do_sample=True, temperature=temperature)
+        else:
+            kwargs["do_sample"] = False
+        for name in ("top_k", "top_p", "repetition_penalty"):
+            if name in params:
+                kwargs[name] = params[name]
+
+        with self._model_lock(("text-generation", model)):
+            return generator(prompt, **kwargs)
+
+    def feature_extraction(self, model, inputs, options):
+        # sentence-transformers already pools, so this returns sentence vectors
+        encoder = self._load("feature-extraction", model)
+        texts = inputs if isinstance(inputs, str) else list(inputs)
+        with self._model_lock(("feature-extraction", model)):
+            return encoder.encode(texts, convert_to_numpy=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = [f"{task}:{model}" for task, model in self._models]
+        return {"name": self.name, "device": self.device, "loaded_models": loaded, "load_ms": dict(self.load_ms)}
+
+
+BACKENDS = {
+    "hf": HFInferenceBackend,
+    "local": LocalBackend,
+}
+
+_backend: Optional[InferenceBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> InferenceBackend:
+    """Return the process-wide inference backend selected by HEADY_PY_BACKEND"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_cls = BACKENDS.get(HEADY_PY_BACKEND)
+                if backend_cls is None:
+                    raise RuntimeError(f"Unknown HEADY_PY_BACKEND: {HEADY_PY_BACKEND} (expected one of {', '.join(BACKENDS)})")
+                _backend = backend_cls()
+    return _backend
+
+
+def _backend_name() -> str:
+    if _backend is not None:
+        return _backend.name
+    return BACKENDS.get(HEADY_PY_BACKEND, HFInferenceBackend).name
+
+
+def set_backend(backend: InferenceBackend) -> None:
+    """Swap the inference backend, e.g. for tests or benchmarks"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def hf_generate(
+    prompt: str,
+    *,
+    model: Optional[str] = None,
+    parameters: Optional[Dict[str, Any]] = None,
+    options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    used_model = model or DEFAULT_HF_TEXT_MODEL
+    data = get_backend().text_generation(used_model, prompt, parameters, _merged_options(options))
+    return {"model": used_model, "output": _generated_text(data), "raw": data}
+
+
+def _iter_sse_tokens(resp: requests.Response) -> Any:
+    """Yield token texts from a text-generation server-sent event stream"""
+    # chunk_size=None hands over bytes as they arrive instead of waiting for a full buffer
+    for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        body = line[len("data:"):].strip()
+        if body == "[DONE]":
+            return
+        try:
+            event = json.loads(body)
+        except ValueError:
+            continue
+        if isinstance(event, dict) and isinstance(event.get("error"), str):
+            raise RuntimeError(event["error"])
+        token = event.get("token") if isinstance(event, dict) else None
+        if isinstance(token, dict) and not token.get("special") and token.get("text"):
+            yield token["text"]
+
+
+def hf_generate_stream(
+    prompt: str,
+    *,
+    model: Optional[str] = None,
+    parameters: Optional[Dict[str, Any]] = None,
+    options: Optional[Dict[str, Any]] = None,
+    timeout_s: int = 60,
+    max_retries: int = 2,
+) -> Any:
+    """Yield generated text chunks as the endpoint produces them.
+
+    Endpoints that do not stream answer with plain JSON, and non-HTTP backends
+    do not stream at all; the whole output is then yielded as a single chunk.
+    """
+    used_model = model or DEFAULT_HF_TEXT_MODEL
+    if not isinstance(get_backend(), HFInferenceBackend):
+        output = hf_generate(prompt, model=used_model, parameters=parameters, options=options)["output"] or ""
+        if output.startswith(prompt):
+            output = output[len(prompt):].strip()
+        if output:
+            yield output
+        return
+
+    payload, headers = _hf_request(prompt, parameters, _merged_options(options))
+    payload["stream"] = True
+    headers["Accept"] = "text/event-stream"
+    routes = _hf_routes(used_model)
+    last_error: Optional[Exception] = None
+    attempted = False
+
+    for index, (endpoint, url) in enumerate(routes):
+        if not endpoint.allow_request():
+            continue
+        attempted = True
+        for attempt in range(max_retries + 1):
+            started = time.perf_counter()
+            try:
+                resp = _http_post(url, json=payload, headers=headers, timeout=timeout_s, stream=True)
+            except requests.RequestException as e:
+                endpoint.record_failure()
+                last_error = e
+                break
+            if resp.status_code in _ENDPOINT_FAILURE_STATUSES:
+                endpoint.record_failure()
+                last_error = _hf_error(_response_data(resp), resp.status_code)
+                resp.close()
+                break
+            # 404/429/503 still prove the endpoint is up, but say nothing about how fast it serves
+            endpoint.record_success(time.perf_counter() - started if 200 <= resp.status_code < 300 else None)
+
+            if resp.status_code == 503 and attempt < max_retries:
+                data = _response_data(resp)
+                resp.close()
+                _sleep_ms(_loading_wait_ms(data))
+                continue
+
+            if resp.status_code < 200 or resp.status_code >= 300:
+                data = _response_data(resp)
+                resp.close()
+                if resp.status_code == 404 and index < len(routes) - 1:
+                    # Model not served here; try the next endpoint
+                    break
+                raise _hf_error(data, resp.status_code)
+
+            with resp:
+                if "text/event-stream" in resp.headers.get("Content-Type", ""):
+                    yield from _iter_sse_tokens(resp)
+                else:
+                    output = _generated_text(resp.json()) or ""
+                    if output.startswith(prompt):
+                        output = output[len(prompt):].strip()
+                    if output:
+                        yield output
+            return
+
+    raise _exhausted(last_error, attempted)
+
+
+POOLING_MODES = ("mean", "cls", "max")
+
+
+def _pool_tokens(array: np.ndarray, pooling: str) -> np.ndarray:
+    """Reduce the token axis of a [..., tokens, dim] array"""
+    if pooling == "cls":
+        return array[..., 0, :]
+    if pooling == "max":
+        return array.max(axis=-2)
+    return array.mean(axis=-2)
+
+
+def _l2_normalize(array: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(array, axis=-1, keepdims=True)
+    return array / np.maximum(norms, 1e-12)
+
+
+def _pool_feature_extraction_output(
+    output: Any,
+    pooling: str = HEADY_EMBED_POOLING,
+    normalize: bool = HEADY_EMBED_NORMALIZE,
+    batched: bool = False,
+) -> Any:
+    """Pool raw feature-extraction output into float32 vectors.
+
+    Returns a [dim] array for a single input or a [batch, dim] array when
+    batched. Anything that is not numeric (e.g. an error payload) is returned
+    unchanged.
+    """
+    if pooling not in POOLING_MODES:
+        raise ValueError(f"Unknown pooling mode: {pooling} (expected one of {', '.join(POOLING_MODES)})")
+    if not isinstance(output, (list, np.ndarray)) or len(output) == 0:
+        return output
+
+    vector_ndim = 2 if batched else 1
+    try:
+        array = np.asarray(output, dtype=np.float32)
+    except (ValueError, TypeError):
+        if not batched:
+            return output
+        # Ragged token counts across inputs: pool each input on its own
+        pooled = [_pool_feature_extraction_output(item, pooling, normalize) for item in output]
+        if all(isinstance(v, np.ndarray) and v.ndim == 1 for v in pooled) and len({v.shape for v in pooled}) == 1:
+            return np.stack(pooled)
+        return pooled
+
+    # Drop singleton wrappers such as [1, tokens, dim] for a single input
+    while array.ndim > vector_ndim + 1 and array.shape[0] == 1:
+        array = array[0]
+    if array.ndim == vector_ndim + 1:
+        array = _pool_tokens(array, pooling)
+    if array.ndim != vector_ndim:
+        return output
+    if normalize:
+        array = _l2_normalize(array)
+    return np.ascontiguousarray(array, dtype=np.float32)
+
+
+def _pool_embeddings(
+    data: Any,
+    text: Union[str, Sequence[str]],
+    pooling: str = HEADY_EMBED_POOLING,
+    normalize: bool = HEADY_EMBED_NORMALIZE,
+) -> Any:
+    return _pool_feature_extraction_output(data, pooling, normalize, batched=not isinstance(text, str))
+
+
+def _shortest_floats(array: np.ndarray) -> Any:
+    """Nested lists of Python floats that print with a short float32/float16 repr.
+
+    tolist() widens to float64, whose repr carries ~17 significant digits.
+    Each value is rounded, a whole array at a time, to the fewest significant
+    digits (from the dtype's precision up) that still round-trip.
+    """
+    wide = array.astype(np.float64)
+    result = wide.copy()
+    pending = np.isfinite(wide) & (wide != 0)
+    exponent = np.floor(np.log10(np.abs(np.where(pending, wide, 1.0))))
+    precision = np.finfo(array.dtype).precision
+    for digits in range(precision, precision + 4):
+        if not pending.any():
+            break
+        decimals = digits - 1 - exponent
+        # Divide by an exact power of ten rather than multiplying by an inexact one
+        scale = 10.0 ** np.abs(decimals)
+        rounded = np.round(np.where(decimals >= 0, wide * scale, wide / scale))
+        candidate = np.where(decimals >= 0, rounded / scale, rounded * scale)
+        exact = pending & (candidate.astype(array.dtype) == array)
+        result[exact] = candidate[exact]
+        pending &= ~exact
+    return result.tolist()
+
+
+def _json_default(obj: Any) -> Any:
+    """json.dumps hook for the float32 arrays produced by pooling"""
+    if isinstance(obj, np.ndarray):
+        if obj.dtype in (np.float32, np.float16):
+            return _shortest_floats(obj)
+        return obj.tolist()
+    if isinstance(obj, (np.float32, np.float16)):
+        return float(str(obj))
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class _DiskVectorStore:
+    """Append-only float32 vector file for one model, memory-mapped for reads.
+
+    Several processes may share the directory: appends happen under an
+    exclusive file lock and keys.txt records the row each vector was written
+    to, so rows never depend on what a single process has seen. Keys other
+    processes add are picked up on a lookup miss.
+    """
+
+    def __init__(self, directory: str, model: str):
+        self.model = model
+        self.directory = os.path.join(directory, hashlib.sha1(model.encode("utf-8")).hexdigest()[:16])
+        os.makedirs(self.directory, exist_ok=True)
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.keys_path = os.path.join(self.directory, "keys.txt")
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.lock_path = os.path.join(self.directory, "write.lock")
+        self.index: Dict[str, int] = {}
+        self.dim: Optional[int] = None
+        self._mmap: Optional[np.memmap] = None
+        self._keys_read = 0  # bytes of keys.txt already indexed
+        self._lines_read = 0
+        self._lock = threading.Lock()  # threads of this process; _exclusive() covers other processes
+
+        with self._exclusive():
+            if not os.path.exists(self.meta_path):
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": model, "dim": None}, f)
+        self._refresh()
+
+    @contextlib.contextmanager
+    def _exclusive(self):
+        """Hold the store's write lock (shared by every process using the directory)"""
+        with open(self.lock_path, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _refresh(self) -> None:
+        """Index key lines appended since the last read, by this or another process"""
+        if self.dim is None and os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                dim = json.load(f).get("dim")
+            self.dim = int(dim) if dim else None
+        if not self.dim or not os.path.exists(self.keys_path):
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_read)
+            data = f.read()
+        # Only complete lines; a line being written right now is read next time
+        data = data[:data.rfind(b"\n") + 1]
+        if not data:
+            return
+        self._keys_read += len(data)
+        rows_on_disk = os.path.getsize(self.vectors_path) // (self.dim * 4) if os.path.exists(self.vectors_path) else 0
+        for line in data.decode("utf-8").splitlines():
+            key, _, row = line.strip().partition(" ")
+            # Files written before rows were recorded list keys in row order
+            row_number = int(row) if row else self._lines_read
+            self._lines_read += 1
+            if key and row_number < rows_on_disk:
+                self.index.setdefault(key, row_number)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self.index.get(key)
+            if row is None:
+                self._refresh()
+                row = self.index.get(key)
+                if row is None:
+                    return None
+            if self._mmap is None or row >= self._mmap.shape[0]:
+                rows = os.path.getsize(self.vectors_path) // (self.dim * 4)
+                self._mmap = np.memmap(self.vectors_path, dtype="<f4", mode="r", shape=(rows, self.dim))
+            return np.array(self._mmap[row], dtype=np.float32)
+
+    def put(self, key: str, vector: np.ndarray) -> bool:
+        if key in self.index:
+            return False
+        with self._lock, self._exclusive():
+            # Another process may have stored this key or fixed the dimension meanwhile
+            self._refresh()
+            if key in self.index:
+                return False
+            if self.dim is None:
+                self.dim = int(vector.shape[0])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model, "dim": self.dim}, f)
+            if vector.shape[0] != self.dim:
+                return False
+            row_bytes = self.dim * 4
+            # Vector first, key second: a crash never leaves a key without its row
+            with open(self.vectors_path, "ab") as f:
+                size = f.seek(0, os.SEEK_END)
+                if size % row_bytes:
+                    # Partial row from a writer that crashed mid-append
+                    size -= size % row_bytes
+                    f.truncate(size)
+                f.write(vector.astype("<f4").tobytes())
+            row = size // row_bytes
+            with open(self.keys_path, "a", encoding="utf-8") as f:
+                f.write(f"{key} {row}\n")
+        self.index[key] = row
+        return True
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache: in-memory LRU with an optional on-disk tier"""
+
+    def __init__(self, capacity: int = HEADY_EMBED_CACHE_SIZE, directory: Optional[str] = HEADY_EMBED_CACHE_DIR):
+        self.capacity = max(1, capacity)
+        self.directory = directory
+        self._memory: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._disk: Dict[str, _DiskVectorStore] = {}
+        # _lock guards the LRU and counters only; disk stores lock themselves so
+        # memory hits never wait behind file I/O
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "disk_hits": 0,
+            "disk_writes": 0,
+            "evictions": 0,
+        }
+
+    @staticmethod
+    def key(text: str) -> str:
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def _disk_store(self, model: str) -> Optional[_DiskVectorStore]:
+        if not self.directory:
+            return None
+        with self._disk_lock:
+            store = self._disk.get(model)
+            if store is None:
+                store = _DiskVectorStore(self.directory, model)
+                self._disk[model] = store
+            return store
+
+    def _remember(self, cache_key: Tuple[str, str], vector: np.ndarray) -> None:
+        self._memory[cache_key] = vector
+        self._memory.move_to_end(cache_key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, model: str, key: str) -> Optional[np.ndarray]:
+        cache_key = (model, key)
+        with self._lock:
+            vector = self._memory.get(cache_key)
+            if vector is not None:
+                self._memory.move_to_end(cache_key)
+                self._stats["hits"] += 1
+                return vector
+
+        store = self._disk_store(model)
+        vector = store.get(key) if store is not None else None
+        with self._lock:
+            if vector is None:
+                self._stats["misses"] += 1
+                return None
+            self._remember(cache_key, vector)
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+            return vector
+
+    def put(self, model: str, key: str, vector: Any) -> None:
+        # Copy so a row of a batch result does not keep the whole batch alive
+        array = np.array(vector, dtype=np.float32)
+        if array.ndim != 1:
+            return
+        with self._lock:
+            self._remember((model, key), array)
+        store = self._disk_store(model)
+        if store is not None and store.put(key, array):
+            with self._lock:
+                self._stats["disk_writes"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._disk_lock:
+            stores = list(self._disk.values())
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["size"] = len(self._memory)
+        stats["disk_size"] = sum(len(store) for store in stores)
+        lookups = stats["hits"] + stats["misses"]
+        stats["enabled"] = HEADY_EMBED_CACHE
+        stats["capacity"] = self.capacity
+        stats["disk_dir"] = self.directory
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the process-wide embedding cache, or None when HEADY_EMBED_CACHE is off"""
+    global _embedding_cache
+    if not HEADY_EMBED_CACHE:
+        return None
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache()
+    return _embedding_cache
+
+
+class _EmbedLookup:
+    """Cache state of one embed call: which texts hit and which must go upstream"""
+
+    def __init__(self, cache: EmbeddingCache, namespace: str, text: Union[str, Sequence[str]],
+                 pooling: str, normalize: bool):
+        self.cache = cache
+        self.namespace = namespace
+        self.text = text
+        self.pooling = pooling
+        self.normalize = normalize
+        texts = [text] if isinstance(text, str) else list(text)
+        self.keys = [cache.key(t) for t in texts]
+        self.vectors: List[Optional[np.ndarray]] = [cache.get(namespace, k) for k in self.keys]
+
+        # Only unique misses go upstream
+        self.misses: "OrderedDict[str, str]" = OrderedDict()
+        for t, k, v in zip(texts, self.keys, self.vectors):
+            if v is None:
+                self.misses.setdefault(k, t)
+
+    def resolve(self, data: Any) -> Any:
+        """Pool the upstream response for the misses, cache it and assemble the result"""
+        vectors = self.vectors
+        if self.misses:
+            fetched = _pool_embeddings(data, list(self.misses.values()), self.pooling, self.normalize)
+            if not isinstance(fetched, (list, np.ndarray)) or len(fetched) != len(self.misses):
+                raise RuntimeError(f"Embedding response did not match {len(self.misses)} inputs")
+            resolved: Dict[str, Any] = {}
+            for k, vector in zip(self.misses, fetched):
+                self.cache.put(self.namespace, k, vector)
+                resolved[k] = vector
+            vectors = [v if v is not None else resolved[k] for k, v in zip(self.keys, vectors)]
+
+        if isinstance(self.text, str):
+            return vectors[0]
+        if vectors and all(isinstance(v, np.ndarray) and v.shape == vectors[0].shape for v in vectors):
+            return np.stack(vectors)
+        return vectors
+
+
+def _embed_lookup(
+    used_model: str,
+    text: Union[str, Sequence[str]],
+    options: Optional[Dict[str, Any]],
+    pooling: str,
+    normalize: bool,
+) -> Optional[_EmbedLookup]:
+    """Cache lookup shared by hf_embed and AsyncInferenceEngine.embed; None when caching is off"""
+    cache = get_embedding_cache()
+    if cache is None or (isinstance(options, dict) and options.get("use_cache") is False):
+        return None
+    # Pooled vectors differ per pooling mode, so each mode gets its own namespace
+    namespace = f"{used_model}|{pooling}{'|l2' if normalize else ''}"
+    return _EmbedLookup(cache, namespace, text, pooling, normalize)
+
+
+def hf_embed(
+    text: Union[str, Sequence[str]],
+    *,
+    model: Optional[str] = None,
+    options: Optional[Dict[str, Any]] = None,
+    pooling: str = HEADY_EMBED_POOLING,
+    normalize: bool = HEADY_EMBED_NORMALIZE,
+) -> Dict[str, Any]:
+    used_model = model or DEFAULT_HF_EMBED_MODEL
+    lookup = _embed_lookup(used_model, text, options, pooling, normalize)
+    if lookup is None:
+        data = get_backend().feature_extraction(used_model, text, _merged_options(options))
+        embeddings = _pool_embeddings(data, text, pooling, normalize)
+        return {"model": used_model, "embeddings": embeddings, "raw": data}
+
+    data = None
+    if lookup.misses:
+        data = get_backend().feature_extraction(used_model, list(lookup.misses.values()), _merged_options(options))
+    return {"model": used_model, "embeddings": lookup.resolve(data), "raw": data}
+
+
+# (model, group key, hf_embed kwargs, text, future)
+_EmbedItem = Tuple[str, str, Dict[str, Any], str, Future]
+
+
+class EmbeddingBatcher:
+    """Coalesces single-text embed calls into batched hf_embed requests.
+
+    Requests are collected until max_batch_size items are queued or max_wait_ms
+    has passed since the first one, grouped by (model, options, pooling), sent as one
+    inputs list and the pooled vectors are handed back to each caller.
+
+    Flush counters are kept per group sent: flush_full when the group itself
+    reached max_batch_size, flush_timeout when the wait expired and
+    flush_partial when other groups filled the collection cycle first.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = HEADY_EMBED_BATCH_SIZE,
+        max_wait_ms: float = HEADY_EMBED_BATCH_WAIT_MS,
+        max_in_flight: int = HEADY_EMBED_BATCH_IN_FLIGHT,
+    ):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        self.max_in_flight = max_in_flight
+        self._queue: "queue.Queue[_EmbedItem]" = queue.Queue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "requests": 0,
+            "batches": 0,
+            "items_sent": 0,
+            "max_batch": 0,
+            "flush_full": 0,
+            "flush_timeout": 0,
+            "flush_partial": 0,
+            "errors": 0,
+        }
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                # Batches are sent on a small pool so collection continues while one is in flight
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_in_flight,
+                    thread_name_prefix="heady-embed-batch",
+                )
+                thread = threading.Thread(target=self._run, name="heady-embed-batcher", daemon=True)
+                thread.start()
+                self._thread = thread
+
+    def submit(
+        self,
+        text: str,
+        model: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+        pooling: str = HEADY_EMBED_POOLING,
+        normalize: bool = HEADY_EMBED_NORMALIZE,
+    ) -> Future:
+        self._ensure_started()
+        future: Future = Future()
+        used_model = model or DEFAULT_HF_EMBED_MODEL
+        embed_kwargs = {"options": options, "pooling": pooling, "normalize": normalize}
+        group_key = json.dumps(embed_kwargs, sort_keys=True)
+        with self._lock:
+            self._stats["requests"] += 1
+        self._queue.put((used_model, group_key, embed_kwargs, text, future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait_ms / 1000.0
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            groups: Dict[Tuple[str, str], List[_EmbedItem]] = {}
+            for item in batch:
+                groups.setdefault((item[0], item[1]), []).append(item)
+            cycle_full = len(batch) >= self.max_batch_size
+            for items in groups.values():
+                if len(items) >= self.max_batch_size:
+                    key = "flush_full"
+                else:
+                    key = "flush_partial" if cycle_full else "flush_timeout"
+                with self._lock:
+                    self._stats[key] += 1
+                self._executor.submit(self._send, items)
+
+    def _send(self, items: List[_EmbedItem]) -> None:
+        model, embed_kwargs = items[0][0], items[0][2]
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["items_sent"] += len(items)
+            self._stats["max_batch"] = max(self._stats["max_batch"], len(items))
+        try:
+            result = hf_embed([item[3] for item in items], model=model, **embed_kwargs)
+            embeddings = result["embeddings"]
+            if not isinstance(embeddings, (list, np.ndarray)) or len(embeddings) != len(items):
+                raise RuntimeError(f"Embedding batch did not return one vector for each of {len(items)} inputs")
+        except Exception as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            for item in items:
+                item[4].set_exception(e)
+            return
+
+        for item, vector in zip(items, embeddings):
+            item[4].set_result(vector)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+        batches = stats["batches"]
+        stats["enabled"] = HEADY_EMBED_BATCHING
+        stats["max_batch_size"] = self.max_batch_size
+        stats["max_wait_ms"] = self.max_wait_ms
+        stats["queued"] = self._queue.qsize()
+        stats["avg_batch_size"] = round(stats["items_sent"] / batches, 2) if batches else 0.0
+        stats["avg_fill_ratio"] = round(stats["items_sent"] / (batches * self.max_batch_size), 3) if batches else 0.0
+        return stats
+
+
+_embedding_batcher: Optional[EmbeddingBatcher] = None
+_embedding_batcher_lock = threading.Lock()
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Return the process-wide embedding batcher"""
+    global _embedding_batcher
+    if _embedding_batcher is None:
+        with _embedding_batcher_lock:
+            if _embedding_batcher is None:
+                _embedding_batcher = EmbeddingBatcher()
+    return _embedding_batcher
+
+
+def hf_embed_batched(
+    text: Union[str, Sequence[str]],
+    *,
+    model: Optional[str] = None,
+    options: Optional[Dict[str, Any]] = None,
+    pooling: str = HEADY_EMBED_POOLING,
+    normalize: bool = HEADY_EMBED_NORMALIZE,
+) -> Dict[str, Any]:
+    """hf_embed through the shared batcher; each text may share a request with other callers"""
+    used_model = model or DEFAULT_HF_EMBED_MODEL
+    batcher = get_embedding_batcher()
+    if isinstance(text, str):
+        embeddings: Any = batcher.submit(text, used_model, options, pooling, normalize).result()
+    else:
+        futures = [batcher.submit(t, used_model, options, pooling, normalize) for t in text]
+        embeddings = np.stack([f.result() for f in futures]) if futures else np.zeros((0, 0), dtype=np.float32)
+    return {"model": used_model, "embeddings": embeddings}
+
+
+class AsyncInferenceEngine:
+    """Non-blocking Hugging Face inference with bounded concurrency.
+
+    A 503 "model loading" backoff sleeps on the event loop without holding a
+    concurrency slot, and every call is cancelled once HEADY_PY_WORKER_TIMEOUT_MS
+    elapses (including retries).
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = HEADY_PY_ASYNC_CONCURRENCY,
+        timeout_ms: int = HEADY_PY_WORKER_TIMEOUT_MS,
+    ):
+        self.max_concurrency = max_concurrency
+        self.timeout_ms = timeout_ms
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session_guard: Any = None
+        self._stats: Dict[str, int] = {
+            "in_flight": 0,
+            "completed": 0,
+            "failed": 0,
+            "retries": 0,
+            "timeouts": 0,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self._stats)
+        stats["max_concurrency"] = self.max_concurrency
+        stats["timeout_ms"] = self.timeout_ms
+        return stats
+
+    async def __aenter__(self) -> "AsyncInferenceEngine":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        # aiohttp sessions and semaphores are bound to the loop that created them
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._discard_session()
+            connector = aiohttp.TCPConnector(
+                limit=HEADY_HTTP_POOL_CONNECTIONS * HEADY_HTTP_POOL_MAXSIZE,
+                limit_per_host=HEADY_HTTP_POOL_MAXSIZE,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+            # The loop finalizes started async generators before it closes (asyncio.run
+            # does), which closes the session on the loop that owns it
+            self._session_guard = self._close_with_loop(self._session)
+            await self._session_guard.__anext__()
+        return self._session
+
+    @staticmethod
+    async def _close_with_loop(session: aiohttp.ClientSession) -> Any:
+        try:
+            yield
+        finally:
+            if not session.closed:
+                await session.close()
+
+    def _discard_session(self) -> None:
+        """Let go of a session that belongs to another event loop"""
+        session, loop = self._session, self._loop
+        self._session = None
+        self._session_guard = None
+        if session is None or session.closed:
+            return
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            # Still alive in another thread: close it there
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        else:
+            logger.warning("Dropping an HTTP session whose event loop closed without finalizing it")
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_guard = None
+
+    async def _post(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        headers: Dict[str, str],
+        timeout_s: float,
+    ) -> Tuple[int, Any]:
+        session = await self._get_session()
+        async with self._semaphore:
+            self._stats["in_flight"] += 1
+            try:
+                async with session.post(
+                    url,
+                    json=payload,
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=timeout_s),
+                ) as resp:
+                    text = await resp.text()
+                    try:
+                        data = json.loads(text)
+                    except ValueError:
+                        data = text
+                    return resp.status, data
+            finally:
+                self._stats["in_flight"] -= 1
+
+    async def _infer(
+        self,
+        model: str,
+        inputs: Any,
+        parameters: Optional[Dict[str, Any]],
+        options: Optional[Dict[str, Any]],
+        timeout_s: float,
+        max_retries: int,
+    ) -> Any:
+        payload, headers = _hf_request(inputs, parameters, options)
+        routes = _hf_routes(model)
+        last_error: Optional[Exception] = None
+        attempted = False
+
+        for index, (endpoint, url) in enumerate(routes):
+            if not endpoint.allow_request():
+                continue
+            attempted = True
+            for attempt in range(max_retries + 1):
+                started = time.perf_counter()
+                try:
+                    status, data = await self._post(url, payload, headers, timeout_s)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    endpoint.record_failure()
+                    last_error = e
+                    break
+                if status in _ENDPOINT_FAILURE_STATUSES:
+                    endpoint.record_failure()
+                    last_error = _hf_error(data, status)
+                    break
+                # 404/429/503 still prove the endpoint is up, but say nothing about how fast it serves
+                endpoint.record_success(time.perf_counter() - started if 200 <= status < 300 else None)
+
+                if status == 503 and attempt < max_retries:
+                    self._stats["retries"] += 1
+                    await asyncio.sleep(_loading_wait_ms(data) / 1000.0)
+                    continue
+
+                if status < 200 or status >= 300:
+                    if status == 404 and index < len(routes) - 1:
+                        # Model not served here; try the next endpoint
+                        break
+                    raise _hf_error(data, status)
+
+                return data
+
+        raise _exhausted(last_error, attempted)
+
+    async def infer(
+        self,
+        *,
+        model: str,
+        inputs: Any,
+        parameters: Optional[Dict[str, Any]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        timeout_s: float = 60,
+        max_retries: int = 2,
+    ) -> Any:
+        try:
+            data = await asyncio.wait_for(
+                self._infer(model, inputs, parameters, options, timeout_s, max_retries),
+                timeout=self.timeout_ms / 1000.0,
+            )
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            self._stats["failed"] += 1
+            raise RuntimeError(f"Hugging Face inference timed out (limit={self.timeout_ms}ms)")
+        except Exception:
+            self._stats["failed"] += 1
+            raise
+        self._stats["completed"] += 1
+        return data
+
+    async def generate(
+        self,
+        prompt: str,
+        *,
+        model: Optional[str] = None,
+        parameters: Optional[Dict[str, Any]] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        if not isinstance(get_backend(), HFInferenceBackend):
+            # Local models are CPU-bound; keep them off the event loop
+            return await asyncio.get_running_loop().run_in_executor(
+                None, lambda: hf_generate(prompt, model=model, parameters=parameters, options=options)
+            )
+        used_model = model or DEFAULT_HF_TEXT_MODEL
+        data = await self.infer(model=used_model, inputs=prompt, parameters=parameters, options=_merged_options(options))
+        return {"model": used_model, "output": _generated_text(data), "raw": data}
+
+    async def embed(
+        self,
+        text: Union[str, Sequence[str]],
+        *,
+        model: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+        pooling: str = HEADY_EMBED_POOLING,
+        normalize: bool = HEADY_EMBED_NORMALIZE,
+    ) -> Dict[str, Any]:
+        if not isinstance(get_backend(), HFInferenceBackend):
+            return await asyncio.get_running_loop().run_in_executor(
+                None, lambda: hf_embed(text, model=model, options=options, pooling=pooling, normalize=normalize)
+            )
+        used_model = model or DEFAULT_HF_EMBED_MODEL
+        lookup = _embed_lookup(used_model, text, options, pooling, normalize)
+        if lookup is None:
+            data = await self.infer(model=used_model, inputs=text, options=_merged_options(options))
+            embeddings = _pool_embeddings(data, text, pooling, normalize)
+            return {"model": used_model, "embeddings": embeddings, "raw": data}
+
+        data = None
+        if lookup.misses:
+            data = await self.infer(
+                model=used_model, inputs=list(lookup.misses.values()), options=_merged_options(options)
+            )
+        return {"model": used_model, "embeddings": lookup.resolve(data), "raw": data}
+
+
+_async_engine: Optional[AsyncInferenceEngine] = None
+
+
+def get_async_engine() -> AsyncInferenceEngine:
+    """Return the process-wide async inference engine"""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = AsyncInferenceEngine()
+    return _async_engine
+
+
+async def hf_infer_async(**kwargs: Any) -> Any:
+    return await get_async_engine().infer(**kwargs)
+
+
+async def hf_generate_async(prompt: str, **kwargs: Any) -> Dict[str, Any]:
+    return await get_async_engine().generate(prompt, **kwargs)
+
+
+async def hf_embed_async(text: Union[str, Sequence[str]], **kwargs: Any) -> Dict[str, Any]:
+    return await get_async_engine().embed(text, **kwargs)
+
+
+class ResponseCache:
+    """TTL + LRU cache for generated answers"""
+
+    def __init__(self, ttl_s: float = HEADY_QA_CACHE_TTL_S, capacity: int = HEADY_QA_CACHE_SIZE):
+        self.ttl_s = ttl_s
+        self.capacity = max(1, capacity)
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["size"] = len(self._entries)
+        stats["ttl_s"] = self.ttl_s
+        stats["capacity"] = self.capacity
+        return stats
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Any) -> Tuple[Any, bool]:
+        """Run fn() once per key; returns (result, shared) where shared means another caller ran it"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+_qa_cache = ResponseCache()
+_qa_flight = SingleFlight()
+
+
+def _qa_cacheable(parameters: Dict[str, Any]) -> bool:
+    """Only near-deterministic generations are safe to share between callers"""
+    if HEADY_QA_CACHE_TTL_S <= 0:
+        return False
+    if parameters.get("do_sample") is False:
+        return True
+    temperature = parameters.get("temperature", 1.0)
+    return isinstance(temperature, (int, float)) and temperature <= HEADY_QA_CACHE_MAX_TEMPERATURE
+
+
+def _qa_cache_key(model: str, prompt: str, parameters: Dict[str, Any]) -> str:
+    material = json.dumps([model, prompt, parameters], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _qa_parameters(max_new_tokens: int, parameters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "max_new_tokens": max_new_tokens,
+        "temperature": 0.2,
+        "return_full_text": False,
+        **(parameters or {}),
+    }
+
+
+class PromptTemplate:
+    """A prompt split once into literal segments and named slots.
+
+    Rendering is a single join, and the token cost of the literal text is
+    counted once per tokenizer instead of on every request.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self._segments: List[Tuple[bool, str]] = []
+        for literal, field, _, _ in string.Formatter().parse(template):
+            if literal:
+                self._segments.append((False, literal))
+            if field is not None:
+                self._segments.append((True, field))
+        self.fields = [text for is_field, text in self._segments if is_field]
+        self.static_text = "".join(text for is_field, text in self._segments if not is_field)
+        self._static_tokens: Dict[str, int] = {}
+
+    def render(self, **values: str) -> str:
+        return "".join(values[text] if is_field else text for is_field, text in self._segments)
+
+    def static_tokens(self, tokenizer_key: str, count: Callable[[str], int]) -> int:
+        tokens = self._static_tokens.get(tokenizer_key)
+        if tokens is None:
+            tokens = count(self.static_text)
+            self._static_tokens[tokenizer_key] = tokens
+        return tokens
+
+
+QA_PROMPT_TEMPLATE = PromptTemplate("""You are Heady Systems Q&A. Provide a clear, safe, and concise answer. Do not reveal secrets, API keys, tokens, or private data.
+
+Context:
+{context}
+
+Question:
+{question}
 
-    for base_url in base_urls:
-        for attempt in range(max_retries + 1):
-            resp = requests.post(base_url, json=payload, headers=headers, timeout=timeout_s)
-            if resp.status_code == 503 and attempt < max_retries:
-                try:
-                    data = resp.json()
-                    estimated = data.get("estimated_time")
-                    wait_ms = int(estimated * 1000) + 250 if isinstance(estimated, (int, float)) else 1500
-                except Exception:
-                    wait_ms = 1500
-                _sleep_ms(wait_ms)
-                continue
+Answer:""")
 
-            if resp.status_code < 200 or resp.status_code >= 300:
-                if resp.status_code == 404 and base_url == base_urls[0]:
-                    # Try next base URL for 404 on router
-                    break
-                try:
-                    data = resp.json()
-                except Exception:
-                    data = resp.text
+# Roughly one BPE token per 4-character word piece or punctuation mark
+_TOKEN_ESTIMATE_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+_TERM_PATTERN = re.compile(r"\w{3,}")
+_tokenizers: Dict[str, Any] = {}
+_unbudgeted_models: Set[str] = set()
 
-                message = "Hugging Face inference failed"
-                if isinstance(data, dict) and isinstance(data.get("error"), str) and data["error"].strip():
-                    message = data["error"].strip()
-                raise RuntimeError(f"{message} (status={resp.status_code})")
 
-            return resp.json()
+def _estimate_tokens(text: str) -> int:
+    return len(_TOKEN_ESTIMATE_PATTERN.findall(text))
 
-    raise RuntimeError("Hugging Face inference failed - all endpoints exhausted")
 
+def _tokenizer(model: str) -> Tuple[str, Optional[Any]]:
+    """Return (cache key, tokenizer), or ("heuristic", None) when no real tokenizer is available"""
+    backend = _backend
+    if isinstance(backend, LocalBackend):
+        tokenizer = backend.tokenizer_for(model)
+        if tokenizer is not None:
+            return f"local:{model}", tokenizer
 
-def hf_generate(
-    prompt: str,
-    *,
-    model: Optional[str] = None,
-    parameters: Optional[Dict[str, Any]] = None,
-    options: Optional[Dict[str, Any]] = None,
-) -> Dict[str, Any]:
-    used_model = model or DEFAULT_HF_TEXT_MODEL
-    merged_options: Dict[str, Any] = {"wait_for_model": True}
-    if isinstance(options, dict):
-        merged_options.update(options)
+    if HEADY_QA_TOKENIZER == "auto":
+        if model not in _tokenizers:
+            try:
+                from transformers import AutoTokenizer
+                _tokenizers[model] = AutoTokenizer.from_pretrained(model)
+            except Exception as e:
+                logger.warning(f"Tokenizer for {model} unavailable, estimating token counts: {e}")
+                _tokenizers[model] = None
+        tokenizer = _tokenizers[model]
+        if tokenizer is not None:
+            return f"auto:{model}", tokenizer
 
-    data = hf_infer(model=used_model, inputs=prompt, parameters=parameters, options=merged_options)
-    output = None
-    if isinstance(data, list) and data and isinstance(data[0], dict):
-        if isinstance(data[0].get("generated_text"), str):
-            output = data[0]["generated_text"]
+    return "heuristic", None
 
-    return {"model": used_model, "output": output, "raw": data}
 
+def _token_counter(model: str) -> Tuple[str, Callable[[str], int]]:
+    """Return (cache key, counter) using the real tokenizer when one is available"""
+    tokenizer_key, tokenizer = _tokenizer(model)
+    if tokenizer is None:
+        return tokenizer_key, _estimate_tokens
+    return tokenizer_key, lambda text: len(tokenizer.encode(text, add_special_tokens=False))
 
-def _mean_pool_2d(matrix: Sequence[Sequence[float]]) -> List[float]:
-    rows = len(matrix)
-    if rows == 0:
-        return []
-    cols = len(matrix[0])
-    out = [0.0] * cols
-    for row in matrix:
-        for i in range(cols):
-            out[i] += float(row[i])
-    return [v / rows for v in out]
 
+# transformers reports this huge sentinel as model_max_length when the model sets no limit
+_UNSET_MODEL_MAX_LENGTH = 10 ** 12
 
-def _pool_feature_extraction_output(output: Any) -> Any:
-    if not isinstance(output, list):
-        return output
-    if not output:
-        return output
-    if not isinstance(output[0], list):
-        return output
-    if not output[0] or not isinstance(output[0][0], list):
-        return _mean_pool_2d(output)
 
-    pooled = []
-    for item in output:
-        if not isinstance(item, list) or not item or not isinstance(item[0], list):
-            pooled.append(item)
+def _model_window(model: str) -> Optional[int]:
+    """Context window in tokens, or None when it is not known"""
+    if model in HEADY_QA_MODEL_WINDOWS:
+        return int(HEADY_QA_MODEL_WINDOWS[model])
+    _, tokenizer = _tokenizer(model)
+    max_length = getattr(tokenizer, "model_max_length", None)
+    if isinstance(max_length, int) and 0 < max_length < _UNSET_MODEL_MAX_LENGTH:
+        return max_length
+    return HEADY_QA_CONTEXT_WINDOW if HEADY_QA_CONTEXT_WINDOW > 0 else None
+
+
+def _split_context(context: str) -> List[str]:
+    chunks: List[str] = []
+    for paragraph in re.split(r"\n\s*\n", context):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) > 600:
+            # Long paragraphs are ranked sentence by sentence
+            chunks.extend(part for part in re.split(r"(?<=[.!?])\s+", paragraph) if part.strip())
         else:
-            pooled.append(_mean_pool_2d(item))
-    return pooled
+            chunks.append(paragraph)
+    return chunks
 
 
-def hf_embed(
-    text: Union[str, Sequence[str]],
-    *,
-    model: Optional[str] = None,
-    options: Optional[Dict[str, Any]] = None,
-) -> Dict[str, Any]:
-    used_model = model or DEFAULT_HF_EMBED_MODEL
-    merged_options: Dict[str, Any] = {"wait_for_model": True}
-    if isinstance(options, dict):
-        merged_options.update(options)
+def _truncate_to_budget(text: str, budget: int, count: Callable[[str], int]) -> str:
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count(" ".join(words[:mid])) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return " ".join(words[:low])
+
+
+def budget_context(
+    question: str,
+    context: str,
+    budget_tokens: Optional[int],
+    count: Callable[[str], int] = _estimate_tokens,
+) -> Tuple[str, Dict[str, int]]:
+    """Fit context into a token budget, keeping the chunks most relevant to the question.
+
+    Chunks are ranked by term overlap with the question, kept greedily while
+    they fit and re-emitted in their original order. A budget of None keeps
+    everything.
+    """
+    total = count(context) if context else 0
+    if budget_tokens is None or total <= budget_tokens:
+        return context, {"context_tokens": total, "context_tokens_dropped": 0, "context_chunks_dropped": 0}
 
-    data = hf_infer(model=used_model, inputs=text, options=merged_options)
-    embeddings = _pool_feature_extraction_output(data)
-    return {"model": used_model, "embeddings": embeddings, "raw": data}
+    chunks = _split_context(context)
+    chunk_tokens = [count(chunk) for chunk in chunks]
+    question_terms = set(_TERM_PATTERN.findall(question.lower()))
+
+    def relevance(index: int) -> float:
+        terms = set(_TERM_PATTERN.findall(chunks[index].lower()))
+        return len(terms & question_terms) / math.sqrt(len(terms) + 1)
+
+    ranked = sorted(range(len(chunks)), key=lambda i: (-relevance(i), i))
+    kept: Dict[int, str] = {}
+    used = 0
+    for index in ranked:
+        if used + chunk_tokens[index] <= budget_tokens:
+            kept[index] = chunks[index]
+            used += chunk_tokens[index]
+
+    if not kept and ranked and budget_tokens > 0:
+        # Nothing fits whole: keep the head of the most relevant chunk
+        best = ranked[0]
+        kept[best] = _truncate_to_budget(chunks[best], budget_tokens, count)
+        used = count(kept[best])
+
+    trimmed = "\n\n".join(kept[index] for index in sorted(kept))
+    return trimmed, {
+        "context_tokens": used,
+        "context_tokens_dropped": max(0, total - used),
+        "context_chunks_dropped": len(chunks) - len(kept),
+    }
+
+
+def _build_qa_prompt(
+    question: str,
+    context: str,
+    model: str,
+    parameters: Dict[str, Any],
+) -> Tuple[str, Dict[str, int]]:
+    """Render the QA prompt with context trimmed to fit the model window, when it is known"""
+    tokenizer_key, count = _token_counter(model)
+    fixed = QA_PROMPT_TEMPLATE.static_tokens(tokenizer_key, count) + count(question)
+    generation = int(parameters.get("max_new_tokens") or 0)
+    window = _model_window(model)
+    if window is None and model not in _unbudgeted_models:
+        _unbudgeted_models.add(model)
+        logger.warning(f"No context window known for {model}; QA context is sent untrimmed")
+    budget = None if window is None else max(0, window - fixed - generation - HEADY_QA_TOKEN_MARGIN)
+    trimmed, stats = budget_context(question, context or "", budget, count)
+    stats["prompt_tokens"] = fixed + stats["context_tokens"]
+    return QA_PROMPT_TEMPLATE.render(context=trimmed, question=question), stats
 
 
 def qa_interface(question: str, context: str = "", model: Optional[str] = None, parameters: Optional[Dict[str, Any]] = None, max_new_tokens: int = 256, request_id: str = "") -> Dict[str, Any]:
     """QA interface for Node.js manager communication"""
     try:
         used_model = model or DEFAULT_HF_TEXT_MODEL
-        merged_parameters = {
-            "max_new_tokens": max_new_tokens,
-            "temperature": 0.2,
-            "return_full_text": False,
-            **(parameters or {}),
-        }
+        merged_parameters = _qa_parameters(max_new_tokens, parameters)
+        prompt, budget_stats = _build_qa_prompt(question, context, used_model, merged_parameters)
         
-        prompt = f"""You are Heady Systems Q&A. Provide a clear, safe, and concise answer. Do not reveal secrets, API keys, tokens, or private data.
+        def generate() -> str:
+            result = hf_generate(prompt, model=used_model, parameters=merged_parameters)
+            answer = result.get("output") or ""
 
-Context:
-{context}
+            # Remove prompt echo if present
+            if answer.startswith(prompt):
+                answer = answer[len(prompt):].strip()
+            return answer
 
-Question:
-{question}
+        cached = False
+        coalesced = False
+        if _qa_cacheable(merged_parameters):
+            key = _qa_cache_key(used_model, prompt, merged_parameters)
+            answer = _qa_cache.get(key)
+            cached = answer is not None
+            if not cached:
+                answer, coalesced = _qa_flight.do(key, generate)
+                if not coalesced:
+                    _qa_cache.put(key, answer)
+        else:
+            answer = generate()
+            
+        return {
+            "ok": True,
+            "answer": answer,
+            "model": used_model,
+            "backend": _backend_name(),
+            "request_id": request_id,
+            "cached": cached,
+            "coalesced": coalesced,
+            **budget_stats,
+        }
+    except Exception as e:
+        return {
+            "ok": False,
+            "error": str(e),
+            "backend": _backend_name(),
+            "request_id": request_id,
+        }
 
-Answer:"""
-        
-        result = hf_generate(prompt, model=used_model, parameters=merged_parameters)
-        answer = result.get("output", "")
-        
-        # Remove prompt echo if present
+
+def qa_interface_stream(
+    question: str,
+    context: str = "",
+    model: Optional[str] = None,
+    parameters: Optional[Dict[str, Any]] = None,
+    max_new_tokens: int = 256,
+    request_id: str = "",
+    emit: Any = None,
+) -> Dict[str, Any]:
+    """Streaming QA: emits one token event per chunk and returns the final done event"""
+    emit = emit or _emit
+    started = time.perf_counter()
+    ttft_ms: Optional[float] = None
+    chunks: List[str] = []
+    try:
+        used_model = model or DEFAULT_HF_TEXT_MODEL
+        merged_parameters = _qa_parameters(max_new_tokens, parameters)
+        prompt, budget_stats = _build_qa_prompt(question, context, used_model, merged_parameters)
+
+        cacheable = _qa_cacheable(merged_parameters)
+        key = _qa_cache_key(used_model, prompt, merged_parameters) if cacheable else ""
+        cached_answer = _qa_cache.get(key) if cacheable else None
+        stream = [cached_answer] if cached_answer is not None else hf_generate_stream(
+            prompt, model=used_model, parameters=merged_parameters
+        )
+
+        for text in stream:
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - started) * 1000.0
+            emit({
+                "event": "token",
+                "request_id": request_id,
+                "index": len(chunks),
+                "text": text,
+            })
+            chunks.append(text)
+
+        answer = "".join(chunks)
         if answer.startswith(prompt):
             answer = answer[len(prompt):].strip()
-            
+        if cacheable and cached_answer is None:
+            _qa_cache.put(key, answer)
+
         return {
+            "event": "done",
             "ok": True,
             "answer": answer,
             "model": used_model,
-            "backend": "python-hf",
+            "backend": _backend_name(),
             "request_id": request_id,
+            "cached": cached_answer is not None,
+            "tokens": len(chunks),
+            "ttft_ms": round(ttft_ms, 2) if ttft_ms is not None else None,
+            "total_ms": round((time.perf_counter() - started) * 1000.0, 2),
+            **budget_stats,
         }
     except Exception as e:
         return {
+            "event": "done",
             "ok": False,
             "error": str(e),
-            "backend": "python-hf",
+            "backend": _backend_name(),
             "request_id": request_id,
+            "tokens": len(chunks),
+            "ttft_ms": round(ttft_ms, 2) if ttft_ms is not None else None,
         }
 
 
+def _gpu_url(path: str) -> str:
+    if not REMOTE_GPU_HOST:
+        raise RuntimeError("GPU worker host not configured")
+    return f"http://{REMOTE_GPU_HOST}:{REMOTE_GPU_PORT}{path}"
+
+
+def _gpu_item(
+    task: str,
+    data: Any,
+    model: Optional[str] = None,
+    parameters: Optional[Dict[str, Any]] = None,
+    request_id: str = ""
+) -> Dict[str, Any]:
+    return {
+        "task": task,
+        "data": data,
+        "model": model,
+        "parameters": parameters,
+        "request_id": request_id
+    }
+
+
 def gpu_worker_interface(
     task: str,
     data: Any,
@@ -228,24 +1968,15 @@ def gpu_worker_interface(
 ) -> Dict[str, Any]:
     """Interface for GPU worker communication"""
     try:
-        if not REMOTE_GPU_HOST:
-            raise RuntimeError("GPU worker host not configured")
-            
         # Connect to GPU worker service
-        url = f"http://{REMOTE_GPU_HOST}:{REMOTE_GPU_PORT}/process"
-        payload = {
-            "task": task,
-            "data": data,
-            "model": model,
-            "parameters": parameters,
-            "request_id": request_id
-        }
+        url = _gpu_url("/process")
+        payload = _gpu_item(task, data, model, parameters, request_id)
         
-        response = requests.post(
+        response = _http_post(
             url,
             json=payload,
             headers={"Content-Type": "application/json"},
-            timeout=30
+            timeout=HEADY_GPU_TIMEOUT_S
         )
         response.raise_for_status()
         
@@ -264,36 +1995,283 @@ def gpu_worker_interface(
         }
 
 
+_GpuItem = Tuple[Dict[str, Any], Future]
+
+
+class GPUBatchDispatcher:
+    """Packs GPU worker tasks into POST /process_batch requests.
+
+    Tasks are collected until max_batch_size items are queued or max_wait_ms has
+    passed since the first one, and up to max_in_flight batches are on the wire at
+    once. The worker answers {"results": [...]} with one entry per request_id,
+    in any order; items it drops or fails are reported individually without
+    failing the rest of the batch. Workers without /process_batch (404) fall
+    back to one /process call per item.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = HEADY_GPU_BATCH_SIZE,
+        max_wait_ms: float = HEADY_GPU_BATCH_WAIT_MS,
+        max_in_flight: int = HEADY_GPU_BATCH_IN_FLIGHT,
+        timeout_s: float = HEADY_GPU_TIMEOUT_S,
+    ):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        self.max_in_flight = max_in_flight
+        self.timeout_s = timeout_s
+        self.batch_supported = True
+        self._queue: "queue.Queue[_GpuItem]" = queue.Queue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._in_flight = 0
+        self._stats: Dict[str, int] = {
+            "requests": 0,
+            "batches": 0,
+            "items_sent": 0,
+            "max_batch": 0,
+            "max_in_flight": 0,
+            "item_errors": 0,
+            "batch_errors": 0,
+            "fallback_items": 0,
+        }
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_in_flight,
+                    thread_name_prefix="heady-gpu-batch",
+                )
+                thread = threading.Thread(target=self._run, name="heady-gpu-batcher", daemon=True)
+                thread.start()
+                self._thread = thread
+
+    def submit(
+        self,
+        task: str,
+        data: Any,
+        model: Optional[str] = None,
+        parameters: Optional[Dict[str, Any]] = None,
+        request_id: str = ""
+    ) -> Future:
+        """Queue one task; the future resolves to the same dict gpu_worker_interface returns"""
+        self._ensure_started()
+        future: Future = Future()
+        with self._lock:
+            self._stats["requests"] += 1
+        self._queue.put((_gpu_item(task, data, model, parameters, request_id), future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait_ms / 1000.0
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._send, batch)
+
+    def _wire_ids(self, batch: List[_GpuItem]) -> List[str]:
+        """Caller request_ids, replaced where missing or repeated so every item demuxes uniquely"""
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        seen = set()
+        wire_ids = []
+        for index, (item, _) in enumerate(batch):
+            wire_id = str(item["request_id"] or "")
+            if not wire_id or wire_id in seen:
+                wire_id = f"gpu-batch-{sequence}-{index}"
+            seen.add(wire_id)
+            wire_ids.append(wire_id)
+        return wire_ids
+
+    def _send(self, batch: List[_GpuItem]) -> None:
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["items_sent"] += len(batch)
+            self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+            self._in_flight += 1
+            self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._in_flight)
+        try:
+            if self.batch_supported:
+                self._send_batch(batch)
+            else:
+                self._send_each(batch)
+        except Exception as e:
+            with self._lock:
+                self._stats["batch_errors"] += 1
+            for item, future in batch:
+                if not future.done():
+                    future.set_result(self._failure(item, str(e)))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _send_batch(self, batch: List[_GpuItem]) -> None:
+        wire_ids = self._wire_ids(batch)
+        items = [{**item, "request_id": wire_id} for (item, _), wire_id in zip(batch, wire_ids)]
+        response = _http_post(
+            _gpu_url("/process_batch"),
+            json={"items": items},
+            headers={"Content-Type": "application/json"},
+            timeout=self.timeout_s,
+        )
+        if response.status_code == 404:
+            logger.warning("GPU worker has no /process_batch endpoint; sending tasks individually")
+            self.batch_supported = False
+            self._send_each(batch)
+            return
+        response.raise_for_status()
+
+        results = response.json().get("results")
+        if not isinstance(results, list):
+            raise RuntimeError("GPU worker batch response has no results list")
+        by_id = {str(entry.get("request_id", "")): entry for entry in results if isinstance(entry, dict)}
+
+        for (item, future), wire_id in zip(batch, wire_ids):
+            entry = by_id.get(wire_id)
+            if entry is None:
+                result = self._failure(item, f"GPU worker returned no result for {wire_id}")
+            elif entry.get("ok", "error" not in entry):
+                result = {
+                    "ok": True,
+                    "result": entry.get("result"),
+                    "backend": "python-gpu",
+                    "request_id": item["request_id"],
+                }
+            else:
+                result = self._failure(item, str(entry.get("error") or "GPU worker task failed"))
+            future.set_result(result)
+
+    def _send_each(self, batch: List[_GpuItem]) -> None:
+        with self._lock:
+            self._stats["fallback_items"] += len(batch)
+        for item, future in batch:
+            result = gpu_worker_interface(**item)
+            if not result["ok"]:
+                with self._lock:
+                    self._stats["item_errors"] += 1
+            future.set_result(result)
+
+    def _failure(self, item: Dict[str, Any], error: str) -> Dict[str, Any]:
+        with self._lock:
+            self._stats["item_errors"] += 1
+        return {
+            "ok": False,
+            "error": error,
+            "backend": "python-gpu",
+            "request_id": item["request_id"],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["in_flight"] = self._in_flight
+        batches = stats["batches"]
+        stats["enabled"] = HEADY_GPU_BATCHING
+        stats["batch_supported"] = self.batch_supported
+        stats["max_batch_size"] = self.max_batch_size
+        stats["max_wait_ms"] = self.max_wait_ms
+        stats["queued"] = self._queue.qsize()
+        stats["avg_batch_size"] = round(stats["items_sent"] / batches, 2) if batches else 0.0
+        return stats
+
+
+_gpu_dispatcher: Optional[GPUBatchDispatcher] = None
+_gpu_dispatcher_lock = threading.Lock()
+
+
+def get_gpu_dispatcher() -> GPUBatchDispatcher:
+    """Return the process-wide GPU batch dispatcher"""
+    global _gpu_dispatcher
+    if _gpu_dispatcher is None:
+        with _gpu_dispatcher_lock:
+            if _gpu_dispatcher is None:
+                _gpu_dispatcher = GPUBatchDispatcher()
+    return _gpu_dispatcher
+
+
+def gpu_worker_interface_batched(
+    task: str,
+    data: Any,
+    model: Optional[str] = None,
+    parameters: Optional[Dict[str, Any]] = None,
+    request_id: str = ""
+) -> Dict[str, Any]:
+    """gpu_worker_interface through the shared dispatcher; the task may share a request with others"""
+    return get_gpu_dispatcher().submit(task, data, model, parameters, request_id).result()
+
+
+def gpu_worker_batch(items: Sequence[Dict[str, Any]], request_id: str = "") -> Dict[str, Any]:
+    """Run many {task, data, model, parameters, request_id} items; results keep the input order"""
+    dispatcher = get_gpu_dispatcher()
+    futures = [
+        dispatcher.submit(
+            item.get("task", ""),
+            item.get("data"),
+            item.get("model"),
+            item.get("parameters"),
+            item.get("request_id", ""),
+        )
+        for item in items
+    ]
+    results = [future.result() for future in futures]
+    failed = sum(1 for result in results if not result["ok"])
+    return {
+        "ok": failed == 0,
+        "results": results,
+        "failed": failed,
+        "backend": "python-gpu",
+        "request_id": request_id
+    }
+
+
+def _qa_from_request(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    question = input_data.get("question", "")
+    context = input_data.get("context", "")
+    model = input_data.get("model")
+    parameters = input_data.get("parameters")
+    max_new_tokens = input_data.get("max_new_tokens", 256)
+    request_id = input_data.get("request_id", "")
+
+    if input_data.get("stream"):
+        return qa_interface_stream(question, context, model, parameters, max_new_tokens, request_id)
+    return qa_interface(question, context, model, parameters, max_new_tokens, request_id)
+
+
 def handle_qa_command():
     """Handle QA command from stdin (JSON input)"""
     try:
         # Read JSON from stdin
         input_data = json.loads(sys.stdin.read())
         
-        question = input_data.get("question", "")
-        context = input_data.get("context", "")
-        model = input_data.get("model")
-        parameters = input_data.get("parameters")
-        max_new_tokens = input_data.get("max_new_tokens", 256)
-        request_id = input_data.get("request_id", "")
-        
-        result = qa_interface(question, context, model, parameters, max_new_tokens, request_id)
-        print(json.dumps(result))
+        result = _qa_from_request(input_data)
+        _emit(result)
         sys.exit(0)
         
     except Exception as e:
         error_result = {
             "ok": False,
             "error": str(e),
-            "backend": "python-hf",
+            "backend": _backend_name(),
         }
         print(json.dumps(error_result))
         sys.exit(1)
 
 
-def handle_health_check() -> None:
-    """Handle health check command"""
-    health_status = {
+def _health_status() -> Dict[str, Any]:
+    return {
         "status": "healthy",
         "service": "heady-python-worker",
         "timestamp": int(time.time()),
@@ -301,8 +2279,494 @@ def handle_health_check() -> None:
         "default_text_model": DEFAULT_HF_TEXT_MODEL,
         "default_embed_model": DEFAULT_HF_EMBED_MODEL,
         "worker_timeout_ms": HEADY_PY_WORKER_TIMEOUT_MS,
+        "http_pool": http_pool_stats(),
+        "backend": _backend.stats() if _backend is not None else {"name": _backend_name()},
+        "endpoints": [endpoint.snapshot() for endpoint in _hf_endpoints],
+        "embed_batching": _embedding_batcher.stats() if _embedding_batcher is not None else {
+            "enabled": HEADY_EMBED_BATCHING,
+            "max_batch_size": HEADY_EMBED_BATCH_SIZE,
+            "max_wait_ms": HEADY_EMBED_BATCH_WAIT_MS,
+        },
+        "embed_cache": _embedding_cache.stats() if _embedding_cache is not None else {
+            "enabled": HEADY_EMBED_CACHE,
+            "capacity": HEADY_EMBED_CACHE_SIZE,
+            "disk_dir": HEADY_EMBED_CACHE_DIR,
+        },
+        "qa_cache": {**_qa_cache.stats(), "coalesced": _qa_flight.coalesced},
+        "async_engine": _async_engine.stats() if _async_engine is not None else {
+            "max_concurrency": HEADY_PY_ASYNC_CONCURRENCY,
+        },
+        "gpu_batching": _gpu_dispatcher.stats() if _gpu_dispatcher is not None else {
+            "enabled": HEADY_GPU_BATCHING,
+            "max_batch_size": HEADY_GPU_BATCH_SIZE,
+            "max_wait_ms": HEADY_GPU_BATCH_WAIT_MS,
+        },
+    }
+
+
+def handle_health_check() -> None:
+    """Handle health check command"""
+    print(json.dumps(_health_status()))
+    sys.exit(0)
+
+
+_stdout_lock = threading.Lock()
+
+
+# Compact wire framing for serve mode, opted into per request with "wire": "f32" or "msgpack".
+# A frame is FRAME_MAGIC | u8 codec | u32le body length | body. JSON lines never start
+# with NUL, so a reader can tell frames and lines apart from the first byte.
+#   f32:     body = u32le header length | UTF-8 JSON header padded to 4 bytes | raw buffers;
+#            each ndarray in the header is {"$ndarray": {"dtype", "shape", "offset", "nbytes"}}
+#            pointing into the buffers as little-endian float32
+#   msgpack: body = msgpack map; ndarrays become {"$ndarray": {"dtype", "shape", "data": bin}}
+FRAME_MAGIC = b"\x00HDY"
+WIRE_CODECS = {"f32": 1, "msgpack": 2}
+_FRAME_PREFIX = struct.Struct("<4sBI")
+_U32 = struct.Struct("<I")
+
+
+def _msgpack() -> Any:
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    return msgpack
+
+
+def wire_formats() -> List[str]:
+    """Wire formats this worker can answer with"""
+    return ["json", "f32"] + (["msgpack"] if _msgpack() is not None else [])
+
+
+def _negotiate_wire(requested: Any) -> Tuple[str, Optional[str]]:
+    """(wire format to use, reason when the request could not be honoured)"""
+    wire = str(requested or "json").lower()
+    if wire == "json":
+        return "json", None
+    if wire not in WIRE_CODECS:
+        return "json", f"unknown wire format {wire}"
+    if wire == "msgpack" and _msgpack() is None:
+        return "json", "msgpack is not installed"
+    return wire, None
+
+
+def _f32_body(message: Dict[str, Any]) -> bytes:
+    buffers: List[bytes] = []
+    offset = 0
+
+    def default(obj: Any) -> Any:
+        nonlocal offset
+        if isinstance(obj, np.ndarray) and obj.dtype.kind == "f":
+            data = np.ascontiguousarray(obj, dtype="<f4").tobytes()
+            buffers.append(data)
+            ref = {"dtype": "<f4", "shape": list(obj.shape), "offset": offset, "nbytes": len(data)}
+            offset += len(data)
+            return {"$ndarray": ref}
+        return _json_default(obj)
+
+    header = json.dumps(message, default=default, separators=(",", ":")).encode("utf-8")
+    # Pad so the buffers start 4-byte aligned and can be viewed as Float32Array without a copy
+    header += b" " * (-(_U32.size + len(header)) % 4)
+    return b"".join([_U32.pack(len(header)), header, *buffers])
+
+
+def _msgpack_body(message: Dict[str, Any]) -> bytes:
+    def default(obj: Any) -> Any:
+        if isinstance(obj, np.ndarray) and obj.dtype.kind == "f":
+            data = np.ascontiguousarray(obj, dtype="<f4").tobytes()
+            return {"$ndarray": {"dtype": "<f4", "shape": list(obj.shape), "data": data}}
+        return _json_default(obj)
+
+    return _msgpack().packb(message, default=default, use_bin_type=True)
+
+
+def encode_frame(message: Dict[str, Any], wire: str) -> bytes:
+    """Serialize one response as a length-prefixed frame in the given wire format"""
+    body = _msgpack_body(message) if wire == "msgpack" else _f32_body(message)
+    return _FRAME_PREFIX.pack(FRAME_MAGIC, WIRE_CODECS[wire], len(body)) + body
+
+
+def _restore_arrays(value: Any, buffers: Optional[memoryview] = None) -> Any:
+    if isinstance(value, dict):
+        ref = value.get("$ndarray")
+        if isinstance(ref, dict) and len(value) == 1:
+            if "data" in ref:
+                flat = np.frombuffer(ref["data"], dtype=ref["dtype"])
+            else:
+                flat = np.frombuffer(buffers[ref["offset"]:ref["offset"] + ref["nbytes"]], dtype=ref["dtype"])
+            return flat.reshape(ref["shape"])
+        return {k: _restore_arrays(v, buffers) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_restore_arrays(v, buffers) for v in value]
+    return value
+
+
+def decode_frame(frame: bytes) -> Dict[str, Any]:
+    """Inverse of encode_frame; arrays come back as read-only float32 views of the frame"""
+    magic, codec, length = _FRAME_PREFIX.unpack_from(frame)
+    if magic != FRAME_MAGIC:
+        raise RuntimeError("Not a Heady wire frame")
+    body = memoryview(frame)[_FRAME_PREFIX.size:_FRAME_PREFIX.size + length]
+    if len(body) != length:
+        raise RuntimeError(f"Truncated frame: expected {length} bytes, got {len(body)}")
+    if codec == WIRE_CODECS["msgpack"]:
+        if _msgpack() is None:
+            raise RuntimeError("msgpack frame received but msgpack is not installed")
+        return _restore_arrays(_msgpack().unpackb(body, raw=False))
+    if codec != WIRE_CODECS["f32"]:
+        raise RuntimeError(f"Unknown frame codec: {codec}")
+    (header_length,) = _U32.unpack_from(body)
+    header_end = _U32.size + header_length
+    message = json.loads(bytes(body[_U32.size:header_end]))
+    return _restore_arrays(message, body[header_end:])
+
+
+def read_frame(stream: Any) -> Optional[Dict[str, Any]]:
+    """Read one frame from a binary stream positioned at a frame start; None at EOF"""
+    prefix = stream.read(_FRAME_PREFIX.size)
+    if not prefix:
+        return None
+    _, _, length = _FRAME_PREFIX.unpack(prefix)
+    return decode_frame(prefix + stream.read(length))
+
+
+def _emit(message: Dict[str, Any], wire: str = "json") -> None:
+    """Write one JSON line (or binary frame) to stdout without interleaving concurrent writers"""
+    if wire != "json":
+        frame = encode_frame(message, wire)
+        with _stdout_lock:
+            sys.stdout.flush()
+            sys.stdout.buffer.write(frame)
+            sys.stdout.buffer.flush()
+        return
+    line = json.dumps(message, default=_json_default)
+    with _stdout_lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+
+def _embed_from_request(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    request_id = input_data.get("request_id", "")
+    try:
+        embed = hf_embed_batched if HEADY_EMBED_BATCHING else hf_embed
+        result = embed(
+            input_data.get("text", ""),
+            model=input_data.get("model"),
+            options=input_data.get("options"),
+            pooling=input_data.get("pooling", HEADY_EMBED_POOLING),
+            normalize=bool(input_data.get("normalize", HEADY_EMBED_NORMALIZE)),
+        )
+        return {
+            "ok": True,
+            "embeddings": result["embeddings"],
+            "model": result["model"],
+            "backend": _backend_name(),
+            "request_id": request_id,
+        }
+    except Exception as e:
+        return {
+            "ok": False,
+            "error": str(e),
+            "backend": _backend_name(),
+            "request_id": request_id,
+        }
+
+
+def _dispatch_serve_request(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    command = input_data.get("command", "qa")
+    request_id = input_data.get("request_id", "")
+
+    if command == "qa":
+        return _qa_from_request(input_data)
+    if command == "embed":
+        return _embed_from_request(input_data)
+    if command == "gpu":
+        gpu = gpu_worker_interface_batched if HEADY_GPU_BATCHING else gpu_worker_interface
+        return gpu(
+            input_data.get("task", ""),
+            input_data.get("data"),
+            input_data.get("model"),
+            input_data.get("parameters"),
+            request_id,
+        )
+    if command == "gpu_batch":
+        items = input_data.get("items")
+        if not isinstance(items, list):
+            return {"ok": False, "error": "gpu_batch requires an items list", "request_id": request_id}
+        return gpu_worker_batch(items, request_id)
+    if command == "health":
+        return {"ok": True, **_health_status(), "request_id": request_id}
+    return {"ok": False, "error": f"Unknown command: {command}", "request_id": request_id}
+
+
+def handle_serve_command() -> None:
+    """Serve newline-delimited JSON requests from stdin until EOF or shutdown"""
+    executor = ThreadPoolExecutor(
+        max_workers=HEADY_PY_SERVE_CONCURRENCY,
+        thread_name_prefix="heady-serve",
+    )
+
+    def run(input_data: Dict[str, Any]) -> None:
+        wire, wire_error = _negotiate_wire(input_data.get("wire"))
+        try:
+            result = _dispatch_serve_request(input_data)
+        except Exception as e:
+            result = {
+                "ok": False,
+                "error": str(e),
+                "backend": _backend_name(),
+                "request_id": input_data.get("request_id", ""),
+            }
+        if wire_error:
+            result["wire_error"] = f"{wire_error}; answered as json"
+        _emit(result, wire)
+
+    backend = get_backend()
+    if isinstance(backend, LocalBackend) and HEADY_LOCAL_WARM:
+        # Load the default models before announcing readiness so the first request is not a cold start
+        try:
+            backend.warm([DEFAULT_HF_TEXT_MODEL], [DEFAULT_HF_EMBED_MODEL])
+        except Exception as e:
+            logger.error(f"Local model warm-up failed: {e}")
+
+    _emit({
+        "event": "ready",
+        "backend": backend.name,
+        "service": "heady-python-worker",
+        "pid": os.getpid(),
+        "concurrency": HEADY_PY_SERVE_CONCURRENCY,
+        "wire_formats": wire_formats(),
+    })
+
+    try:
+        # readline() instead of iterating stdin so each request is handled as soon as it arrives
+        for line in iter(sys.stdin.readline, ""):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                input_data = json.loads(line)
+            except json.JSONDecodeError as e:
+                _emit({"ok": False, "error": f"Invalid JSON request: {e}", "request_id": ""})
+                continue
+            if not isinstance(input_data, dict):
+                _emit({"ok": False, "error": "Request must be a JSON object", "request_id": ""})
+                continue
+            if input_data.get("command") == "shutdown":
+                break
+            executor.submit(run, input_data)
+    except KeyboardInterrupt:
+        logger.info("Serve loop interrupted")
+    finally:
+        # Let in-flight requests finish before exiting
+        executor.shutdown(wait=True)
+
+    sys.exit(0)
+
+
+def _latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    if not latencies_ms:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    values = np.asarray(latencies_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(values.mean()), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def _stub_counters(base_url: str) -> Dict[str, int]:
+    try:
+        resp = get_http_session().get(f"{base_url}/stats", timeout=5)
+        return resp.json().get("counters", {})
+    except Exception:
+        return {}
+
+
+def _benchmark_payload(run: str, index: int, size: int) -> str:
+    # Unique prefix per run and request so the QA and embedding caches never answer
+    prefix = f"bench-{run}-{index} "
+    filler = "heady resonance " * (max(0, size - len(prefix)) // 16 + 1)
+    return (prefix + filler)[:max(size, len(prefix))]
+
+
+def run_benchmark_suite(
+    name: str,
+    call: Any,
+    *,
+    requests_total: int,
+    concurrency: int,
+    payload_size: int,
+    stub_url: str,
+    warmup: int = 3,
+) -> Dict[str, Any]:
+    """Drive `call(index, payload)` from a thread pool and summarize latency and throughput"""
+    run = f"{name}-{concurrency}-{payload_size}-{time.monotonic_ns()}"
+    for i in range(warmup):
+        call(-1 - i, _benchmark_payload(run, -1 - i, payload_size))
+
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+
+    def one(index: int) -> None:
+        payload = _benchmark_payload(run, index, payload_size)
+        started = time.perf_counter()
+        try:
+            ok = call(index, payload)
+            error = None if ok else "request returned ok=false"
+        except Exception as e:
+            error = str(e)
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with lock:
+            latencies.append(elapsed_ms)
+            if error:
+                errors.append(error)
+
+    before = _stub_counters(stub_url)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"heady-bench-{name}") as executor:
+        list(executor.map(one, range(requests_total)))
+    duration_s = time.perf_counter() - started
+    after = _stub_counters(stub_url)
+
+    return {
+        "suite": name,
+        "requests": requests_total,
+        "concurrency": concurrency,
+        "payload_bytes": payload_size,
+        "ok": requests_total - len(errors),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "duration_s": round(duration_s, 4),
+        "requests_per_s": round(requests_total / duration_s, 2) if duration_s > 0 else 0.0,
+        "latency_ms": _latency_summary(latencies),
+        "bytes_sent": after.get("bytes_in", 0) - before.get("bytes_in", 0),
+        "bytes_received": after.get("bytes_out", 0) - before.get("bytes_out", 0),
+        "upstream_requests": after.get("requests", 0) - before.get("requests", 0),
+    }
+
+
+BENCHMARK_SUITES = ("qa", "embed", "embed_batched", "gpu", "gpu_batched")
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the selected suites against a stub server and return a JSON-ready report"""
+    global HF_TOKEN, REMOTE_GPU_HOST, REMOTE_GPU_PORT, _hf_endpoints
+
+    stub = None
+    if args.target:
+        stub_url = args.target.rstrip("/")
+    else:
+        from hf_stub_server import StubConfig, start_stub_server
+        stub, _ = start_stub_server(StubConfig(
+            port=0,
+            latency_ms=args.stub_latency_ms,
+            token_latency_ms=args.stub_token_ms,
+            embed_dim=args.embed_dim,
+        ))
+        stub_url = f"http://127.0.0.1:{stub.server_address[1]}"
+
+    # Point every outbound path at the stub
+    HF_TOKEN = HF_TOKEN or "stub"
+    _hf_endpoints = _parse_endpoints(f"stub={stub_url}/models")
+    host_port = stub_url.split("://", 1)[-1]
+    REMOTE_GPU_HOST, _, port = host_port.partition(":")
+    REMOTE_GPU_PORT = int(port or 80)
+
+    def qa(index: int, payload: str) -> bool:
+        return qa_interface(payload, model="heady-bench-gpt", max_new_tokens=args.max_new_tokens)["ok"]
+
+    def embed(index: int, payload: str) -> bool:
+        hf_embed(payload, model="sentence-transformers/heady-bench")
+        return True
+
+    def embed_batched(index: int, payload: str) -> bool:
+        hf_embed_batched(payload, model="sentence-transformers/heady-bench")
+        return True
+
+    def gpu(index: int, payload: str) -> bool:
+        return gpu_worker_interface("bench", {"text": payload}, request_id=str(index))["ok"]
+
+    def gpu_batched(index: int, payload: str) -> bool:
+        return gpu_worker_interface_batched("bench", {"text": payload}, request_id=str(index))["ok"]
+
+    calls = {
+        "qa": qa,
+        "embed": embed,
+        "embed_batched": embed_batched,
+        "gpu": gpu,
+        "gpu_batched": gpu_batched,
+    }
+    suites = [name.strip() for name in args.suites.split(",") if name.strip()]
+    results = []
+    try:
+        for name in suites:
+            if name not in calls:
+                raise ValueError(f"Unknown benchmark suite: {name} (expected one of {', '.join(BENCHMARK_SUITES)})")
+            for concurrency in args.concurrency:
+                for payload_size in args.payload_size:
+                    results.append(run_benchmark_suite(
+                        name,
+                        calls[name],
+                        requests_total=args.requests,
+                        concurrency=concurrency,
+                        payload_size=payload_size,
+                        stub_url=stub_url,
+                    ))
+    finally:
+        if stub is not None:
+            stub.shutdown()
+
+    return {
+        "status": "ok",
+        "service": "heady-python-worker",
+        "benchmark": "inference-bridge",
+        "timestamp": int(time.time()),
+        "python": sys.version.split()[0],
+        "target": stub_url,
+        "backend": _backend_name(),
+        "http_pool": http_pool_stats(),
+        "results": results,
     }
-    print(json.dumps(health_status))
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def handle_test_command() -> None:
+    """Handle test command: benchmark the inference bridge against a local stub server"""
+    parser = argparse.ArgumentParser(prog="process_data.py test", description="Inference bridge benchmark")
+    parser.add_argument("--suites", default=",".join(BENCHMARK_SUITES),
+                        help=f"Comma-separated suites ({', '.join(BENCHMARK_SUITES)})")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per run")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8], help="Comma-separated concurrency levels")
+    parser.add_argument("--payload-size", type=_int_list, default=[256], help="Comma-separated payload sizes in bytes")
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--target", help="Existing stub server base URL (default: start one in-process)")
+    parser.add_argument("--stub-latency-ms", type=float, default=20.0)
+    parser.add_argument("--stub-token-ms", type=float, default=0.5)
+    parser.add_argument("--embed-dim", type=int, default=384)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args(sys.argv[2:])
+
+    try:
+        report = run_benchmarks(args)
+    except Exception as e:
+        logger.error(f"Benchmark failed: {e}")
+        print(json.dumps({"status": "error", "error": str(e)}))
+        sys.exit(1)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
     sys.exit(0)
 
 
@@ -315,11 +2779,10 @@ def main() -> None:
             handle_qa_command()
         elif command == "health":
             handle_health_check()
+        elif command == "serve":
+            handle_serve_command()
         elif command == "test":
-            # Placeholder for test functionality
-            logger.info("Test functionality not yet implemented")
-            print(json.dumps({"status": "not_implemented", "message": "Test functionality not yet implemented"}))
-            sys.exit(0)
+            handle_test_command()
         else:
             logger.error(f"Unknown command: {command}")
             print(json.dumps({"error": f"Unknown command: {command}"}))
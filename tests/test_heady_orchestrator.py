@@ -0,0 +1,557 @@
+# HEADY_BRAND:BEGIN
+# HEADY SYSTEMS :: SACRED GEOMETRY
+# FILE: tests/test_heady_orchestrator.py
+# LAYER: tests
+# 
+#         _   _  _____    _    ____   __   __
+#        | | | || ____|  / \  |  _ \ \ \ / /
+#        | |_| ||  _|   / _ \ | | | | \ V / 
+#        |  _  || |___ / ___ \| |_| |  | |  
+#        |_| |_||_____/_/   \_\____/   |_|  
+# 
+#    Sacred Geometry :: Organic Systems :: Breathing Interfaces
+# HEADY_BRAND:END
+
+"""Tests for src/heady_orchestrator.py"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from heady_orchestrator import (
+    ENERGY_SLOT_SECONDS,
+    DeferredTask,
+    DeferredTaskScheduler,
+    NODE_METRIC_COLUMNS,
+    RUNNING_STATES,
+    DynamicOrchestrator,
+    HeadyNode,
+    HostSample,
+    MetricsExporter,
+    MetricsRingStore,
+    NodeRegistry,
+    NodeState,
+    OrchestratorEvent,
+    PhasePlacementEngine,
+    ScalingAction,
+    SlidingSpectrum,
+    TempoOptimizer,
+    _spectral_pattern,
+)
+
+
+class FixedSampler:
+    """Stands in for HealthSampler: every node looks idle and healthy"""
+
+    def latest(self) -> HostSample:
+        return HostSample(10.0, 10.0, 10.0, 0.0, datetime.now(timezone.utc))
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+def make_orchestrator(**config) -> DynamicOrchestrator:
+    orchestrator = DynamicOrchestrator(config)
+    orchestrator.health_sampler = FixedSampler()
+    return orchestrator
+
+
+def test_scale_down_waits_for_failover(fast_sleep):
+    """A failover in flight must not let scale-down drain the last healthy node"""
+    np.random.seed(0)
+
+    async def scenario():
+        orchestrator = make_orchestrator(min_nodes=2, predictive_scaling=False)
+        failing, healthy = [node.node_id for node in await orchestrator.provision_nodes(2)]
+
+        orchestrator.nodes[failing].state = NodeState.UNHEALTHY
+        failover = orchestrator.start_failover(failing)
+        while failing not in orchestrator._replacements:
+            await fast_sleep(0)
+        replacement = orchestrator._replacements[failing]
+        assert orchestrator.nodes[replacement].state == NodeState.INITIALIZING
+
+        # The health sweep must not relabel the node being failed over
+        await orchestrator.collect_cluster_metrics()
+        assert orchestrator.nodes[failing].state == NodeState.UNHEALTHY
+
+        assert orchestrator.serving_node_ids() == {healthy}
+        assert orchestrator.committed_capacity() == 2
+        assert orchestrator.plan_scaling(ScalingAction.SCALE_DOWN).remove == []
+        assert orchestrator.plan_scaling(ScalingAction.SCALE_UP, target=2).add == 0
+
+        await failover
+        assert set(orchestrator.nodes) == {healthy, replacement}
+        assert orchestrator.serving_node_ids() == {healthy, replacement}
+        assert orchestrator._replacements == {}
+
+    asyncio.run(scenario())
+
+
+async def unreachable():
+    """health_check of a node that stopped answering"""
+    raise ConnectionError("node unreachable")
+
+
+def test_failover_that_raises_is_retried_on_the_next_sweep(fast_sleep):
+    np.random.seed(0)
+
+    async def scenario():
+        orchestrator = make_orchestrator(
+            min_nodes=2, predictive_scaling=False, metrics_interval=1.0,
+            scaling_interval=3600.0, placement_interval=3600.0,
+        )
+        attempts = []
+        handle_node_failure = orchestrator.handle_node_failure
+
+        async def flaky_failover(node_id):
+            attempts.append(node_id)
+            if len(attempts) == 1:
+                raise RuntimeError("provider unavailable")
+            await handle_node_failure(node_id)
+
+        orchestrator.handle_node_failure = flaky_failover
+        loop = asyncio.create_task(orchestrator.run_orchestration_loop())
+        while orchestrator.nodes.count(NodeState.HEALTHY) < 2:
+            await fast_sleep(0.001)
+        failing = sorted(orchestrator.nodes)[0]
+        # Every sweep now finds the node UNHEALTHY again, so its state never changes after this
+        orchestrator.nodes[failing].health_check = unreachable
+        orchestrator.nodes[failing].state = NodeState.UNHEALTHY
+        while failing in orchestrator.nodes:
+            await fast_sleep(0.001)
+        orchestrator.stop()
+        await loop
+
+        assert attempts[:2] == [failing, failing]
+        assert not orchestrator.nodes.in_state(NodeState.UNHEALTHY)
+        assert len(orchestrator.nodes) == 2
+
+    asyncio.run(asyncio.wait_for(scenario(), 10))
+
+
+def test_loop_durations_cover_every_event_kind(fast_sleep):
+    np.random.seed(0)
+
+    async def scenario():
+        orchestrator = make_orchestrator(
+            min_nodes=2, predictive_scaling=False, metrics_interval=1.0,
+            scaling_interval=2.0, placement_interval=3.0,
+        )
+        loop = asyncio.create_task(orchestrator.run_orchestration_loop())
+        while orchestrator.nodes.count(NodeState.HEALTHY) < 2:
+            await fast_sleep(0.001)
+        failing = sorted(orchestrator.nodes)[0]
+        orchestrator.nodes[failing].health_check = unreachable
+        orchestrator.nodes[failing].state = NodeState.UNHEALTHY
+        while failing in orchestrator.nodes or orchestrator.loop_durations["optimize_placement"].count == 0:
+            await fast_sleep(0.001)
+        orchestrator.stop()
+        await loop
+
+        durations = orchestrator.loop_durations
+        assert all(durations[kind].count > 0 for kind in
+                   ("collect_metrics", "evaluate_scaling", "optimize_placement", "node_failed"))
+        # Timed until the replacement is up and the node removed: provisioning, migration and drain
+        assert durations["node_failed"].sum >= (2 + 1 + 5) / 1000
+        text = MetricsExporter(orchestrator).render()
+        assert 'heady_orchestration_loop_duration_seconds_count{event="node_failed"}' in text
+
+    asyncio.run(asyncio.wait_for(scenario(), 10))
+
+
+def test_failover_leaves_nodes_being_drained_alone(fast_sleep):
+    np.random.seed(0)
+
+    async def scenario():
+        orchestrator = make_orchestrator(min_nodes=1, predictive_scaling=False)
+        ids = {node.node_id for node in await orchestrator.provision_nodes(3)}
+        victim = sorted(ids)[0]
+        drain = asyncio.create_task(orchestrator.deprovision_nodes([victim]))
+        while orchestrator.nodes[victim].state != NodeState.DRAINING:
+            await fast_sleep(0)
+
+        # A late health check or failure signal must not turn the drain into a failover
+        await orchestrator.nodes[victim].health_check()
+        orchestrator.signal_failure(victim)
+        assert orchestrator.nodes[victim].state == NodeState.DRAINING
+        await orchestrator.start_failover(victim)
+        assert set(orchestrator.nodes) == ids
+
+        assert await drain == [victim]
+        assert set(orchestrator.nodes) == ids - {victim}
+        # Failing over a node that is already gone is a no-op
+        await orchestrator.start_failover(victim)
+        assert set(orchestrator.nodes) == ids - {victim}
+
+    asyncio.run(scenario())
+
+
+def test_node_removed_during_failover_drops_its_replacement(fast_sleep, caplog):
+    np.random.seed(0)
+
+    async def scenario():
+        orchestrator = make_orchestrator(min_nodes=1, predictive_scaling=False)
+        failing, healthy = [node.node_id for node in await orchestrator.provision_nodes(2)]
+        orchestrator.nodes[failing].state = NodeState.UNHEALTHY
+        failover = orchestrator.start_failover(failing)
+        while failing not in orchestrator._replacements:
+            await fast_sleep(0)
+
+        await asyncio.gather(orchestrator.deprovision_node(failing), failover)
+        assert set(orchestrator.nodes) == {healthy}
+        assert orchestrator._failovers == {} and orchestrator._replacements == {}
+
+    asyncio.run(scenario())
+    assert "Failover for node" not in caplog.text
+
+
+def test_scale_down_skips_starting_and_draining_nodes(fast_sleep):
+    async def scenario():
+        orchestrator = make_orchestrator(min_nodes=1)
+        ids = [node.node_id for node in await orchestrator.provision_nodes(3)]
+        orchestrator.nodes[ids[0]].state = NodeState.DRAINING
+        orchestrator.nodes[ids[1]].state = NodeState.INITIALIZING
+
+        assert orchestrator.serving_node_ids() == {ids[2]}
+        assert orchestrator.plan_scaling(ScalingAction.SCALE_DOWN).remove == []
+
+    asyncio.run(scenario())
+
+
+def night_cheap_tempo(now: float) -> TempoOptimizer:
+    """A day of recorded prices where 00:00-06:00 costs half as much"""
+    tempo = TempoOptimizer()
+    for i in range(96):
+        timestamp = now - (96 - i) * ENERGY_SLOT_SECONDS
+        hour = (timestamp // 3600) % 24
+        tempo.record_energy_price(0.5 if hour < 6 else 1.0, timestamp)
+    return tempo
+
+
+NOON = 1_700_049_600.0  # 2023-11-15 12:00 UTC
+
+
+@pytest.mark.parametrize("priority", [0.3, 0.5, 0.9, 1.0])
+def test_high_priority_runs_now(priority):
+    tempo = night_cheap_tempo(NOON)
+    assert tempo.best_start(NOON, NOON + 24 * 3600, 3600, priority) == (NOON, 0.0)
+
+
+def test_low_priority_waits_for_cheap_window():
+    tempo = night_cheap_tempo(NOON)
+    start, weight = tempo.best_start(NOON, NOON + 24 * 3600, 3600, 0.0)
+    assert weight > 0
+    assert 0 <= (start // 3600) % 24 < 6
+
+
+def test_predict_optimal_time_keeps_priority_threshold():
+    tempo = TempoOptimizer()
+    before = datetime.now(timezone.utc)
+    assert tempo.predict_optimal_time(3600, priority=0.8) - before < timedelta(seconds=5)
+
+
+def test_tariff_replaces_the_default_night_profile():
+    tariff = [1.0] * 24
+    tariff[14] = 0.25
+    tempo = TempoOptimizer(tariff=tariff)
+    start, _ = tempo.best_start(NOON, NOON + 24 * 3600, 3600, 0.0)
+    assert datetime.fromtimestamp(start, timezone.utc).hour == 14
+    with pytest.raises(ValueError):
+        TempoOptimizer(tariff=[1.0] * 12)
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_metrics_sweep_records_prices_from_the_configured_source(fast_sleep, asynchronous):
+    prices = iter([0.4, None, RuntimeError("feed down"), 0.7])
+
+    def next_price():
+        price = next(prices)
+        if isinstance(price, Exception):
+            raise price
+        return price
+
+    async def next_price_async():
+        return next_price()
+
+    async def scenario():
+        orchestrator = make_orchestrator(energy_price_source=next_price_async if asynchronous else next_price)
+        await orchestrator.provision_nodes(1)
+        recorded = []
+        for _ in range(4):
+            await orchestrator._handle_event(OrchestratorEvent.COLLECT_METRICS, None)
+            recorded.append(list(orchestrator.tempo_optimizer.energy_prices))
+        assert recorded == [[0.4], [0.4], [0.4], [0.7]]
+
+    asyncio.run(scenario())
+
+
+def test_scheduler_starts_high_priority_tasks_immediately():
+    tempo = night_cheap_tempo(NOON)
+    scheduler = DeferredTaskScheduler(tempo)
+    for i in range(4):
+        scheduler.submit(DeferredTask(f"urgent-{i}", duration=1800, priority=0.9), now=NOON)
+    scheduler.submit(DeferredTask("batch", duration=1800, priority=0.1), now=NOON)
+
+    started = scheduler.dispatch(["a", "b", "c", "d", "e"], now=NOON)
+    assert sorted(task.task_id for task in started) == [f"urgent-{i}" for i in range(4)]
+    assert scheduler.metrics()["mean_wait_seconds"] == 0.0
+    assert scheduler.metrics()["queued"] == 1
+
+
+def test_placement_replay_lowers_peak_of_recorded_series():
+    rng = np.random.default_rng(0)
+    t = np.arange(100)
+    series = {
+        f"node-{i}": 80 - 15 * np.sin(2 * np.pi * t / (10, 20, 25)[i % 3]) + rng.normal(0, 1, 100)
+        for i in range(12)
+    }
+    report = PhasePlacementEngine().simulate(series, sample_interval=10.0)
+    assert len(report.placements) == 12
+    assert report.placed_peak < report.golden_ratio_peak < report.baseline_peak
+    for placement in report.placements.values():
+        assert 0 <= placement.offset_seconds < placement.period_seconds
+
+
+def recurring(count: int, period: float = 600, duration: float = 60):
+    return [DeferredTask(f"cron-{i}", duration=duration, period=period, load=30) for i in range(count)]
+
+
+def test_place_recurring_staggers_and_spreads_tasks():
+    background = {node: np.full(100, 85.0) for node in ("a", "b", "c")}
+    report = PhasePlacementEngine().place_recurring(
+        recurring(6), background, sample_interval=10.0, hosts=["a", "b", "c"], now=NOON
+    )
+    offsets = sorted(p.offset_seconds for p in report.placements.values())
+    assert len(set(offsets)) == 6
+    assert {p.node_id for p in report.placements.values()} == {"a", "b", "c"}
+    assert report.placed_peak < report.baseline_peak
+
+
+def test_optimize_placement_schedules_recurring_tasks_at_their_offsets(fast_sleep):
+    np.random.seed(0)
+
+    async def scenario():
+        orchestrator = make_orchestrator(min_nodes=3, metrics_interval=10.0)
+        await orchestrator.provision_nodes(3)
+        for _ in range(20):
+            await orchestrator.collect_cluster_metrics()
+        scheduler = orchestrator.task_scheduler
+        for task in recurring(6):
+            scheduler.submit(task, now=NOON)
+
+        await orchestrator.optimize_placement()
+        report = orchestrator.placement_report
+        assert report.placed_peak < report.baseline_peak
+
+        nodes = sorted(orchestrator.serving_node_ids())
+        starts = []
+        for step in range(0, 1800, 10):
+            starts += [(task, task.start) for task in scheduler.dispatch(nodes, now=NOON + step)]
+        assert len(starts) == 18
+        for task, start in starts:
+            placement = report.placements[task.task_id]
+            assert task.node_id == placement.node_id
+            assert (start - placement.offset_seconds) % task.period == 0
+        assert scheduler.metrics()["mean_wait_seconds"] == 0.0
+
+    asyncio.run(scenario())
+
+
+def test_optimize_placement_replays_node_load_without_recurring_tasks(fast_sleep):
+    np.random.seed(0)
+
+    async def scenario():
+        orchestrator = make_orchestrator(min_nodes=3, metrics_interval=10.0)
+        sampler = orchestrator.health_sampler = LoadSampler()
+        await orchestrator.provision_nodes(3)
+        # Every node shares the host, so their 10-sample cycles peak together
+        for step in range(60):
+            sampler.cpu_percent = 30 + 20 * np.sin(2 * np.pi * step / 10)
+            await orchestrator.collect_cluster_metrics()
+
+        await orchestrator.optimize_placement()
+        report = orchestrator.placement_report
+        assert set(report.placements) == orchestrator.serving_node_ids()
+        assert report.placed_peak < report.baseline_peak
+        for placement in report.placements.values():
+            assert placement.period_seconds == 100.0
+
+    asyncio.run(scenario())
+
+
+def seasonal_demand(ticks: int = 1500) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    t = np.arange(ticks)
+    return np.maximum(0, 200 + 150 * np.sin(2 * np.pi * t / 100) + rng.normal(0, 10, ticks))
+
+
+def test_predictive_scaling_beats_reactive_on_seasonal_load():
+    orchestrator = DynamicOrchestrator({"min_nodes": 1, "max_nodes": 10})
+    demand = seasonal_demand()
+    predictive = orchestrator.simulate_scaling(demand, "predictive", provision_ticks=3)
+    reactive = orchestrator.simulate_scaling(demand, "reactive", provision_ticks=3)
+
+    assert predictive["mean_health"] > reactive["mean_health"] + 15
+    assert predictive["critical_ticks"] < reactive["critical_ticks"] / 2
+    assert predictive["below_target_ticks"] < reactive["below_target_ticks"]
+    # Better health is bought with more capacity
+    assert predictive["node_ticks"] > reactive["node_ticks"]
+
+
+@pytest.mark.parametrize("policy", ["predictive", "reactive"])
+def test_simulate_scaling_handles_zero_capacity(policy):
+    orchestrator = DynamicOrchestrator({"min_nodes": 0})
+    result = orchestrator.simulate_scaling(seasonal_demand(200), policy)
+    assert result["ticks"] == 200
+    assert np.isfinite(result["mean_health"])
+
+
+def test_simulate_scaling_keeps_explicit_zero_initial_nodes():
+    orchestrator = DynamicOrchestrator({"min_nodes": 2})
+    result = orchestrator.simulate_scaling([50.0, 50.0, 50.0], "reactive", initial_nodes=0)
+    # The first tick runs with no nodes at all, so health bottoms out
+    assert result["min_health"] == 0.0
+    assert result["node_ticks"] < 2 * 3
+
+
+def assert_same_pattern(actual, expected):
+    assert actual.pattern_type == expected.pattern_type
+    assert actual.period_seconds == expected.period_seconds
+    for name in ("amplitude", "trend", "confidence"):
+        assert getattr(actual, name) == pytest.approx(getattr(expected, name), rel=1e-6, abs=1e-9)
+
+
+def test_sliding_spectrum_matches_batch_pattern_across_resyncs():
+    rng = np.random.default_rng(1)
+    size = 64
+    t = np.arange(5 * size + 17)
+    series = 70 + 10 * np.sin(2 * np.pi * t / 16) + 0.05 * t + rng.normal(0, 2, len(t))
+    spectrum = SlidingSpectrum(size)
+    for i, value in enumerate(series):
+        spectrum.push(value)
+        # Check mid-window, just before and just after each exact recompute
+        if i >= 9 and (i % size in (0, 1, size // 2, size - 1) or i == len(series) - 1):
+            window = series[max(0, i + 1 - size):i + 1]
+            np.testing.assert_allclose(spectrum.values(), window)
+            assert_same_pattern(spectrum.pattern(), _spectral_pattern(window))
+
+
+class LoadSampler:
+    """HealthSampler stand-in whose CPU reading the test controls"""
+
+    def __init__(self, cpu_percent: float = 10.0):
+        self.cpu_percent = cpu_percent
+
+    def latest(self) -> HostSample:
+        return HostSample(self.cpu_percent, 10.0, 10.0, 0.0, datetime.now(timezone.utc))
+
+
+def make_registry(count: int, store: MetricsRingStore = None):
+    registry = NodeRegistry()
+    store = store if store is not None else MetricsRingStore(NODE_METRIC_COLUMNS, capacity=200)
+    nodes = []
+    for i in range(count):
+        node = HeadyNode(f"node-{i}", "worker" if i % 2 else "api", {}, sampler=LoadSampler(), store=store)
+        registry[node.node_id] = node
+        nodes.append(node)
+    return registry, nodes
+
+
+def test_registry_state_buckets_follow_transitions():
+    registry, nodes = make_registry(4)
+    assert registry.in_state(NodeState.INITIALIZING) == {node.node_id for node in nodes}
+
+    nodes[0].state = NodeState.HEALTHY
+    nodes[1].state = NodeState.HEALTHY
+    nodes[1].state = NodeState.DRAINING
+    nodes[2].state = NodeState.UNHEALTHY
+    assert registry.in_state(NodeState.HEALTHY) == {"node-0"}
+    assert registry.in_state(NodeState.DRAINING) == {"node-1"}
+    assert registry.in_state(NodeState.HEALTHY, NodeState.UNHEALTHY) == {"node-0", "node-2"}
+    assert registry.count(NodeState.INITIALIZING) == 1
+    assert registry.of_type("worker") == {"node-1", "node-3"}
+
+    del registry["node-0"]
+    assert "node-0" not in registry
+    assert registry.in_state(NodeState.HEALTHY) == set()
+    assert registry.of_type("api") == {"node-2"}
+    # A removed node's later transitions no longer touch the indexes
+    nodes[0].state = NodeState.DEGRADED
+    assert registry.in_state(NodeState.DEGRADED) == set()
+    assert sum(registry.count(state) for state in NodeState) == len(registry) == 3
+
+
+def test_registry_reports_state_changes():
+    seen = []
+    registry = NodeRegistry(on_state_change=lambda node, previous: seen.append((node.node_id, previous, node.state)))
+    node = HeadyNode("node-0", "worker", {}, sampler=LoadSampler(),
+                     store=MetricsRingStore(NODE_METRIC_COLUMNS, capacity=10))
+    registry[node.node_id] = node
+    node.state = NodeState.HEALTHY
+    node.state = NodeState.HEALTHY
+    assert seen == [("node-0", NodeState.INITIALIZING, NodeState.HEALTHY)]
+
+
+def run_health_checks(nodes, rounds: int, rng):
+    for _ in range(rounds):
+        for node in nodes:
+            node.sampler.cpu_percent = float(rng.uniform(0, 100))
+            asyncio.run(node.health_check())
+
+
+def brute_force_least_healthy(registry, count, states=RUNNING_STATES, exclude=()):
+    candidates = [
+        (float(np.mean(node.health_history, dtype=np.float64)), node_id)
+        for node_id, node in registry.items()
+        if node.state in states and node_id not in exclude and len(node.health_history)
+    ]
+    return [node_id for _, node_id in sorted(candidates)[:count]]
+
+
+def test_running_mean_health_tracks_window():
+    np.random.seed(2)
+    registry, nodes = make_registry(3)
+    # Long enough to wrap the window and pass several exact resyncs
+    run_health_checks(nodes, 3 * HeadyNode.HEALTH_WINDOW + 7, np.random.default_rng(2))
+    for node in nodes:
+        assert len(node.health_history) == HeadyNode.HEALTH_WINDOW
+        assert abs(node.mean_health - float(np.mean(node.health_history, dtype=np.float64))) < 2e-5
+
+
+def test_least_healthy_matches_brute_force_with_exclude():
+    np.random.seed(3)
+    rng = np.random.default_rng(3)
+    registry, nodes = make_registry(12)
+    run_health_checks(nodes, 15, rng)
+    nodes[4].state = NodeState.DRAINING
+
+    for count in (1, 3, 20):
+        assert registry.least_healthy(count) == brute_force_least_healthy(registry, count)
+    worst = brute_force_least_healthy(registry, 3)
+    exclude = {worst[0], worst[2]}
+    assert registry.least_healthy(3, exclude=exclude) == brute_force_least_healthy(registry, 3, exclude=exclude)
+    assert "node-4" not in registry.least_healthy(20)
+    assert registry.least_healthy(20, states=(NodeState.DRAINING,)) == ["node-4"]
+    # Lookups put back what they pop
+    assert registry.least_healthy(3) == brute_force_least_healthy(registry, 3)
+
+
+def test_least_healthy_heap_is_compacted():
+    np.random.seed(4)
+    rng = np.random.default_rng(4)
+    registry, nodes = make_registry(5)
+    run_health_checks(nodes, 60, rng)
+    # Every health check pushes an entry; stale ones must be dropped periodically
+    assert len(registry._heap) <= 2 * len(registry) + 65
+
+    del registry["node-0"]
+    registry._rebuild_heap()
+    assert {entry[2] for entry in registry._heap} == set(registry)
+    assert len(registry._heap) == len(registry)
+    assert registry.least_healthy(5) == brute_force_least_healthy(registry, 5)
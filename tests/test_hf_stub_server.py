@@ -0,0 +1,287 @@
+# HEADY_BRAND:BEGIN
+# HEADY SYSTEMS :: SACRED GEOMETRY
+# FILE: tests/test_hf_stub_server.py
+# LAYER: tests
+# 
+#         _   _  _____    _    ____   __   __
+#        | | | || ____|  / \  |  _ \ \ \ / /
+#        | |_| ||  _|   / _ \ | | | | \ V / 
+#        |  _  || |___ / ___ \| |_| |  | |  
+#        |_| |_||_____/_/   \_\____/   |_|  
+# 
+#    Sacred Geometry :: Organic Systems :: Breathing Interfaces
+# HEADY_BRAND:END
+
+"""Tests for src/hf_stub_server.py driven through the process_data clients"""
+
+import argparse
+import io
+import json
+import types
+
+import pytest
+import requests
+
+import hf_stub_server
+import process_data
+from hf_stub_server import StubConfig, _stub_tokens, start_stub_server
+from process_data import GPUBatchDispatcher, HFInferenceBackend, ResponseCache, SingleFlight, _parse_endpoints
+
+EMBED_MODEL = "sentence-transformers/heady-test"
+TEXT_MODEL = "heady-test-gpt"
+
+
+def serve(monkeypatch, **config):
+    server, state = start_stub_server(StubConfig(port=0, latency_ms=1.0, token_latency_ms=0.1, embed_dim=8, **config))
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(process_data, "HF_TOKEN", "stub")
+    monkeypatch.setattr(process_data, "_hf_endpoints", _parse_endpoints(f"stub={url}/models"))
+    monkeypatch.setattr(process_data, "REMOTE_GPU_HOST", "127.0.0.1")
+    monkeypatch.setattr(process_data, "REMOTE_GPU_PORT", server.server_address[1])
+    process_data.set_backend(HFInferenceBackend())
+    return server, state, url
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server, state, url = serve(monkeypatch)
+    yield url, state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cold_stub(monkeypatch):
+    server, state, url = serve(monkeypatch, cold_start_s=0.3)
+    yield url, state
+    server.shutdown()
+    server.server_close()
+
+
+def test_cold_model_answers_503_with_estimated_time(cold_stub):
+    url, state = cold_stub
+    resp = requests.post(f"{url}/models/{EMBED_MODEL}", json={"inputs": "hello"})
+    assert resp.status_code == 503
+    assert 0 < resp.json()["estimated_time"] <= 0.3
+    assert state.counters["loading_503"] == 1
+
+
+def test_hf_infer_waits_out_the_cold_start(cold_stub, monkeypatch):
+    _, state = cold_stub
+    waits = []
+    real_sleep = process_data._sleep_ms
+
+    def sleep_ms(ms):
+        waits.append(ms)
+        real_sleep(ms)
+
+    monkeypatch.setattr(process_data, "_sleep_ms", sleep_ms)
+    vector = process_data.hf_infer(model=EMBED_MODEL, inputs="hello", options={"wait_for_model": False})
+    assert len(vector) == 8
+    assert state.counters["loading_503"] == 1
+    # estimated_time plus the fixed 250ms margin
+    assert len(waits) == 1 and 250 < waits[0] <= 550
+
+
+def test_wait_for_model_blocks_instead_of_503(cold_stub):
+    _, state = cold_stub
+    output = process_data.hf_generate("hello", model=TEXT_MODEL, parameters={"max_new_tokens": 3})
+    assert output["output"].startswith("hello")
+    assert state.counters["loading_503"] == 0
+
+
+def test_generate_stream_yields_one_chunk_per_sse_token(stub):
+    _, state = stub
+    chunks = list(process_data.hf_generate_stream("hello", model=TEXT_MODEL, parameters={"max_new_tokens": 5}))
+    assert chunks == _stub_tokens("hello", 5)
+    assert state.counters["stream"] == 1
+    assert state.counters["generate"] == 1
+
+
+def test_process_batch_results_are_demuxed_by_request_id(stub):
+    _, state = stub
+    dispatcher = GPUBatchDispatcher(max_batch_size=4, max_wait_ms=200)
+    request_ids = ["a", "b", "", "a"]
+    futures = [
+        dispatcher.submit("echo", {"index": index}, model="m", request_id=request_id)
+        for index, request_id in enumerate(request_ids)
+    ]
+    results = [future.result(timeout=5) for future in futures]
+
+    assert [result["request_id"] for result in results] == request_ids
+    assert all(result["ok"] for result in results)
+    # The stub answers in reverse order; each caller still gets its own item back
+    assert [result["result"]["output"]["input_bytes"] for result in results] == [len('{"index": %d}' % i) for i in range(4)]
+    assert state.counters["gpu_batch"] == 1
+    assert state.counters["gpu_batch_items"] == 4
+    assert dispatcher.stats()["item_errors"] == 0
+
+
+def test_process_batch_rejects_a_body_without_items(stub):
+    url, state = stub
+    resp = requests.post(f"{url}/process_batch", json={"items": {"task": "echo"}})
+    assert resp.status_code == 400
+    assert state.counters["gpu_batch"] == 0
+
+
+def test_outbound_calls_share_one_keep_alive_connection(stub, monkeypatch):
+    url, state = stub
+    monkeypatch.setattr(process_data, "_http_session", None)
+    monkeypatch.setattr(process_data, "_http_stats", {"requests": 0, "errors": 0})
+
+    session = process_data.get_http_session()
+    for index in range(3):
+        assert process_data.gpu_worker_interface("echo", {"index": index})["ok"]
+    process_data.hf_infer(model=EMBED_MODEL, inputs="hello")
+    assert process_data.get_http_session() is session
+
+    pool = process_data.http_pool_stats()
+    assert (pool["requests"], pool["errors"]) == (4, 0)
+    [host] = pool["hosts"]
+    assert host["host"] == url
+    assert (host["connections_opened"], host["requests_served"], host["connections_reused"]) == (1, 4, 3)
+    assert host["idle_connections"] == 1
+    assert process_data._health_status()["http_pool"]["requests"] == 4
+
+
+def qa_prompt(request):
+    prompt, _ = process_data._build_qa_prompt(request["question"], "", request["model"], {"max_new_tokens": request["max_new_tokens"]})
+    return prompt
+
+
+@pytest.fixture
+def qa_cache(monkeypatch):
+    cache = ResponseCache(ttl_s=60)
+    monkeypatch.setattr(process_data, "_qa_cache", cache)
+    monkeypatch.setattr(process_data, "_qa_flight", SingleFlight())
+    return cache
+
+
+def test_deterministic_qa_answers_are_cached_and_sampled_ones_are_not(stub, qa_cache):
+    _, state = stub
+    first = process_data.qa_interface("What is resonance?", model=TEXT_MODEL, max_new_tokens=4, request_id="r1")
+    second = process_data.qa_interface("What is resonance?", model=TEXT_MODEL, max_new_tokens=4, request_id="r2")
+    assert first["ok"] and (first["cached"], second["cached"]) == (False, True)
+    assert second["answer"] == first["answer"] and second["request_id"] == "r2"
+    assert state.counters["generate"] == 1
+
+    # A different question or a sampling temperature always goes upstream
+    process_data.qa_interface("What is geometry?", model=TEXT_MODEL, max_new_tokens=4)
+    for _ in range(2):
+        sampled = process_data.qa_interface("What is resonance?", model=TEXT_MODEL, max_new_tokens=4, parameters={"temperature": 0.9})
+        assert not sampled["cached"]
+    assert state.counters["generate"] == 4
+    assert qa_cache.stats()["size"] == 2
+
+
+def test_qa_command_streams_token_events_before_the_answer(stub, qa_cache, monkeypatch, capsys):
+    _, state = stub
+    request = {"question": "What is resonance?", "model": TEXT_MODEL, "max_new_tokens": 5, "request_id": "s1", "stream": True}
+    monkeypatch.setattr("sys.stdin", io.StringIO(json.dumps(request)))
+    with pytest.raises(SystemExit) as exited:
+        process_data.handle_qa_command()
+    assert exited.value.code == 0
+
+    *tokens, done = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [event["text"] for event in tokens] == _stub_tokens(qa_prompt(request), 5)
+    assert [event["index"] for event in tokens] == list(range(5))
+    assert {event["event"] for event in tokens} == {"token"}
+    assert all(event["request_id"] == "s1" for event in tokens + [done])
+    assert done["event"] == "done" and done["ok"] and not done["cached"]
+    assert done["answer"] == "".join(event["text"] for event in tokens)
+    assert done["tokens"] == 5
+    assert 0 < done["ttft_ms"] <= done["total_ms"]
+    assert state.counters["stream"] == 1
+
+
+def test_cached_answer_streams_as_a_single_event(stub, qa_cache):
+    _, state = stub
+    answer = process_data.qa_interface("What is resonance?", model=TEXT_MODEL, max_new_tokens=5)["answer"]
+    events = []
+    done = process_data.qa_interface_stream("What is resonance?", model=TEXT_MODEL, max_new_tokens=5, request_id="s2", emit=events.append)
+    assert [event["text"] for event in events] == [answer]
+    assert (done["cached"], done["tokens"], done["answer"]) == (True, 1, answer)
+    assert state.counters["stream"] == 0
+
+
+def test_stream_failure_is_reported_in_the_done_event(monkeypatch):
+    monkeypatch.setattr(process_data, "_hf_endpoints", [])
+    events = []
+    done = process_data.qa_interface_stream("What is resonance?", model=TEXT_MODEL, request_id="s3", emit=events.append)
+    assert events == []
+    assert (done["event"], done["ok"], done["request_id"], done["tokens"], done["ttft_ms"]) == ("done", False, "s3", 0, None)
+
+
+def bench_args(url, **overrides):
+    args = dict(
+        target=url, suites="qa,gpu,embed_batched", requests=6, concurrency=[2], payload_size=[64],
+        max_new_tokens=4, stub_latency_ms=1.0, stub_token_ms=0.1, embed_dim=8,
+    )
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def test_benchmark_reports_latency_and_traffic_per_suite(stub, monkeypatch):
+    url, _ = stub
+    monkeypatch.setattr(process_data, "_qa_cache", ResponseCache(ttl_s=60))
+    report = process_data.run_benchmarks(bench_args(url))
+
+    assert report["status"] == "ok" and report["target"] == url
+    assert [run["suite"] for run in report["results"]] == ["qa", "gpu", "embed_batched"]
+    for run in report["results"]:
+        assert (run["requests"], run["ok"], run["errors"], run["concurrency"], run["payload_bytes"]) == (6, 6, 0, 2, 64)
+        latency = run["latency_ms"]
+        assert 0 < latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+        assert run["requests_per_s"] > 0
+        assert run["bytes_sent"] > 6 * 64 and run["bytes_received"] > 0
+    # Every measured payload is unique, so nothing is answered from a cache
+    assert report["results"][0]["upstream_requests"] == 6
+    assert report["results"][1]["upstream_requests"] == 6
+    assert report["results"][2]["upstream_requests"] <= 6
+
+
+def test_benchmark_rejects_unknown_suites(stub):
+    url, _ = stub
+    with pytest.raises(ValueError, match="Unknown benchmark suite: nope"):
+        process_data.run_benchmarks(bench_args(url, suites="nope"))
+
+
+def test_process_batch_reports_failed_items_without_failing_the_rest(monkeypatch):
+    # error_rate applies per item; fail every other one
+    draws = iter([0.0, 0.9] * 4)
+    monkeypatch.setattr(hf_stub_server, "random", types.SimpleNamespace(random=lambda: next(draws)))
+    server, state, _ = serve(monkeypatch, error_rate=0.5)
+    monkeypatch.setattr(process_data, "_gpu_dispatcher", GPUBatchDispatcher(max_batch_size=4, max_wait_ms=200))
+    try:
+        report = process_data.gpu_worker_batch(
+            [{"task": "echo", "data": {"index": index}, "request_id": f"t{index}"} for index in range(4)],
+            request_id="batch-1",
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert (report["ok"], report["failed"], report["request_id"]) == (False, 2, "batch-1")
+    assert [result["request_id"] for result in report["results"]] == ["t0", "t1", "t2", "t3"]
+    assert [result["ok"] for result in report["results"]] == [False, True, False, True]
+    assert report["results"][0]["error"] == "Injected GPU task failure"
+    assert report["results"][1]["result"]["output"]["input_bytes"] == len('{"index": 1}')
+    assert state.counters["gpu_batch"] == 1
+    assert process_data.get_gpu_dispatcher().stats()["item_errors"] == 2
+
+
+def test_workers_without_process_batch_get_one_request_per_task(stub, monkeypatch):
+    _, state = stub
+    gpu_url = process_data._gpu_url
+    monkeypatch.setattr(process_data, "_gpu_url", lambda path: gpu_url("/missing" if path == "/process_batch" else path))
+    dispatcher = GPUBatchDispatcher(max_batch_size=3, max_wait_ms=200)
+
+    first = [dispatcher.submit("echo", {"index": index}, request_id=f"t{index}") for index in range(3)]
+    assert [future.result(timeout=5)["request_id"] for future in first] == ["t0", "t1", "t2"]
+    # Later batches skip the batch endpoint entirely
+    assert dispatcher.submit("echo", {"index": 3}, request_id="t3").result(timeout=5)["ok"]
+
+    stats = dispatcher.stats()
+    assert (stats["batch_supported"], stats["fallback_items"], stats["item_errors"]) == (False, 4, 0)
+    assert (state.counters["gpu"], state.counters["gpu_batch"]) == (4, 0)
+    assert state.counters["requests"] == 5
@@ -0,0 +1,691 @@
+# HEADY_BRAND:BEGIN
+# HEADY SYSTEMS :: SACRED GEOMETRY
+# FILE: tests/test_process_data.py
+# LAYER: tests
+# 
+#         _   _  _____    _    ____   __   __
+#        | | | || ____|  / \  |  _ \ \ \ / /
+#        | |_| ||  _|   / _ \ | | | | \ V / 
+#        |  _  || |___ / ___ \| |_| |  | |  
+#        |_| |_||_____/_/   \_\____/   |_|  
+# 
+#    Sacred Geometry :: Organic Systems :: Breathing Interfaces
+# HEADY_BRAND:END
+
+"""Tests for src/process_data.py"""
+
+import asyncio
+import gc
+import hashlib
+import io
+import json
+import multiprocessing
+import sys
+import threading
+import time
+import types
+import warnings
+
+import numpy as np
+import pytest
+
+import process_data
+from hf_stub_server import StubConfig, start_stub_server
+from process_data import (
+    AsyncInferenceEngine,
+    EmbeddingBatcher,
+    EmbeddingCache,
+    EndpointHealth,
+    HFInferenceBackend,
+    LocalBackend,
+    ResponseCache,
+    SingleFlight,
+    _DiskVectorStore,
+    _json_default,
+    _l2_normalize,
+    _pool_embeddings,
+    _pool_feature_extraction_output,
+    _pool_tokens,
+    _parse_endpoints,
+    decode_frame,
+    encode_frame,
+    read_frame,
+)
+
+EMBED_MODEL = "sentence-transformers/heady-test"
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """In-process HF stub with every outbound path and a fresh embedding cache pointed at it"""
+    server, state = start_stub_server(StubConfig(port=0, latency_ms=1.0, token_latency_ms=0.1, embed_dim=16))
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(process_data, "HF_TOKEN", "stub")
+    monkeypatch.setattr(process_data, "_hf_endpoints", _parse_endpoints(f"stub={url}/models"))
+    monkeypatch.setattr(process_data, "HEADY_EMBED_CACHE", True)
+    monkeypatch.setattr(process_data, "_embedding_cache", EmbeddingCache(directory=None))
+    process_data.set_backend(HFInferenceBackend())
+    yield url, state
+    server.shutdown()
+    server.server_close()
+
+
+def vector_for(key: str, dim: int = 8) -> np.ndarray:
+    return np.random.default_rng(int(hashlib.sha1(key.encode()).hexdigest()[:8], 16)).standard_normal(dim).astype(np.float32)
+
+
+def test_disk_store_instances_sharing_a_directory_keep_rows_apart(tmp_path):
+    first = _DiskVectorStore(str(tmp_path), "model")
+    second = _DiskVectorStore(str(tmp_path), "model")
+    keys = [f"key-{i}" for i in range(6)]
+    for i, key in enumerate(keys):
+        (first if i % 2 else second).put(key, vector_for(key))
+
+    reopened = _DiskVectorStore(str(tmp_path), "model")
+    for store in (first, second, reopened):
+        for key in keys:
+            np.testing.assert_array_equal(store.get(key), vector_for(key))
+    assert len(reopened) == len(keys)
+    assert not second.put("key-1", vector_for("key-1"))
+
+
+def _write_keys(directory: str, worker: int, count: int):
+    store = _DiskVectorStore(directory, "model")
+    for i in range(count):
+        key = f"worker-{worker}-{i}"
+        store.put(key, vector_for(key))
+
+
+def test_disk_store_concurrent_processes(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_write_keys, args=(str(tmp_path), w, 50)) for w in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    store = _DiskVectorStore(str(tmp_path), "model")
+    assert len(store) == 150
+    for w in range(3):
+        for i in range(50):
+            key = f"worker-{w}-{i}"
+            np.testing.assert_array_equal(store.get(key), vector_for(key))
+
+
+def test_disk_store_reads_legacy_key_files(tmp_path):
+    store = _DiskVectorStore(str(tmp_path), "model")
+    store.put("seed", vector_for("seed"))
+    # Files written before rows were recorded: one bare key per row
+    with open(store.keys_path, "w", encoding="utf-8") as f:
+        f.write("legacy-0\nlegacy-1\n")
+    with open(store.vectors_path, "wb") as f:
+        f.write(vector_for("legacy-0").tobytes() + vector_for("legacy-1").tobytes())
+
+    reopened = _DiskVectorStore(str(tmp_path), "model")
+    np.testing.assert_array_equal(reopened.get("legacy-1"), vector_for("legacy-1"))
+    reopened.put("new", vector_for("new"))
+    np.testing.assert_array_equal(_DiskVectorStore(str(tmp_path), "model").get("new"), vector_for("new"))
+
+
+def test_memory_hits_do_not_wait_for_a_slow_disk_lookup(tmp_path, monkeypatch):
+    cache = EmbeddingCache(directory=str(tmp_path))
+    cache.put("model", "warm", vector_for("warm"))
+    entered, release = threading.Event(), threading.Event()
+    disk_get = _DiskVectorStore.get
+
+    def slow_get(store, key):
+        entered.set()
+        release.wait(5)
+        return disk_get(store, key)
+
+    monkeypatch.setattr(_DiskVectorStore, "get", slow_get)
+    cold = threading.Thread(target=cache.get, args=("model", "cold"))
+    cold.start()
+    try:
+        assert entered.wait(5)
+        hit = threading.Thread(target=cache.get, args=("model", "warm"))
+        hit.start()
+        hit.join(1)
+        assert not hit.is_alive()
+    finally:
+        release.set()
+        cold.join(5)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["disk_size"]) == (1, 1, 1)
+
+
+def test_json_default_keeps_float32_payload_short():
+    vectors = np.random.default_rng(0).standard_normal((4, 384)).astype(np.float32)
+    encoded = json.dumps({"embeddings": vectors}, default=_json_default)
+    decoded = np.array(json.loads(encoded)["embeddings"], dtype=np.float32)
+    np.testing.assert_array_equal(decoded, vectors)
+    # float64 reprs would take ~17 significant digits per value
+    assert len(encoded) < 0.65 * len(json.dumps(vectors.tolist()))
+
+    assert json.dumps(np.float32(0.1), default=_json_default) == "0.1"
+    assert json.dumps(np.array(1.5, dtype=np.float32), default=_json_default) == "1.5"
+    assert json.dumps(np.zeros((0, 3), dtype=np.float32), default=_json_default) == "[]"
+    assert json.dumps(np.arange(3), default=_json_default) == "[0, 1, 2]"
+
+
+def test_json_default_is_exact_for_float16_and_special_values():
+    values = np.array([0.0, -0.0, 1e-7, 65504.0, 3.14159], dtype=np.float16)
+    decoded = np.array(json.loads(json.dumps(values, default=_json_default)), dtype=np.float16)
+    np.testing.assert_array_equal(decoded, values)
+    extremes = np.array([1e-45, 3.4028235e38, -2.5e-12], dtype=np.float32)
+    decoded = json.loads(json.dumps(extremes, default=_json_default))
+    np.testing.assert_array_equal(np.array(decoded, dtype=np.float32), extremes)
+    assert decoded[1:] == [3.4028235e38, -2.5e-12]
+
+
+TOKENS = np.array([[3.0, 0.0], [1.0, 4.0], [2.0, -4.0]], dtype=np.float32)
+
+
+@pytest.mark.parametrize(
+    "pooling, expected",
+    [("mean", [2.0, 0.0]), ("cls", [3.0, 0.0]), ("max", [3.0, 4.0])],
+)
+def test_pool_tokens(pooling, expected):
+    np.testing.assert_array_equal(_pool_tokens(TOKENS, pooling), expected)
+    np.testing.assert_array_equal(_pool_tokens(np.stack([TOKENS, TOKENS]), pooling), [expected, expected])
+
+
+def test_l2_normalize_rows_and_zero_vectors():
+    normalized = _l2_normalize(np.array([[3.0, 4.0], [0.0, 0.0]], dtype=np.float32))
+    np.testing.assert_allclose(normalized, [[0.6, 0.8], [0.0, 0.0]])
+
+
+def test_pool_feature_extraction_output_shapes():
+    single = _pool_feature_extraction_output([TOKENS.tolist()], pooling="cls", normalize=True)
+    assert single.dtype == np.float32
+    np.testing.assert_allclose(single, [1.0, 0.0])
+    # Already pooled vectors pass straight through
+    np.testing.assert_array_equal(_pool_feature_extraction_output([3.0, 4.0], normalize=False), [3.0, 4.0])
+
+    batch = _pool_embeddings([TOKENS.tolist(), TOKENS[:2].tolist()], ["a", "b"], pooling="mean", normalize=False)
+    np.testing.assert_allclose(batch, [[2.0, 0.0], [2.0, 2.0]])
+    assert _pool_embeddings({"error": "loading"}, "a") == {"error": "loading"}
+    with pytest.raises(ValueError):
+        _pool_feature_extraction_output([1.0], pooling="sum")
+
+
+def test_async_embed_goes_through_the_embedding_cache(stub):
+    _, state = stub
+
+    async def run():
+        async with AsyncInferenceEngine() as engine:
+            first = await engine.embed(["alpha", "beta"], model=EMBED_MODEL)
+            second = await engine.embed(["beta", "gamma", "alpha"], model=EMBED_MODEL)
+            cached = await engine.embed("gamma", model=EMBED_MODEL)
+        return first, second, cached
+
+    first, second, cached = asyncio.run(run())
+    # Second call only sends the one new text upstream; the third is a pure hit
+    assert state.counters["embed"] == 2
+    assert cached["raw"] is None
+    np.testing.assert_array_equal(second["embeddings"][0], first["embeddings"][1])
+    np.testing.assert_array_equal(second["embeddings"][2], first["embeddings"][0])
+    np.testing.assert_array_equal(cached["embeddings"], second["embeddings"][1])
+    # Same vectors as the synchronous path
+    np.testing.assert_array_equal(
+        process_data.hf_embed(["alpha", "beta"], model=EMBED_MODEL)["embeddings"], first["embeddings"]
+    )
+
+
+def test_async_engine_stats_are_a_snapshot(stub):
+    engine = AsyncInferenceEngine(max_concurrency=3)
+
+    async def call():
+        async with engine:
+            await engine.infer(model="heady-test-gpt", inputs="hello", parameters={"max_new_tokens": 2})
+
+    before = engine.stats()
+    asyncio.run(call())
+    after = engine.stats()
+    assert before["completed"] == 0 and after["completed"] == 1
+    assert after["in_flight"] == 0 and after["max_concurrency"] == 3
+    after["completed"] = 99
+    assert engine.stats()["completed"] == 1
+
+
+def test_async_engine_closes_sessions_left_on_finished_loops(stub):
+    engine = AsyncInferenceEngine()
+    sessions = []
+
+    async def call():
+        await engine.infer(model="heady-test-gpt", inputs="hello", parameters={"max_new_tokens": 2})
+        sessions.append(engine._session)
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        asyncio.run(call())
+        asyncio.run(call())
+        assert sessions[0] is not sessions[1]
+        assert sessions[0].closed
+        asyncio.run(engine.close())
+        sessions.clear()
+        gc.collect()
+    assert not [w for w in caught if "Unclosed" in str(w.message)]
+
+
+@pytest.fixture
+def embed_calls(monkeypatch):
+    """Record every hf_embed call the batcher makes, answering with vector_for"""
+    calls = []
+
+    def fake_embed(texts, model=None, **kwargs):
+        calls.append((model, list(texts)))
+        if model == "broken":
+            raise RuntimeError("model unavailable")
+        return {"embeddings": np.stack([vector_for(text) for text in texts])}
+
+    monkeypatch.setattr(process_data, "hf_embed", fake_embed)
+    return calls
+
+
+def test_batcher_counts_flushes_per_model_group(embed_calls):
+    batcher = EmbeddingBatcher(max_batch_size=4, max_wait_ms=300, max_in_flight=2)
+
+    # One cycle filled by two models: neither group is full on its own
+    mixed = [batcher.submit(text, model=model) for model, text in [("a", "a0"), ("a", "a1"), ("b", "b0"), ("a", "a2")]]
+    for future, text in zip(mixed, ["a0", "a1", "b0", "a2"]):
+        np.testing.assert_array_equal(future.result(5), vector_for(text))
+    full = [batcher.submit(f"a{i}", model="a") for i in range(4)]
+    [future.result(5) for future in full]
+    batcher.submit("b1", model="b").result(5)
+
+    assert sorted(embed_calls) == sorted([
+        ("a", ["a0", "a1", "a2"]), ("b", ["b0"]), ("a", ["a0", "a1", "a2", "a3"]), ("b", ["b1"]),
+    ])
+    stats = batcher.stats()
+    assert (stats["flush_full"], stats["flush_partial"], stats["flush_timeout"]) == (1, 2, 1)
+    assert (stats["requests"], stats["batches"], stats["items_sent"], stats["max_batch"]) == (9, 4, 9, 4)
+    assert stats["avg_batch_size"] == 2.25
+
+
+def test_batcher_keeps_option_groups_apart_and_fails_only_the_broken_one(embed_calls):
+    batcher = EmbeddingBatcher(max_batch_size=3, max_wait_ms=300, max_in_flight=2)
+    plain = batcher.submit("x", model="a")
+    pooled = batcher.submit("y", model="a", pooling="cls")
+    broken = batcher.submit("z", model="broken")
+
+    np.testing.assert_array_equal(plain.result(5), vector_for("x"))
+    np.testing.assert_array_equal(pooled.result(5), vector_for("y"))
+    with pytest.raises(RuntimeError, match="model unavailable"):
+        broken.result(5)
+    assert sorted(embed_calls) == [("a", ["x"]), ("a", ["y"]), ("broken", ["z"])]
+    stats = batcher.stats()
+    assert (stats["batches"], stats["flush_partial"], stats["errors"]) == (3, 3, 1)
+
+
+def test_backend_missing_a_method_fails_at_creation():
+    class GenerateOnly(process_data.InferenceBackend):
+        def text_generation(self, model, prompt, parameters, options):
+            return [{"generated_text": prompt}]
+
+    with pytest.raises(TypeError, match="feature_extraction"):
+        GenerateOnly()
+
+
+class WordTokenizer:
+    def __init__(self, model_max_length):
+        self.model_max_length = model_max_length
+
+    def encode(self, text, add_special_tokens=True):
+        return text.split()
+
+
+@pytest.fixture
+def qa_windows(monkeypatch):
+    """No configured windows, heuristic counting and a restorable backend slot"""
+    monkeypatch.setattr(process_data, "HEADY_QA_MODEL_WINDOWS", {})
+    monkeypatch.setattr(process_data, "HEADY_QA_CONTEXT_WINDOW", 0)
+    monkeypatch.setattr(process_data, "HEADY_QA_TOKENIZER", "heuristic")
+    monkeypatch.setattr(process_data, "_backend", HFInferenceBackend())
+
+
+def local_backend_with_tokenizer(monkeypatch, model, model_max_length):
+    tokenizer = WordTokenizer(model_max_length)
+    fake_transformers = types.SimpleNamespace(pipeline=lambda task, model, device: types.SimpleNamespace(tokenizer=tokenizer))
+    monkeypatch.setitem(sys.modules, "transformers", fake_transformers)
+    backend = LocalBackend()
+    backend.warm(text_models=[model])
+    process_data.set_backend(backend)
+    return backend, tokenizer
+
+
+def long_context(paragraphs=40):
+    return "\n\n".join(f"Paragraph {i} talks about resonance and sacred geometry in detail." for i in range(paragraphs))
+
+
+def test_qa_prompt_keeps_context_when_the_fallback_window_is_disabled(qa_windows, monkeypatch, caplog):
+    monkeypatch.setattr(process_data, "_unbudgeted_models", set())
+    context = long_context()
+    for _ in range(2):
+        prompt, stats = process_data._build_qa_prompt("What is resonance?", context, "heady-test-gpt", {"max_new_tokens": 64})
+        assert context in prompt
+        assert stats["context_tokens_dropped"] == 0
+    assert [r.getMessage() for r in caplog.records if "untrimmed" in r.getMessage()] == [
+        "No context window known for heady-test-gpt; QA context is sent untrimmed"
+    ]
+
+
+def test_qa_prompt_budgets_to_the_default_window(qa_windows, monkeypatch):
+    monkeypatch.setattr(process_data, "HEADY_QA_CONTEXT_WINDOW", 200)
+    prompt, stats = process_data._build_qa_prompt("What is resonance?", long_context(), "heady-test-gpt", {"max_new_tokens": 64})
+    assert stats["context_chunks_dropped"] > 0
+    assert stats["prompt_tokens"] + 64 + process_data.HEADY_QA_TOKEN_MARGIN <= 200
+
+
+def test_qa_prompt_budgets_to_the_local_tokenizer_limit(qa_windows, monkeypatch):
+    backend, tokenizer = local_backend_with_tokenizer(monkeypatch, "heady-test-gpt", model_max_length=120)
+    assert backend.tokenizer_for("heady-test-gpt") is tokenizer
+    assert backend.tokenizer_for("not-loaded") is None
+
+    prompt, stats = process_data._build_qa_prompt("What is resonance?", long_context(), "heady-test-gpt", {"max_new_tokens": 32})
+    assert stats["context_chunks_dropped"] > 0
+    assert len(tokenizer.encode(prompt)) + 32 + process_data.HEADY_QA_TOKEN_MARGIN <= 120
+
+
+def test_configured_window_wins_and_unset_tokenizer_limits_fall_back(qa_windows, monkeypatch):
+    local_backend_with_tokenizer(monkeypatch, "heady-test-gpt", model_max_length=int(1e30))
+    assert process_data._model_window("heady-test-gpt") is None
+    monkeypatch.setattr(process_data, "HEADY_QA_CONTEXT_WINDOW", 2048)
+    assert process_data._model_window("heady-test-gpt") == 2048
+    monkeypatch.setattr(process_data, "HEADY_QA_MODEL_WINDOWS", {"heady-test-gpt": 512})
+    assert process_data._model_window("heady-test-gpt") == 512
+
+
+def test_response_cache_expires_and_evicts_least_recent():
+    cache = ResponseCache(ttl_s=60, capacity=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("A", "C")
+
+    expired = ResponseCache(ttl_s=0)
+    expired.put("a", "A")
+    assert expired.get("a") is None
+    assert cache.stats()["evictions"] == 1
+    assert (expired.stats()["expired"], expired.stats()["size"]) == (1, 0)
+
+
+def test_single_flight_runs_concurrent_identical_calls_once():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", generate)))
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("key", generate))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flight.coalesced < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results) == [("answer", False)] + [("answer", True)] * 3
+    # Finished keys are not remembered: the next call runs again
+    assert flight.do("key", lambda: "again") == ("again", False)
+
+
+def test_single_flight_shares_the_leaders_error():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError, match="upstream down"):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: "recovered") == ("recovered", False)
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(process_data.time, "monotonic", fake)
+    return fake
+
+
+def test_breaker_opens_after_threshold_and_lets_one_probe_through(clock):
+    endpoint = EndpointHealth("a", "http://a", failure_threshold=2, reset_timeout_s=10.0)
+    assert endpoint.allow_request()
+    endpoint.record_failure()
+    assert endpoint.state == EndpointHealth.CLOSED
+    endpoint.record_failure()
+    assert endpoint.state == EndpointHealth.OPEN
+    assert not endpoint.allow_request()
+
+    clock.now += 9.9
+    assert not endpoint.allow_request()
+    clock.now += 0.1
+    assert endpoint.allow_request()
+    assert endpoint.state == EndpointHealth.HALF_OPEN
+    assert not endpoint.allow_request()
+
+    endpoint.record_success(0.05)
+    assert endpoint.state == EndpointHealth.CLOSED
+    assert endpoint.allow_request()
+
+
+def test_failed_probe_reopens_with_a_fresh_timeout(clock):
+    endpoint = EndpointHealth("a", "http://a", failure_threshold=1, reset_timeout_s=10.0)
+    endpoint.record_failure()
+    clock.now += 10.0
+    assert endpoint.allow_request()
+    endpoint.record_failure()
+    assert endpoint.state == EndpointHealth.OPEN
+
+    clock.now += 5.0
+    assert not endpoint.allow_request()
+    clock.now += 5.0
+    assert endpoint.allow_request()
+
+
+def test_probe_that_never_reports_back_is_retried(clock):
+    endpoint = EndpointHealth("a", "http://a", failure_threshold=1, reset_timeout_s=10.0)
+    endpoint.record_failure()
+    clock.now += 10.0
+    assert endpoint.allow_request()
+    clock.now += 9.0
+    assert not endpoint.allow_request()
+    clock.now += 1.0
+    assert endpoint.allow_request()
+
+
+def test_routes_prefer_fast_endpoints_and_retry_recovered_ones_first(clock, monkeypatch):
+    fast = EndpointHealth("fast", "http://fast", failure_threshold=1, reset_timeout_s=10.0)
+    slow = EndpointHealth("slow", "http://slow", failure_threshold=1, reset_timeout_s=10.0)
+    monkeypatch.setattr(process_data, "_hf_endpoints", [slow, fast])
+    for endpoint, latency_s in ((fast, 0.05), (slow, 0.5)):
+        endpoint.allow_request()
+        endpoint.record_success(latency_s)
+
+    def order():
+        return [endpoint.name for endpoint, _ in process_data._hf_routes("m")]
+
+    assert order() == ["fast", "slow"]
+    fast.allow_request()
+    fast.record_failure()
+    assert order() == ["slow", "fast"]
+    # After the reset timeout the open endpoint is probe-ready and stale, so it is re-measured first
+    clock.now += 10.0
+    slow.allow_request()
+    assert order() == ["fast", "slow"]
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+@pytest.mark.parametrize("status", [404, 429, 503])
+def test_only_2xx_responses_feed_the_latency_ewma(monkeypatch, fast_sleep, status):
+    monkeypatch.setattr(process_data, "HF_TOKEN", "stub")
+    monkeypatch.setattr(process_data, "_sleep_ms", lambda ms: None)
+
+    def post(url, **kwargs):
+        if url == "http://first/m":
+            return FakeResponse(status, {"error": "nope", "estimated_time": 0.0})
+        return FakeResponse(200, [{"generated_text": "ok"}])
+
+    async def respond(url, payload, headers, timeout_s):
+        response = post(url)
+        return response.status_code, response.json()
+
+    engine = AsyncInferenceEngine()
+    monkeypatch.setattr(process_data, "_http_post", post)
+    monkeypatch.setattr(engine, "_post", respond)
+    calls = [
+        lambda: process_data.hf_infer(model="m", inputs="hi", max_retries=1),
+        lambda: asyncio.run(engine._infer("m", "hi", None, None, timeout_s=1.0, max_retries=1)),
+    ]
+    for call in calls:
+        first, second = _parse_endpoints("first=http://first,second=http://second")
+        monkeypatch.setattr(process_data, "_hf_endpoints", [first, second])
+        if status == 404:
+            # Not served here: the next endpoint answers and is the only one measured
+            assert call() == [{"generated_text": "ok"}]
+            assert second.latency_ewma_ms is not None
+        else:
+            with pytest.raises(RuntimeError, match=f"status={status}"):
+                call()
+        assert first.latency_ewma_ms is None
+        assert first.state == EndpointHealth.CLOSED
+
+
+def frame_message():
+    return {
+        "ok": True,
+        "request_id": "r1",
+        "embeddings": np.arange(6, dtype=np.float32).reshape(2, 3) / 7,
+        "scalar": np.array(1.25, dtype=np.float32),
+        "empty": np.zeros((0, 4), dtype=np.float32),
+        "nested": [{"vector": np.linspace(0, 1, 5)}],
+        "count": 3,
+    }
+
+
+def assert_same_message(decoded, message):
+    assert decoded.keys() == message.keys()
+    for key, value in message.items():
+        if isinstance(value, np.ndarray):
+            assert decoded[key].dtype == np.float32
+            np.testing.assert_array_equal(decoded[key], value.astype(np.float32))
+        elif key == "nested":
+            np.testing.assert_array_equal(decoded[key][0]["vector"], value[0]["vector"].astype(np.float32))
+        else:
+            assert decoded[key] == value
+
+
+@pytest.mark.parametrize("wire", ["f32", "msgpack"])
+def test_frames_round_trip_including_0d_and_empty_arrays(wire):
+    if wire == "msgpack":
+        pytest.importorskip("msgpack")
+    message = frame_message()
+    decoded = decode_frame(encode_frame(message, wire))
+    assert_same_message(decoded, message)
+    assert decoded["scalar"].shape == ()
+    assert decoded["empty"].shape == (0, 4)
+
+
+def test_read_frame_reads_back_to_back_frames_until_eof():
+    stream = io.BytesIO(encode_frame(frame_message(), "f32") + encode_frame({"ok": False, "error": "x"}, "f32"))
+    assert_same_message(read_frame(stream), frame_message())
+    assert read_frame(stream) == {"ok": False, "error": "x"}
+    assert read_frame(stream) is None
+
+
+def test_truncated_and_foreign_frames_are_rejected():
+    frame = encode_frame(frame_message(), "f32")
+    with pytest.raises(RuntimeError, match="Truncated"):
+        decode_frame(frame[:-4])
+    with pytest.raises(RuntimeError, match="Not a Heady wire frame"):
+        decode_frame(b"JSON" + frame[4:])
+
+
+def serve(monkeypatch, *requests):
+    """Run the serve loop over the given requests and return its stdout as a binary stream"""
+    out = io.BytesIO()
+    stdout = io.TextIOWrapper(out, encoding="utf-8", write_through=True)
+    lines = "".join(json.dumps(request) + "\n" for request in requests)
+    monkeypatch.setattr(process_data.sys, "stdin", io.StringIO(lines))
+    monkeypatch.setattr(process_data.sys, "stdout", stdout)
+    with pytest.raises(SystemExit):
+        process_data.handle_serve_command()
+    stdout.flush()
+    return io.BytesIO(out.getvalue())
+
+
+def read_messages(stream):
+    messages = []
+    while True:
+        start = stream.tell()
+        first = stream.read(1)
+        if not first:
+            return messages
+        stream.seek(start)
+        if first == process_data.FRAME_MAGIC[:1]:
+            messages.append(read_frame(stream))
+        else:
+            messages.append(json.loads(stream.readline()))
+
+
+def test_msgpack_request_without_msgpack_is_answered_as_json(stub, monkeypatch):
+    monkeypatch.setattr(process_data, "_msgpack", lambda: None)
+    monkeypatch.setattr(process_data, "HEADY_EMBED_BATCHING", False)
+    assert "msgpack" not in process_data.wire_formats()
+
+    messages = read_messages(serve(
+        monkeypatch,
+        {"command": "embed", "text": "hello", "model": EMBED_MODEL, "wire": "msgpack", "request_id": "m"},
+    ))
+    ready, answer = messages
+    assert ready["event"] == "ready" and ready["wire_formats"] == ["json", "f32"]
+    assert answer["ok"] and answer["request_id"] == "m"
+    assert answer["wire_error"] == "msgpack is not installed; answered as json"
+    assert len(answer["embeddings"]) == 16
+
+    msgpack_frame = process_data._FRAME_PREFIX.pack(process_data.FRAME_MAGIC, process_data.WIRE_CODECS["msgpack"], 1) + b"\x80"
+    with pytest.raises(RuntimeError, match="msgpack is not installed"):
+        decode_frame(msgpack_frame)
+
+
+def test_f32_request_is_answered_with_a_frame(stub, monkeypatch):
+    monkeypatch.setattr(process_data, "HEADY_EMBED_BATCHING", False)
+    messages = read_messages(serve(
+        monkeypatch,
+        {"command": "embed", "text": "hello", "model": EMBED_MODEL, "wire": "f32", "request_id": "f"},
+        {"command": "embed", "text": "hello", "model": EMBED_MODEL, "wire": "yaml", "request_id": "y"},
+    ))
+    answers = {message["request_id"]: message for message in messages[1:]}
+    assert isinstance(answers["f"]["embeddings"], np.ndarray)
+    assert answers["f"]["embeddings"].dtype == np.float32 and answers["f"]["embeddings"].shape == (16,)
+    np.testing.assert_allclose(answers["y"]["embeddings"], answers["f"]["embeddings"], rtol=1e-6)
+    assert answers["y"]["wire_error"] == "unknown wire format yaml; answered as json"